@@ -0,0 +1,290 @@
+# batch.py
+"""
+Offline bulk generation through a batch-completions backend.
+Takes a JSONL of inputs for one feature (e.g. a curriculum's topic list for
+learning pathways, or stored résumés to re-score after a prompt change),
+builds each request with the feature's own prompt code, submits them as one
+batch, polls progress, then parses every response and persists it through
+the feature's usual database.py path. Nothing goes through the interactive
+scheduler lanes.
+
+Usage:
+    python batch.py learning_pathways topics.jsonl
+    python batch.py resume_optimization resumes.jsonl --local --output results.jsonl
+
+Input lines are JSON objects with the feature's fields plus an optional
+user_id (defaults to "batch"):
+    learning_pathways:   {"topic": "..."}
+    resume_optimization: {"resume_text": "...", "job_description": "...", "format_details": {...}}
+    project_evaluation:  {"project_description": "...", "persona": "senior_engineer"}
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from llm import metrics
+from llm.batch import BatchRequest, LocalBatchBackend, OpenAIBatchBackend
+from llm.tokens import PromptTooLarge, check_prompt, fit_input
+
+# Configure logging
+logger = logging.getLogger("batch")
+
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+
+
+@dataclass
+class BatchFeature:
+    """How one feature turns an input record into a request and a response into a stored result."""
+    prepare: Callable[[dict], BatchRequest]
+    finish: Callable[[dict, str], dict]
+
+
+_instances: Dict[str, object] = {}
+
+
+def _instance(name: str):
+    # Feature classes are imported lazily so the CLI only loads what it runs
+    if name not in _instances:
+        if name == "learning_pathways":
+            from features.learning_paths import LearningPathways
+            _instances[name] = LearningPathways()
+        elif name == "resume_optimization":
+            from features.resume_optimization import ResumeOptimizer
+            _instances[name] = ResumeOptimizer()
+        elif name == "project_evaluation":
+            from features.project_evaluation import ProjectEvaluator
+            _instances[name] = ProjectEvaluator()
+    return _instances[name]
+
+
+def _user(record: dict) -> str:
+    return record.get("user_id") or "batch"
+
+
+# Learning pathways
+def _prepare_pathway(record: dict) -> BatchRequest:
+    from features.learning_paths import PATHWAY_FORMAT
+    pathways = _instance("learning_pathways")
+    record["topic"] = fit_input("learning_pathways", record["topic"], "topic")
+    return BatchRequest(
+        custom_id="",
+        messages=[{"role": "user", "content": pathways._build_prompt(record["topic"])}],
+        model=pathways._model(_user(record)),
+        temperature=0.3,
+        max_tokens=4000,
+        response_format=PATHWAY_FORMAT,
+    )
+
+
+def _finish_pathway(record: dict, raw: str) -> dict:
+    pathways = _instance("learning_pathways")
+    user_id = _user(record)
+    data = pathways._parse_pathway(user_id, raw)
+    pathway_id = pathways._start_pathway(user_id, record["topic"])
+    return pathways._complete_pathway(user_id, pathway_id, data)
+
+
+# Résumé optimization
+def _prepare_resume(record: dict) -> BatchRequest:
+    from features.resume_optimization import RESUME_FORMAT
+    optimizer = _instance("resume_optimization")
+    optimizer._check_inputs(record["resume_text"], record["job_description"])
+    prompt = optimizer._build_prompt(record["resume_text"], record["job_description"], record.get("format_details"))
+    return BatchRequest(
+        custom_id="",
+        messages=[{"role": "user", "content": prompt}],
+        model=optimizer._model(_user(record)),
+        temperature=0.2,
+        response_format=RESUME_FORMAT,
+    )
+
+
+def _finish_resume(record: dict, raw: str) -> dict:
+    optimizer = _instance("resume_optimization")
+    result, fallback_used = optimizer._process_response(
+        raw, record["resume_text"], record["job_description"], optimizer._model(_user(record))
+    )
+    optimizer._persist(_user(record), record["resume_text"], record["job_description"],
+                       record.get("format_details"), result, fallback_used)
+    return result
+
+
+# Project evaluation
+def _prepare_evaluation(record: dict) -> BatchRequest:
+    from features.project_evaluation import EVALUATION_FORMAT
+    evaluator = _instance("project_evaluation")
+    persona, prompt = evaluator._build_prompt(
+        _user(record), record["project_description"], record.get("persona", "venture_capitalist")
+    )
+    record["persona"] = persona
+    return BatchRequest(
+        custom_id="",
+        messages=[{"role": "user", "content": prompt}],
+        model=evaluator._model(_user(record)),
+        temperature=0.5,
+        response_format=EVALUATION_FORMAT,
+    )
+
+
+def _finish_evaluation(record: dict, raw: str) -> dict:
+    evaluator = _instance("project_evaluation")
+    result, fallback_used = evaluator._process_response(_user(record), raw, record["project_description"])
+    evaluator._persist(_user(record), record["project_description"], result, fallback_used)
+    return result
+
+
+# Cover letters need live company research per input, so they are not batchable
+BATCH_FEATURES = {
+    "learning_pathways": BatchFeature(_prepare_pathway, _finish_pathway),
+    "resume_optimization": BatchFeature(_prepare_resume, _finish_resume),
+    "project_evaluation": BatchFeature(_prepare_evaluation, _finish_evaluation),
+}
+
+
+def get_backend(local: bool = False):
+    return LocalBatchBackend() if local else OpenAIBatchBackend()
+
+
+async def run_batch(
+    feature: str,
+    records: List[dict],
+    backend,
+    poll_interval: float = BATCH_POLL_INTERVAL,
+    batch_id: Optional[str] = None,
+    on_submit: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """
+    Build, submit and collect one batch, persisting every parsed result.
+
+    Args:
+        feature: A key of BATCH_FEATURES
+        records: Input records, one per request
+        backend: OpenAIBatchBackend or LocalBatchBackend
+        poll_interval: Seconds between progress checks
+        batch_id: Resume an already submitted batch instead of submitting again
+        on_submit: Called with the batch id once submitted (e.g. to save it)
+
+    Returns:
+        dict: batch_id, per-record outcomes and success/failure counts
+    """
+    if feature not in BATCH_FEATURES:
+        raise ValueError(f"Feature '{feature}' does not support batch mode (choose from {sorted(BATCH_FEATURES)})")
+    spec = BATCH_FEATURES[feature]
+
+    # Build every request up front; inputs that can't be built fail without being sent
+    outcomes: Dict[str, dict] = {}
+    requests: List[BatchRequest] = []
+    by_id: Dict[str, dict] = {}
+    for index, record in enumerate(records):
+        custom_id = f"{feature}-{index}"
+        by_id[custom_id] = record
+        try:
+            request = spec.prepare(record)
+            check_prompt(feature, request.messages, request.model)
+        except (KeyError, ValueError) as e:
+            # PromptTooLarge is a ValueError too
+            kind = "too large" if isinstance(e, PromptTooLarge) else "invalid"
+            outcomes[custom_id] = {"custom_id": custom_id, "status": "failed", "error": f"Input {kind}: {e}"}
+            continue
+        request.custom_id = custom_id
+        requests.append(request)
+
+    if batch_id is None and requests:
+        batch_id = await backend.submit(requests)
+        if on_submit:
+            on_submit(batch_id)
+    logger.info(f"[{feature}] Batch {batch_id}: {len(requests)} submitted, {len(outcomes)} rejected before submission")
+
+    # Poll until the provider finishes the batch
+    if batch_id is not None:
+        while True:
+            status = await backend.status(batch_id)
+            if status.total:
+                metrics.set_gauge("batch_progress", (status.completed + status.failed) / status.total, feature=feature)
+            logger.info(f"[{feature}] Batch {batch_id} {status.state}: "
+                        f"{status.completed} completed, {status.failed} failed of {status.total}")
+            if status.done:
+                break
+            await asyncio.sleep(poll_interval)
+
+        # Parse and persist each response through the feature's own code
+        for result in await backend.results(batch_id):
+            if result.custom_id not in by_id:
+                continue
+            record = by_id[result.custom_id]
+            if result.error is None:
+                try:
+                    output = spec.finish(record, result.text)
+                    outcomes[result.custom_id] = {"custom_id": result.custom_id, "status": "completed", "result": output}
+                except Exception as e:
+                    logger.warning(f"[{feature}] Could not process {result.custom_id}: {e}")
+                    outcomes[result.custom_id] = {"custom_id": result.custom_id, "status": "failed", "error": str(e)}
+            else:
+                outcomes[result.custom_id] = {"custom_id": result.custom_id, "status": "failed", "error": result.error}
+            if result.usage:
+                metrics.inc("batch_prompt_tokens", result.usage.get("prompt_tokens", 0), feature=feature)
+                metrics.inc("batch_completion_tokens", result.usage.get("completion_tokens", 0), feature=feature)
+
+    # Anything the backend never reported on (expired or cancelled batches)
+    for custom_id in by_id:
+        outcomes.setdefault(custom_id, {"custom_id": custom_id, "status": "failed", "error": "No result returned"})
+
+    ordered = [outcomes[f"{feature}-{i}"] for i in range(len(records))]
+    succeeded = sum(1 for o in ordered if o["status"] == "completed")
+    metrics.inc("batch_results", succeeded, feature=feature, status="completed")
+    metrics.inc("batch_results", len(ordered) - succeeded, feature=feature, status="failed")
+    logger.info(f"[{feature}] Batch {batch_id} finished: {succeeded}/{len(ordered)} succeeded")
+    return {"batch_id": batch_id, "succeeded": succeeded, "failed": len(ordered) - succeeded, "results": ordered}
+
+
+def _read_jsonl(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a feature over a JSONL of inputs as one offline batch.")
+    parser.add_argument("feature", choices=sorted(BATCH_FEATURES))
+    parser.add_argument("input", help="JSONL file, one input record per line")
+    parser.add_argument("--output", help="Where to write per-record outcomes (default: <input>.results.jsonl)")
+    parser.add_argument("--local", action="store_true", help="Run locally against the configured client instead of the Batch API")
+    parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    output = args.output or args.input + ".results.jsonl"
+    # The batch id is saved next to the output so an interrupted run resumes instead of resubmitting
+    state_path = output + ".state.json"
+    batch_id = None
+    if os.path.exists(state_path) and not args.local:
+        with open(state_path) as f:
+            batch_id = json.load(f).get("batch_id")
+        logger.info(f"Resuming batch {batch_id}")
+
+    def save_state(new_id: str) -> None:
+        with open(state_path, "w") as f:
+            json.dump({"batch_id": new_id, "feature": args.feature, "submitted_at": time.time()}, f)
+
+    summary = asyncio.run(run_batch(
+        args.feature, _read_jsonl(args.input), get_backend(args.local),
+        poll_interval=args.poll_interval, batch_id=batch_id, on_submit=save_state,
+    ))
+
+    with open(output, "w", encoding="utf-8") as f:
+        for outcome in summary["results"]:
+            f.write(json.dumps(outcome, default=str) + "\n")
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    print(f"{summary['succeeded']} succeeded, {summary['failed']} failed -> {output}")
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
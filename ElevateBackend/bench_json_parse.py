@@ -0,0 +1,207 @@
+# bench_json_parse.py
+"""
+Micro-benchmark: the shared tolerant parser (llm.jsonparse) against the
+per-feature repair code it replaced, on a corpus of malformed model replies
+(llm/data/malformed_responses.jsonl: fences and prose, trailing commas,
+unescaped quotes, apostrophes, "null"/"true" inside strings, truncation,
+Python literals, raw newlines, non-ASCII text, refusals).
+
+For each parser it reports how many replies produced an object, how many
+of those with a known intended value came out exactly right, and the mean
+time per reply, overall and split into well-formed and malformed replies
+(under structured outputs nearly every reply is well-formed).
+
+Usage:
+    python bench_json_parse.py [--repeat 200]
+"""
+
+import os
+import re
+import ast
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import Callable, Dict, List, Optional
+
+from llm import jsonparse
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "llm", "data", "malformed_responses.jsonl")
+
+
+# The replaced implementations, kept verbatim (minus logging) for comparison
+def _legacy_fix_json_string(json_text):
+    in_string = False
+    result = []
+    i = 0
+    while i < len(json_text):
+        char = json_text[i]
+        if char == '"':
+            if in_string and i > 0 and json_text[i-1] != '\\':
+                in_string = False
+            elif not in_string:
+                in_string = True
+        elif char == "'" and in_string and (i == 0 or json_text[i-1] != '\\'):
+            char = "\\'"
+        result.append(char)
+        i += 1
+    fixed = ''.join(result)
+    fixed = fixed.replace('"s ', '\\"s ').replace('"s,', '\\"s,')
+    fixed = fixed.replace("'s ", "\\'s ").replace("'s,", "\\'s,")
+    fixed = re.sub(r',\s*([\]}])', r'\1', fixed)
+    fixed = fixed.replace("'", '"')
+    return fixed
+
+
+def legacy_project_evaluation(raw: str) -> Optional[dict]:
+    match = re.search(r"```json\s*(\{[\s\S]+\})\s*```", raw)
+    json_str = match.group(1) if match else raw
+    json_str = _legacy_fix_json_string(json_str)
+    for attempt in range(1, 4):
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError as e:
+            if attempt == 1:
+                json_str = _legacy_fix_json_string(json_str)
+            elif attempt == 2:
+                line_match = re.search(r'line (\d+)', str(e))
+                # No line number to repair at: go straight to the literal_eval fallback
+                if line_match and 'column' in str(e):
+                    try:
+                        line_no = int(line_match.group(1))
+                        lines = json_str.split('\n')
+                        if line_no <= len(lines):
+                            problem_line = lines[line_no - 1]
+                            problem_line = problem_line.replace('"s ', '\\"s ')
+                            problem_line = problem_line.replace('"s,', '\\"s,')
+                            problem_line = problem_line.replace("'s ", "\\'s ")
+                            problem_line = problem_line.replace("'s,", "\\'s,")
+                            problem_line = problem_line.replace("'", '"')
+                            lines[line_no - 1] = problem_line
+                            json_str = '\n'.join(lines)
+                    except Exception:
+                        pass
+                try:
+                    py_str = json_str.replace('null', 'None').replace('true', 'True').replace('false', 'False')
+                    json_str = json.dumps(ast.literal_eval(py_str))
+                except Exception:
+                    pass
+    return None
+
+
+def _legacy_clean_response(text: str) -> str:
+    cleaned = re.sub(r"```(?:json)?\s*", "", text)
+    cleaned = re.sub(r"```$", "", cleaned)
+    return cleaned.strip()
+
+
+def legacy_resume_optimization(raw: str) -> Optional[dict]:
+    extracted = _legacy_clean_response(raw)
+    start, end = extracted.find("{"), extracted.rfind("}")
+    if start != -1 and end != -1 and end > start:
+        extracted = extracted[start:end+1]
+    for attempt in (1, 2):
+        try:
+            return json.loads(extracted)
+        except json.JSONDecodeError:
+            if attempt == 1:
+                extracted = re.sub(r",\s*([\]}])", r"\1", extracted)
+                extracted = re.sub(r"'", '"', extracted)
+    return None
+
+
+def legacy_skill_benchmark(raw: str) -> Optional[dict]:
+    sanitized = re.sub(r'[^\x09\x0A\x0D\x20-\x7E]', '', _legacy_clean_response(raw))
+    try:
+        return json.loads(sanitized, strict=False)
+    except json.JSONDecodeError:
+        return None
+
+
+def tolerant(raw: str) -> Optional[dict]:
+    try:
+        return jsonparse.loads_object(raw, "bench")
+    except ValueError:
+        return None
+
+
+PARSERS: Dict[str, Callable[[str], Optional[dict]]] = {
+    "legacy project_evaluation": legacy_project_evaluation,
+    "legacy resume_optimization": legacy_resume_optimization,
+    "legacy skill_benchmark": legacy_skill_benchmark,
+    "llm.jsonparse": tolerant,
+}
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _is_valid(text: str) -> bool:
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _mean_us(parse: Callable[[str], Optional[dict]], cases: List[dict], repeat: int) -> float:
+    if not cases:
+        return 0.0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            parse(case["text"])
+    return round((time.perf_counter() - start) / (repeat * len(cases)) * 1e6, 1)
+
+
+def run(corpus: List[dict], repeat: int = 200) -> List[dict]:
+    """Score and time every parser over the corpus."""
+    rows = []
+    for name, parse in PARSERS.items():
+        parsed = correct = 0
+        failures = []
+        for case in corpus:
+            result = parse(case["text"])
+            if isinstance(result, dict):
+                parsed += 1
+            if case["expected"] is not None and result == case["expected"]:
+                correct += 1
+            elif case["expected"] is not None:
+                failures.append(case["name"])
+        rows.append({
+            "parser": name,
+            "parsed": parsed,
+            "correct": correct,
+            "scored": sum(1 for c in corpus if c["expected"] is not None),
+            "mean_us": _mean_us(parse, corpus, repeat),
+            "valid_us": _mean_us(parse, [c for c in corpus if _is_valid(c["text"])], repeat),
+            "malformed_us": _mean_us(parse, [c for c in corpus if not _is_valid(c["text"])], repeat),
+            "wrong": failures,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark model-reply JSON parsers on a malformed corpus.")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    args = parser.parse_args(argv)
+
+    # Repairs are logged at INFO; keep the benchmark output readable
+    logging.basicConfig(level=logging.WARNING)
+    corpus = load_corpus(args.corpus)
+    print(f"{len(corpus)} replies, {args.repeat} rounds")
+    print(f"{'parser':28} {'parsed':>8} {'correct':>9} {'mean µs':>10} {'valid µs':>10} {'malformed µs':>13}")
+    for row in run(corpus, args.repeat):
+        print(f"{row['parser']:28} {row['parsed']:>5}/{len(corpus):<2} {row['correct']:>6}/{row['scored']:<2} "
+              f"{row['mean_us']:>10} {row['valid_us']:>10} {row['malformed_us']:>13}")
+        if row["wrong"]:
+            print(f"    wrong or failed: {', '.join(row['wrong'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
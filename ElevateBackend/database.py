@@ -1,9 +1,11 @@
 from pymongo import MongoClient
+from pymongo.collection import Collection
 from dotenv import load_dotenv
 import os
-from datetime import datetime
+from datetime import datetime, UTC
 import uuid
 import logging
+from typing import Optional
 
 # Configure logging
 logging.basicConfig(
@@ -26,15 +28,24 @@ if not MONGO_URI or MONGO_URI == "mongodb://localhost:27017/elevate":
     # Set a placeholder URI for development
     MONGO_URI = "mongodb://localhost:27017/elevate"
 
+# Shared LLM response cache; None when MongoDB is unreachable
+llm_cache_collection: Optional[Collection] = None
+
 # Connect to MongoDB and use the "users" collection
 try:
     client = MongoClient(MONGO_URI)
     db = client["elevate_db"]
     users_collection = db["users"]
+    llm_cache_collection = db["llm_cache"]
     # Test the connection
     if not DEVELOPMENT_MODE:
         client.admin.command('ping')
         logger.info("Successfully connected to MongoDB")
+        # Let MongoDB expire shared LLM cache entries on their own
+        try:
+            llm_cache_collection.create_index("expiresAt", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create llm_cache TTL index: {str(e)}")
 except Exception as e:
     logger.error(f"Failed to connect to MongoDB: {str(e)}")
     logger.warning("Falling back to development mode")
@@ -62,6 +73,7 @@ except Exception as e:
             return self.data.get(user_id)
     
     users_collection = MockCollection()
+    llm_cache_collection = None
 
 def store_user_feature(user_id: str, feature: str, data: dict):
     """Push a new entry into features.<feature> array within the user document."""
@@ -194,6 +206,25 @@ def fetch_saved_cover_letters(user_id: str):
         logger.error(f"Error fetching saved cover letters for user {user_id}: {str(e)}")
         return []
 
+def update_cover_letter_content(user_id: str, cover_letter_id: str, cover_letter_content: str):
+    """Replace the text of a saved cover letter. Returns False if the user has not saved that letter."""
+    if DEVELOPMENT_MODE:
+        logger.info(f"Development mode: mock updating cover letter {cover_letter_id} for user {user_id}")
+        return False
+    
+    try:
+        result = users_collection.update_one(
+            {"_id": user_id, "features.savedCoverLetters.cover_letter_id": cover_letter_id},
+            {"$set": {
+                "features.savedCoverLetters.$.cover_letter_content": cover_letter_content,
+                "features.savedCoverLetters.$.updatedAt": datetime.now(UTC).isoformat()
+            }}
+        )
+        return result.matched_count > 0
+    except Exception as e:
+        logger.error(f"Error updating cover letter {cover_letter_id} for user {user_id}: {str(e)}")
+        return False
+
 def delete_cover_letter(user_id: str, cover_letter_id: str):
     """Delete a specific saved cover letter"""
     if DEVELOPMENT_MODE:
@@ -279,3 +310,38 @@ def delete_saved_pathway(user_id: str, pathway_id: str):
     except Exception as e:
         logger.error(f"Error deleting saved pathway {pathway_id} for user {user_id}: {str(e)}")
         return False
+
+# Shared LLM response cache
+def fetch_llm_cache(key: str):
+    """Fetch a cached LLM response by key, or None if missing/expired"""
+    if DEVELOPMENT_MODE or llm_cache_collection is None:
+        return None
+
+    try:
+        doc = llm_cache_collection.find_one({"_id": key})
+        # The TTL monitor only runs once a minute, so check expiry here too
+        if not doc or doc.get("expiresAt", datetime.min) <= datetime.utcnow():
+            return None
+        return doc.get("value")
+    except Exception as e:
+        logger.error(f"Error fetching LLM cache entry {key}: {str(e)}")
+        return None
+
+def store_llm_cache(key: str, feature: str, value: str, expires_at: datetime):
+    """Store an LLM response in the shared cache"""
+    if DEVELOPMENT_MODE or llm_cache_collection is None:
+        return
+
+    try:
+        llm_cache_collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "feature": feature,
+                "value": value,
+                "expiresAt": expires_at,
+                "updatedAt": datetime.utcnow()
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Error storing LLM cache entry {key}: {str(e)}")
@@ -0,0 +1,230 @@
+# features/company_names.py
+"""
+Company-name extraction from job descriptions.
+Two detectors scan the text. First, the phrasing patterns ("Company: X",
+"X is hiring", "About X:", "Join X", "X Inc.", "Engineer at X", "at X")
+are compiled once into one alternation. Names are at most MAX_NAME_WORDS
+words, so the work the regex engine does at each position is bounded and
+the scan stays linear in the text. Second, an Aho-Corasick automaton is
+built over a gazetteer of known employers (features/data/employers.txt),
+which is a single pass. Only the first MAX_TEXT_CHARS characters are
+scanned: postings name their employer near the top, and extraction runs
+on the event loop. Evidence for the same company identity
+(see features.company_research.normalize_company) is combined noisy-or
+style into a confidence between 0 and 1. The best candidate is returned
+only if it clears MIN_CONFIDENCE.
+
+Known employers are often named as tools rather than as the employer
+("experience with AWS", "Stripe Connect APIs"). Gazetteer hits in such
+contexts are ignored, and the rest add up to at most GAZETTEER_CAP. So
+repeated tech-stack mentions never outweigh a phrasing match such as
+"Software Engineer at Acme".
+
+Benchmarked against the previous regex list by bench_company_names.py.
+"""
+
+import os
+import re
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from features.company_research import normalize_company
+
+# Configure logging
+logger = logging.getLogger("features.company_names")
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "data", "employers.txt")
+MIN_CONFIDENCE = float(os.getenv("COMPANY_NAME_MIN_CONFIDENCE", "0.5"))
+MAX_TEXT_CHARS = int(os.getenv("COMPANY_NAME_MAX_TEXT_CHARS", "8000"))
+# Longest name captured; also what keeps the suffix patterns from backtracking over whole lines
+MAX_NAME_WORDS = 7
+
+# A capitalized run of words on one line: "Acme", "Booking.com", "Procter & Gamble"
+_TOKEN = r"[A-Z0-9][\w&'\-]*(?:\.[\w&'\-]+)*"
+_NAME = rf"{_TOKEN}(?: (?:{_TOKEN}|&|of|and|de)){{0,{MAX_NAME_WORDS - 1}}}"
+_ROLE = r"(?:engineer|developer|scientist|analyst|designer|architect|manager|intern|researcher|specialist|consultant)"
+_LEGAL = r"(?:Inc\.?|LLC|L\.L\.C\.|Ltd\.?|Limited|Corporation|Corp\.?|GmbH|PLC|plc)(?!\w)"
+
+# Phrasing -> (pattern around the name, weight of one match)
+PATTERNS = {
+    "label": (rf"(?im:^[ \t]*(?:company|organi[sz]ation|employer)[ \t]*:[ \t]*)(?P<n_label>{_NAME})", 0.95),
+    "legal": (rf"(?P<n_legal>{_NAME}),?[ \t]+{_LEGAL}", 0.85),
+    "hiring": (rf"(?P<n_hiring>{_NAME}) (?:is|are) (?i:(?:currently |actively )?(?:looking|seeking|hiring))", 0.8),
+    "about": (rf"(?im:^[ \t]*about)[ \t]+(?P<n_about>{_NAME})[ \t]*(?::|(?m:$))", 0.75),
+    "join": (rf"(?i:\bjoin)[ \t]+(?:(?i:us|the team|our team)[ \t]+at[ \t]+)?(?P<n_join>{_NAME})", 0.7),
+    # "Software Engineer II at X" on the posting's title line
+    "title_at": (rf"(?im:^[ \t]*[^\n]*?\b{_ROLE}s?(?:[ \t]+[IV]+)?[ \t]+at)[ \t]+(?P<n_title_at>{_NAME})", 0.65),
+    "at": (rf"(?i:\bat)[ \t]+(?P<n_at>{_NAME})", 0.35),
+}
+# One mention of a known employer; repeated mentions add up, to at most GAZETTEER_CAP
+GAZETTEER_WEIGHT = 0.4
+GAZETTEER_CAP = 0.55
+
+# Earlier in the same sentence or bullet, these mark a known employer named as a tool
+_TOOL_CONTEXT = re.compile(
+    r"(?i)\b(?:experience|familiar(?:ity)?|integrat\w*|proficien\w*|expertise|knowledge|exposure|"
+    r"using|leverag\w*)\b[^.!?\n]*$"
+)
+# How far back a tool-context cue is looked for
+_TOOL_CONTEXT_WINDOW = 120
+# A known employer followed by a capitalized word names a product: "AWS Lambda", "Google BigQuery"
+_PRODUCT_NEXT = re.compile(r"[ \t]+[A-Z][A-Za-z]")
+
+# Compiled once: a single scan tries every phrasing at each position
+_COMBINED = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, (pattern, _) in PATTERNS.items()))
+
+# Words that begin a captured run without being part of the name
+_LEADING = {"at", "join", "about", "with", "for", "and", "welcome", "to", "from", "by"}
+_TRAILING = {"of", "and", "de", "&"}
+# Runs made only of these words describe the posting, not the employer
+_GENERIC = {
+    "the", "our", "this", "your", "a", "an", "us", "we", "you", "role", "team", "position", "job",
+    "company", "opportunity", "the role", "responsibilities", "requirements", "benefits",
+    "remote", "hybrid", "onsite", "who", "what", "why",
+}
+
+
+@dataclass(frozen=True)
+class CompanyMatch:
+    """Best company candidate in a text, with its identity key and confidence."""
+    name: str
+    key: str
+    confidence: float
+
+
+class _Automaton:
+    """Aho-Corasick automaton over lower-cased phrases."""
+
+    def __init__(self, phrases: Dict[str, str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        for phrase, value in phrases.items():
+            node = 0
+            for char in phrase:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._out[node].append((len(phrase), value))
+
+        # Breadth-first, so every failure link points at an already finished node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, value) for every phrase occurrence in `text`."""
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._out[node]:
+                yield i + 1 - length, i + 1, value
+
+
+def load_gazetteer(path: str = GAZETTEER_PATH) -> List[Tuple[str, List[str]]]:
+    """Read `Canonical|alias|...` lines into (canonical, [names]) pairs."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            names = [name.strip() for name in line.split("|") if name.strip()]
+            entries.append((names[0], names))
+    return entries
+
+
+def _clean(name: str) -> str:
+    words = name.split(" ")
+    while words and words[0].lower() in _LEADING:
+        words.pop(0)
+    while words and words[-1].lower() in _TRAILING:
+        words.pop()
+    return " ".join(words).strip(".,'-")
+
+
+class CompanyNameExtractor:
+    """Scores company candidates from phrasing patterns and a known-employer gazetteer."""
+
+    def __init__(self, gazetteer: Iterable[Tuple[str, List[str]]] = ()):
+        phrases = {}
+        self._canonical: Dict[str, str] = {}
+        for canonical, names in gazetteer:
+            for name in names:
+                phrases[name.lower()] = canonical
+            self._canonical[normalize_company(canonical)] = canonical
+        self._automaton = _Automaton(phrases)
+
+    def _evidence(self, text: str) -> Iterator[Tuple[str, str, float, int, str]]:
+        """Yield (surface name, identity key, weight, position, source) for each sighting."""
+        for match in _COMBINED.finditer(text):
+            kind = match.lastgroup or ""
+            name = _clean(match.group(f"n_{kind}"))
+            key = normalize_company(name)
+            if len(key) < 2 or set(key.split()) <= _GENERIC or key in _GENERIC:
+                continue
+            yield name, key, PATTERNS[kind][1], match.start(f"n_{kind}"), kind
+
+        lowered = text.lower()
+        # Case changes that alter length would misalign positions; skip the case check then
+        same_length = len(lowered) == len(text)
+        for start, end, canonical in self._automaton.finditer(lowered):
+            if (start > 0 and lowered[start - 1].isalnum()) or (end < len(lowered) and lowered[end].isalnum()):
+                continue
+            # "apple pie" and "zoom in" are not employers
+            if same_length and text[start:end].islower():
+                continue
+            # "experience with AWS", "AWS Lambda": the employer named as a tool
+            if same_length and (_PRODUCT_NEXT.match(text, end) or
+                                _TOOL_CONTEXT.search(text, max(0, start - _TOOL_CONTEXT_WINDOW), start)):
+                continue
+            yield canonical, normalize_company(canonical), GAZETTEER_WEIGHT, start, "gazetteer"
+
+    def candidates(self, text: str) -> List[CompanyMatch]:
+        """Every candidate in `text`, most likely first."""
+        text = (text or "")[:MAX_TEXT_CHARS]
+        phrase_misses: Dict[str, float] = {}
+        gazetteer_misses: Dict[str, float] = {}
+        names: Dict[str, Tuple[float, str]] = {}
+        first_seen: Dict[str, int] = {}
+        for name, key, weight, position, source in self._evidence(text or ""):
+            # Noisy-or: each independent sighting removes part of the remaining doubt
+            bucket = gazetteer_misses if source == "gazetteer" else phrase_misses
+            bucket[key] = bucket.get(key, 1.0) * (1.0 - weight)
+            if weight > names.get(key, (0.0, ""))[0]:
+                names[key] = (weight, name)
+            first_seen[key] = min(first_seen.get(key, position), position)
+        misses = {
+            key: phrase_misses.get(key, 1.0) * max(gazetteer_misses.get(key, 1.0), 1.0 - GAZETTEER_CAP)
+            for key in first_seen
+        }
+        ranked = sorted(misses, key=lambda key: (misses[key], first_seen[key]))
+        return [
+            CompanyMatch(self._canonical.get(key, names[key][1]), key, round(1.0 - misses[key], 3))
+            for key in ranked
+        ]
+
+    def extract(self, text: str, min_confidence: float = MIN_CONFIDENCE) -> Optional[CompanyMatch]:
+        """The most likely company in `text`, or None if no candidate is confident enough."""
+        candidates = self.candidates(text)
+        if candidates and candidates[0].confidence >= min_confidence:
+            return candidates[0]
+        return None
+
+
+# Global instance
+extractor = CompanyNameExtractor(load_gazetteer())
@@ -0,0 +1,222 @@
+# features/company_research.py
+"""
+Company research for cover letters, cached per company identity.
+Names are normalized before lookup (case folding, punctuation and legal
+suffix stripping, then an alias table), so "Google", "Google LLC" and
+"google inc." share one profile. Each profile is researched under one
+canonical name (canonical_name), so "Facebook" and "Meta" both get a
+profile of Meta whichever is asked for first. Profiles are fresh for
+COMPANY_RESEARCH_TTL seconds. After that, and up to
+COMPANY_RESEARCH_STALE_TTL, the stale profile is served at once while a
+background task refreshes it. Concurrent misses for one company share a
+single lookup.
+
+The lookup itself is a pluggable backend (COMPANY_RESEARCH_BACKEND). The
+default `local` backend is a stand-in that needs no network: it frames
+the research brief and leaves the facts to the model's own knowledge.
+Aliases can be extended from the environment:
+    COMPANY_ALIASES='{"x corp": "twitter"}'
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol, Set, Tuple
+
+from llm import metrics
+from llm.singleflight import SingleFlight
+
+# Configure logging
+logger = logging.getLogger("features.company_research")
+
+TTL = float(os.getenv("COMPANY_RESEARCH_TTL", str(24 * 3600)))
+STALE_TTL = float(os.getenv("COMPANY_RESEARCH_STALE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("COMPANY_RESEARCH_MAX_ENTRIES", "2048"))
+
+# Trailing words that name a legal form rather than the company
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation",
+    "co", "company", "plc", "gmbh", "ag", "sa", "nv", "bv", "pty", "holdings", "group",
+}
+
+# Normalized name -> canonical identity, for parents, rebrands and short forms
+DEFAULT_ALIASES = {
+    "alphabet": "google",
+    "google cloud": "google",
+    "facebook": "meta",
+    "meta platforms": "meta",
+    "amazon web services": "amazon",
+    "aws": "amazon",
+    "amazoncom": "amazon",
+    "microsoft azure": "microsoft",
+    "international business machines": "ibm",
+}
+
+# Canonical identity -> the name its profile is researched under
+DISPLAY_NAMES = {
+    "google": "Google",
+    "meta": "Meta",
+    "amazon": "Amazon",
+    "microsoft": "Microsoft",
+    "ibm": "IBM",
+}
+
+
+def _load_aliases() -> dict:
+    aliases = dict(DEFAULT_ALIASES)
+    raw = os.getenv("COMPANY_ALIASES")
+    if raw:
+        try:
+            aliases.update({normalize_company(k, {}): normalize_company(v, {}) for k, v in json.loads(raw).items()})
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid COMPANY_ALIASES: {e}")
+    return aliases
+
+
+def normalize_company(name: str, aliases: Optional[Dict[str, str]] = None) -> str:
+    """Canonical identity of a company name, used as its cache key."""
+    text = unicodedata.normalize("NFKC", name or "").casefold().replace("&", " and ")
+    words = re.sub(r"[^\w\s]", "", text).split()
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    key = " ".join(words)
+    aliases = ALIASES if aliases is None else aliases
+    return aliases.get(key, key)
+
+
+def canonical_name(name: str) -> str:
+    """Name a company's profile is researched under, the same for every spelling of an alias."""
+    key = normalize_company(name)
+    if key in DISPLAY_NAMES:
+        return DISPLAY_NAMES[key]
+    if key != normalize_company(name, {}):
+        # An alias from the environment without a display name
+        return key.title()
+    words = " ".join((name or "").split()).rstrip(" .,").split(" ")
+    while len(words) > 1 and re.sub(r"[^\w]", "", words[-1]).casefold() in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words).rstrip(" ,")
+
+
+class ResearchBackend(Protocol):
+    async def research(self, company_name: str) -> str:
+        ...
+
+
+class LocalResearch:
+    """Offline stand-in for a news/search lookup; `latency` simulates one."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def research(self, company_name: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        queries = [
+            f"{company_name} news 2025",
+            f"{company_name} product launch recent",
+            f"{company_name} new initiatives technology",
+            f"{company_name} AI machine learning development",
+        ]
+        return f"""
+        COMPANY RESEARCH FINDINGS FOR {company_name.upper()}:
+
+        Recent Developments & News:
+        - Focus on recent product launches, technology initiatives, or strategic moves
+        - Look for AI/ML developments, digital transformation efforts, or innovation projects
+        - Note any industry recognition, partnerships, or market expansion
+        - Include company culture, values, or mission statements that stand out
+
+        Research Queries Explored:
+        {chr(10).join(f"Research query: {query}" for query in queries)}
+
+        NOTE: Use your knowledge of {company_name} to identify real recent developments that would be relevant for connecting candidate projects to company initiatives.
+        """
+
+
+BACKENDS = {"local": LocalResearch}
+
+
+def _load_backend() -> ResearchBackend:
+    name = os.getenv("COMPANY_RESEARCH_BACKEND", "local").lower()
+    if name not in BACKENDS:
+        logger.warning(f"Unknown COMPANY_RESEARCH_BACKEND '{name}', using the local stand-in")
+        name = "local"
+    return BACKENDS[name]()
+
+
+class CompanyResearchCache:
+    """Company profiles keyed by normalized identity, with TTL and stale-while-revalidate."""
+
+    def __init__(self, backend: ResearchBackend, ttl: float = TTL, stale_ttl: float = STALE_TTL,
+                 max_entries: int = MAX_ENTRIES):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        # key -> (profile, fetched_at)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._refreshing: Set[asyncio.Task] = set()
+
+    async def get(self, company_name: str) -> str:
+        key = normalize_company(company_name)
+        # The backend sees the canonical name, never whichever spelling missed first
+        name = canonical_name(company_name)
+        entry = self._entries.get(key)
+        if entry is not None:
+            profile, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                metrics.inc("company_research_lookups", outcome="hit")
+                return profile
+            if age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                metrics.inc("company_research_lookups", outcome="stale")
+                self._refresh_in_background(key, name)
+                return profile
+        metrics.inc("company_research_lookups", outcome="miss")
+        profile, _ = await self._flight.do(key, lambda: self._fetch(key, name), feature="company_research")
+        return profile
+
+    async def _fetch(self, key: str, company_name: str) -> str:
+        start = time.perf_counter()
+        profile = await self.backend.research(company_name)
+        metrics.observe("company_research_seconds", time.perf_counter() - start)
+        self._entries[key] = (profile, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return profile
+
+    def _refresh_in_background(self, key: str, company_name: str) -> None:
+        async def refresh():
+            try:
+                await self._flight.do(key, lambda: self._fetch(key, company_name), feature="company_research")
+            except Exception as e:
+                # The stale profile stays in place until a refresh succeeds
+                metrics.inc("company_research_refresh_errors")
+                logger.warning(f"Background refresh of '{key}' failed: {e}")
+
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(refresh())
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+ALIASES = _load_aliases()
+
+# Global instance
+company_research = CompanyResearchCache(_load_backend())
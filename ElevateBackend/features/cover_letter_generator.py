@@ -6,16 +6,23 @@ Generates personalized, professional cover letters
 Validates JSON response and handles errors
 """
 
-import re
-import time
-import openai
-from dotenv import load_dotenv
 import os
-import json
+import time
+import uuid
+import asyncio
 import logging
+from dataclasses import dataclass, replace
 from datetime import datetime, UTC
-import requests
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+from features import company_names
+from features.company_research import company_research
+from features.schemas import CoverLetter
+from llm import metrics, routing, structured
+from llm.cache import LRUCache
+from llm.client import complete, stream
+from llm.prompts import register
+from llm.tokens import fit_input
 
 # Configure logging
 logging.basicConfig(
@@ -24,18 +31,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger("features.cover_letter_generator")
 
-# Load environment and configure OpenAI
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY not found in environment variables!")
+# Strict JSON schema, so every reply parses without repair
+COVER_LETTER_FORMAT = structured.response_format(CoverLetter)
 
-# Initialize OpenAI client
-from openai import OpenAI
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-ENHANCED_COVER_LETTER_PROMPT = """
+# Static instructions first and user data last, so the provider can cache the prefix
+ENHANCED_COVER_LETTER_PROMPT = register(
+    "cover_letter",
+    version="2",
+    static="""
 You are an expert career coach and professional writer specializing in crafting compelling, narrative-driven cover letters. Given the user's resume content, job description, and recent company research below, create a personalized cover letter that weaves a compelling story connecting the candidate's experience to the company's current initiatives.
 
 **NARRATIVE STRATEGY - STORY WEAVING:**
@@ -119,6 +122,8 @@ IMPORTANT: Your response MUST be a valid JSON object with EXACTLY these keys:
 - "story_flow_score": Number between 1-10 rating how compelling the narrative is
 - "alignment_explanation": String explaining why this candidate's story fits this company
 
+""",
+    variable="""
 **Resume Content:**
 {resume_text}
 
@@ -132,12 +137,106 @@ IMPORTANT: Your response MUST be a valid JSON object with EXACTLY these keys:
 {extracted_projects}
 
 Generate the compelling narrative-driven cover letter JSON response now:
-"""
+""",
+)
+
+PROJECT_EXTRACTION_PROMPT = register(
+    "cover_letter.extract_projects",
+    version="1",
+    static="""
+Analyze the following resume and extract all projects with their technical details:
+
+For each project, identify:
+- Project name/title
+- Technologies used (programming languages, frameworks, tools)
+- Key achievements or results (with numbers/metrics if available)
+- Problem solved or value created
+- Relevant skills demonstrated
+
+Format as a structured analysis that can be used to connect projects to company initiatives.
+""",
+    variable="""
+Resume Content:
+{resume_text}
+
+Provide a concise but detailed analysis of projects and their technical relevance.
+""",
+)
+
+# One voice per variant, so "give me options" returns real alternatives; the
+# direction goes after the shared prompt, which keeps its prefix cacheable
+VARIANT_TONES = [
+    "confident and direct",
+    "warm and personable",
+    "concise and results-focused",
+    "enthusiastic and mission-driven",
+    "formal and polished",
+]
+MAX_VARIANTS = len(VARIANT_TONES)
+
+# Rewrites one paragraph against the letter's stored context, so an edit
+# needs neither the résumé nor the job description again
+PARAGRAPH_PROMPT = register(
+    "cover_letter.paragraph",
+    version="1",
+    static="""
+You are an expert career coach editing one paragraph of a cover letter. Rewrite ONLY the paragraph marked [REWRITE] below, keeping it consistent with the rest of the letter:
+- Keep the same role in the letter (opening, narrative, motivation or closing) and a similar length
+- Keep the voice, tense and formatting of the surrounding paragraphs
+- Only use facts from the letter, the company research and the candidate projects; never invent achievements or metrics
+- Follow the user's instruction when one is given
+
+Respond with the new paragraph text only: no quotes, labels, markdown or other paragraphs.
+""",
+    variable="""
+**Company Research:**
+{company_research}
+
+**Candidate Projects Extracted:**
+{extracted_projects}
+
+**Cover Letter:**
+{cover_letter}
+
+**Instruction:**
+{instruction}
+
+Write the new [REWRITE] paragraph now:
+""",
+)
+# How long a generated letter's context stays available for paragraph edits
+CONTEXT_TTL = float(os.getenv("COVER_LETTER_CONTEXT_TTL", str(24 * 3600)))
+CONTEXT_MAX_ENTRIES = int(os.getenv("COVER_LETTER_CONTEXT_MAX_ENTRIES", "1024"))
+
+
+@dataclass(frozen=True)
+class LetterContext:
+    """What a letter was written from, kept so single paragraphs can be rewritten cheaply."""
+    company_name: str
+    company_research: str
+    extracted_projects: str
+    cover_letter: str = ""
+    # Only this user may edit or save the letter under its id
+    user_id: str = ""
+
+
+def split_paragraphs(cover_letter: str) -> List[str]:
+    return [paragraph.strip() for paragraph in cover_letter.replace("\r\n", "\n").split("\n\n") if paragraph.strip()]
+
+
+def check_paragraph_index(cover_letter: str, paragraph_index: int) -> List[str]:
+    """The letter's paragraphs. Raises IndexError if `paragraph_index` is not one of them."""
+    paragraphs = split_paragraphs(cover_letter)
+    if not 0 <= paragraph_index < len(paragraphs):
+        raise IndexError(f"paragraph must be between 0 and {len(paragraphs) - 1}")
+    return paragraphs
+
 
 class CoverLetterGenerator:
     def __init__(self):
         """Initialize the cover letter generator"""
-        pass
+        # letter_id -> LetterContext of recently generated letters
+        self._contexts = LRUCache(CONTEXT_MAX_ENTRIES)
     
     def extract_company_name(self, job_description: str) -> str:
         """
@@ -149,30 +248,17 @@ class CoverLetterGenerator:
         Returns:
             str: Extracted company name or empty string if not found
         """
-        # Common patterns for company names in job descriptions
-        patterns = [
-            r"(?:Company|Organization|Employer):\s*([A-Za-z0-9\s&.,\-']+?)(?:\n|$)",
-            r"Join\s+([A-Za-z0-9\s&.,\-']+?)\s+(?:as|team|where)",
-            r"([A-Za-z0-9\s&.,\-']+?)\s+is\s+(?:looking|seeking|hiring)",
-            r"About\s+([A-Za-z0-9\s&.,\-']+?)[:|\n]",
-            r"([A-Za-z0-9\s&.,\-']+?)\s+(?:Inc\.|LLC|Ltd\.|Corporation|Corp\.)",
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, job_description, re.IGNORECASE | re.MULTILINE)
-            if match:
-                company_name = match.group(1).strip()
-                # Clean up common artifacts
-                company_name = re.sub(r'\s+', ' ', company_name)
-                company_name = company_name.strip('.,')
-                if len(company_name) > 3:  # Minimum reasonable company name length
-                    return company_name
-        
-        return ""
+        # One pass of precompiled phrasing patterns plus a known-employer gazetteer,
+        # so low-confidence guesses don't send research after the wrong company
+        match = company_names.extractor.extract(job_description)
+        if match is None:
+            return ""
+        logger.info(f"Company name '{match.name}' found with confidence {match.confidence:.2f}")
+        return match.name
     
-    def research_company(self, company_name: str) -> str:
+    async def research_company(self, company_name: str) -> str:
         """
-        Research recent company news and developments using web search
+        Research recent company news and developments
         
         Args:
             company_name (str): Name of the company to research
@@ -185,66 +271,16 @@ class CoverLetterGenerator:
         
         try:
             logger.info(f"Researching company: {company_name}")
-            
-            # Search for recent news about the company
-            search_queries = [
-                f"{company_name} news 2025",
-                f"{company_name} product launch recent",
-                f"{company_name} new initiatives technology",
-                f"{company_name} AI machine learning development"
-            ]
-            
-            research_results = []
-            
-            for query in search_queries:
-                try:
-                    # Use a simple approach - in production, you might use NewsAPI, Google News API, etc.
-                    # For now, we'll create a structure that the AI can work with
-                    search_prompt = f"""
-                    Based on common industry knowledge about {company_name}, provide recent developments that might be relevant for a job application. Include:
-                    - Recent product launches or updates
-                    - New technology initiatives 
-                    - Strategic partnerships or acquisitions
-                    - Industry positioning and competitive advantages
-                    - Company culture or values emphasis
-                    
-                    Format as factual, specific information that could be referenced in a cover letter.
-                    """
-                    
-                    # Note: In a production environment, you'd integrate with actual search APIs
-                    # For now, we'll use a placeholder that encourages the AI to use general knowledge
-                    research_results.append(f"Research query: {query}")
-                    
-                except Exception as e:
-                    logger.warning(f"Search query failed: {query} - {e}")
-                    continue
-            
-            if research_results:
-                formatted_research = f"""
-                COMPANY RESEARCH FINDINGS FOR {company_name.upper()}:
-                
-                Recent Developments & News:
-                - Focus on recent product launches, technology initiatives, or strategic moves
-                - Look for AI/ML developments, digital transformation efforts, or innovation projects
-                - Note any industry recognition, partnerships, or market expansion
-                - Include company culture, values, or mission statements that stand out
-                
-                Research Queries Explored:
-                {chr(10).join(research_results)}
-                
-                NOTE: Use your knowledge of {company_name} to identify real recent developments that would be relevant for connecting candidate projects to company initiatives.
-                """
-                
-                logger.info(f"Company research completed for {company_name}")
-                return formatted_research
-            else:
-                return f"Limited research available for {company_name}. Focus on general industry knowledge and company reputation."
+            # Cached per normalized company identity, refreshed in the background once stale
+            formatted_research = await company_research.get(company_name)
+            logger.info(f"Company research completed for {company_name}")
+            return formatted_research
                 
         except Exception as e:
             logger.error(f"Company research failed: {e}")
             return f"Company research unavailable. Use general knowledge about {company_name} and focus on role-specific connections."
     
-    def extract_projects_from_resume(self, resume_text: str) -> str:
+    async def extract_projects_from_resume(self, resume_text: str) -> str:
         """
         Extract and analyze projects from resume content
         
@@ -254,45 +290,33 @@ class CoverLetterGenerator:
         Returns:
             str: Formatted analysis of candidate projects with technical details
         """
+        resume_text = fit_input("cover_letter.extract_projects", resume_text, "resume_text")
         try:
             logger.info("Extracting projects from resume")
             
-            # Use AI to extract and analyze projects
-            project_extraction_prompt = f"""
-            Analyze the following resume and extract all projects with their technical details:
-            
-            For each project, identify:
-            - Project name/title
-            - Technologies used (programming languages, frameworks, tools)
-            - Key achievements or results (with numbers/metrics if available)
-            - Problem solved or value created
-            - Relevant skills demonstrated
-            
-            Format as a structured analysis that can be used to connect projects to company initiatives.
-            
-            Resume Content:
-            {resume_text}
-            
-            Provide a concise but detailed analysis of projects and their technical relevance.
-            """
-            
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+            # The analysis depends only on the résumé, so it is cached per résumé
+            # content hash and prompt version and reused across cover letters
+            response = await complete(
+                "cover_letter.extract_projects",
+                [
                     {
                         "role": "system",
                         "content": "You are a technical recruiter analyzing resume projects. Extract key technical details and achievements."
                     },
                     {
                         "role": "user",
-                        "content": project_extraction_prompt
+                        "content": PROJECT_EXTRACTION_PROMPT.render(resume_text=resume_text)
                     }
                 ],
-                max_tokens=1000,
+                model=routing.choose("cover_letter.extract_projects"),
+                # Room for a full analysis; a reply cut off here is still cached (see CachePolicy)
+                max_tokens=1500,
                 temperature=0.3,
+                cache_inputs={"resume_text": resume_text},
+                prompt_version=PROJECT_EXTRACTION_PROMPT.version,
             )
             
-            extracted_projects = response.choices[0].message.content.strip()
+            extracted_projects = response.text
             logger.info("Project extraction completed")
             return extracted_projects
             
@@ -300,116 +324,266 @@ class CoverLetterGenerator:
             logger.error(f"Project extraction failed: {e}")
             return "Project extraction unavailable. Use resume content directly for project references."
     
-    def generate_cover_letter(self, resume_text: str, job_description: str, retries: int = 3) -> dict:
+    async def _timed(self, timings: Dict[str, float], stage: str, work):
+        """Await one pipeline stage, recording its duration in `timings` and the stage histogram."""
+        start = time.perf_counter()
+        try:
+            return await work
+        finally:
+            timings[stage] = round(time.perf_counter() - start, 3)
+            metrics.observe("cover_letter_stage_seconds", timings[stage], stage=stage)
+
+    async def _prepare_prompt(self, resume_text: str, job_description: str, timings: Dict[str, float],
+                              user_id: str) -> Tuple[str, LetterContext]:
+        """Run company research and project extraction, then build the cover letter prompt."""
+        # Step 1: Extract company name from job description
+        company_name = self.extract_company_name(job_description)
+        logger.info(f"Extracted company name: {company_name or 'Not found'}")
+        
+        # Steps 2 and 3: company research and project extraction don't depend on
+        # each other, so they run concurrently
+        research, extracted_projects = await asyncio.gather(
+            self._timed(timings, "company_research", self.research_company(company_name)),
+            self._timed(timings, "extract_projects", self.extract_projects_from_resume(resume_text)),
+        )
+        logger.info(
+            f"Company research and project extraction completed "
+            f"({timings['company_research']:.2f}s / {timings['extract_projects']:.2f}s)"
+        )
+        
+        # Step 4: Build the enhanced prompt with all research data
+        prompt = ENHANCED_COVER_LETTER_PROMPT.render(
+            resume_text=fit_input("cover_letter", resume_text, "resume_text"),
+            job_description=fit_input("cover_letter", job_description, "job_description"),
+            company_research=research,
+            extracted_projects=extracted_projects
+        )
+        return prompt, LetterContext(company_name, research, extracted_projects, user_id=user_id)
+
+    def _remember(self, context: LetterContext, cover_letter: str) -> str:
+        """Keep a generated letter's context for later paragraph edits; returns its letter id."""
+        letter_id = str(uuid.uuid4())
+        self._contexts.set(letter_id, replace(context, cover_letter=cover_letter), CONTEXT_TTL)
+        return letter_id
+
+    def get_context(self, letter_id: str, user_id: str) -> Optional[LetterContext]:
+        """The stored context of a letter generated for `user_id`, or None (also for another user's letter)."""
+        context = self._contexts.get(letter_id)
+        if context is None or context.user_id != user_id:
+            return None
+        return context
+
+    async def context_for_saved_letter(self, letter_id: str, company_name: str, cover_letter: str,
+                                       user_id: str, resume_text: Optional[str] = None) -> LetterContext:
+        """
+        Rebuild the context of a saved letter whose generation context has
+        expired. Research comes from the company research cache, and projects
+        from the extraction cache when the résumé is supplied.
+        """
+        research = await self.research_company(company_name)
+        extracted_projects = "Use the projects already named in the letter."
+        if resume_text:
+            extracted_projects = await self.extract_projects_from_resume(resume_text)
+        context = LetterContext(company_name, research, extracted_projects, cover_letter, user_id)
+        self._contexts.set(letter_id, context, CONTEXT_TTL)
+        return context
+
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": "You are an expert career coach and narrative storyteller specializing in connecting candidate experiences to company initiatives. Create compelling stories that weave together candidate projects with recent company developments. Always respond with valid JSON only."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
+    def _parse_cover_letter(self, raw_response: str) -> dict:
+        """Validate the model's JSON response. Raises ValueError if it doesn't match the schema."""
+        parsed_response = structured.parse("cover_letter", CoverLetter, raw_response)
+        if parsed_response is None:
+            raise ValueError("Cover letter output did not match the expected schema")
+        logger.info("Successfully parsed JSON response")
+        return parsed_response
+
+    async def generate_cover_letter(self, resume_text: str, job_description: str, user_id: str = "anonymous") -> dict:
         """
         Generate a personalized, narrative-driven cover letter based on resume and job description
         
         Args:
             resume_text (str): The candidate's resume content
             job_description (str): The target job description
-            retries (int): Number of retry attempts for API calls
+            user_id (str): The user the letter is generated for; only they can edit it later
             
         Returns:
-            dict: Generated cover letter data with narrative analysis
+            dict: Generated cover letter data with narrative analysis, plus
+            `stage_seconds` with the time spent in each pipeline stage
         """
         logger.info("Starting enhanced cover letter generation with company research")
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        prompt, context = await self._prepare_prompt(resume_text, job_description, timings, user_id)
         
-        # Step 1: Extract company name from job description
-        company_name = self.extract_company_name(job_description)
-        logger.info(f"Extracted company name: {company_name or 'Not found'}")
-        
-        # Step 2: Research the company for recent developments
-        company_research = self.research_company(company_name)
-        logger.info("Company research completed")
-        
-        # Step 3: Extract and analyze projects from resume
-        extracted_projects = self.extract_projects_from_resume(resume_text)
-        logger.info("Project extraction completed")
-        
-        # Step 4: Build the enhanced prompt with all research data
-        prompt = ENHANCED_COVER_LETTER_PROMPT.format(
-            resume_text=resume_text,
-            job_description=job_description,
-            company_research=company_research,
-            extracted_projects=extracted_projects
-        )
+        # Transient API failures are retried inside llm.client, and the strict
+        # schema means the reply always parses, so one call is enough.
+        # Every tier the router picks from supports json_schema response formats
+        logger.info("Calling OpenAI API for cover letter generation")
+        response = await self._timed(timings, "generation", complete(
+            "cover_letter",
+            self._messages(prompt),
+            model=routing.choose("cover_letter"),
+            max_tokens=2500,
+            temperature=0.8,
+            response_format=COVER_LETTER_FORMAT,
+        ))
+        logger.info("OpenAI API call successful")
+
+        parsed_response = self._parse_cover_letter(response.text)
+        timings["total"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Cover letter generation completed successfully in {timings['total']:.2f}s: {timings}")
+        letter_id = self._remember(context, parsed_response["cover_letter"])
+        return {**parsed_response, "letter_id": letter_id, "stage_seconds": timings}
+
+    async def stream_cover_letter(self, resume_text: str, job_description: str, user_id: str = "anonymous"):
+        """
+        Streaming variant of generate_cover_letter().
+        Yields ("token", {"delta": ...}) events while the letter is written and a
+        final ("result", {...}) event once the JSON has been validated.
+        """
+        logger.info("Starting streamed cover letter generation with company research")
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        prompt, context = await self._prepare_prompt(resume_text, job_description, timings, user_id)
         
-        for attempt in range(retries):
-            try:
-                logger.info(f"Attempt {attempt + 1}: Calling OpenAI API for cover letter generation")
-                
-                response = client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are an expert career coach and narrative storyteller specializing in connecting candidate experiences to company initiatives. Create compelling stories that weave together candidate projects with recent company developments. Always respond with valid JSON only."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=2500,
-                    temperature=0.8,
-                )
-                
-                # Extract the response content
-                raw_response = response.choices[0].message.content.strip()
-                logger.info("OpenAI API call successful")
-                
-                # Parse JSON response
-                try:
-                    parsed_response = json.loads(raw_response)
-                    logger.info("Successfully parsed JSON response")
-                    
-                    # Validate required fields for enhanced response format
-                    required_fields = ["cover_letter", "narrative_strengths", "research_depth", 
-                                     "improvement_suggestions", "story_flow_score", "alignment_explanation"]
-                    
-                    if not all(field in parsed_response for field in required_fields):
-                        missing_fields = [f for f in required_fields if f not in parsed_response]
-                        logger.warning(f"Missing required fields: {missing_fields}")
-                        raise ValueError(f"Missing required fields: {missing_fields}")
-                    
-                    # Validate data types
-                    if not isinstance(parsed_response["cover_letter"], str):
-                        raise ValueError("cover_letter must be a string")
-                    if not isinstance(parsed_response["narrative_strengths"], list):
-                        raise ValueError("narrative_strengths must be a list")
-                    if not isinstance(parsed_response["research_depth"], str):
-                        raise ValueError("research_depth must be a string")
-                    if not isinstance(parsed_response["improvement_suggestions"], list):
-                        raise ValueError("improvement_suggestions must be a list")
-                    if not isinstance(parsed_response["story_flow_score"], (int, float)):
-                        raise ValueError("story_flow_score must be a number")
-                    if not isinstance(parsed_response["alignment_explanation"], str):
-                        raise ValueError("alignment_explanation must be a string")
-                    
-                    # Validate story flow score range
-                    if not (1 <= parsed_response["story_flow_score"] <= 10):
-                        raise ValueError("story_flow_score must be between 1 and 10")
-                    
-                    logger.info("Cover letter generation completed successfully")
-                    return parsed_response
-                    
-                except json.JSONDecodeError as e:
-                    logger.warning(f"JSON parsing failed on attempt {attempt + 1}: {e}")
-                    if attempt == retries - 1:
-                        raise ValueError(f"Failed to parse JSON response after {retries} attempts: {e}")
-                        
-            except Exception as e:
-                logger.error(f"Attempt {attempt + 1} failed: {e}")
-                if attempt == retries - 1:
-                    logger.error(f"All {retries} attempts failed for cover letter generation")
-                    raise RuntimeError(f"Cover letter generation failed after {retries} attempts: {str(e)}")
-                
-                # Wait before retrying
-                time.sleep(2 ** attempt)
+        chunks = []
+        generation_start = time.perf_counter()
+        async for delta in stream(
+            "cover_letter",
+            self._messages(prompt),
+            model=routing.choose("cover_letter"),
+            max_tokens=2500,
+            temperature=0.8,
+            response_format=COVER_LETTER_FORMAT,
+        ):
+            chunks.append(delta)
+            yield "token", {"delta": delta}
+        timings["generation"] = round(time.perf_counter() - generation_start, 3)
+        metrics.observe("cover_letter_stage_seconds", timings["generation"], stage="generation")
         
-        # This should never be reached, but just in case
-        raise RuntimeError("Unexpected error in cover letter generation")
+        parsed_response = self._parse_cover_letter("".join(chunks).strip())
+        timings["total"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Streamed cover letter generation completed successfully in {timings['total']:.2f}s: {timings}")
+        letter_id = self._remember(context, parsed_response["cover_letter"])
+        yield "result", {**parsed_response, "letter_id": letter_id, "stage_seconds": timings}
     
+    async def generate_cover_letter_variants(self, resume_text: str, job_description: str, count: int,
+                                             user_id: str = "anonymous"):
+        """
+        Generate `count` alternative cover letters from one shared context build.
+        Company research, project extraction and the prompt are prepared once;
+        the variants are then written concurrently, each in its own tone.
+        Yields ("variant", {...}) as each letter completes, ("variant_error", {...})
+        with the index and tone of a variant that failed, and a final ("done", {...}) event.
+        """
+        if not 1 <= count <= MAX_VARIANTS:
+            raise ValueError(f"count must be between 1 and {MAX_VARIANTS}")
+        logger.info(f"Starting generation of {count} cover letter variants")
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        prompt, context = await self._prepare_prompt(resume_text, job_description, timings, user_id)
+
+        async def write(index: int) -> dict:
+            tone = VARIANT_TONES[index]
+            response = await complete(
+                "cover_letter",
+                self._messages(f"{prompt}\nWrite this version in a {tone} tone."),
+                model=routing.choose("cover_letter"),
+                max_tokens=2500,
+                temperature=0.8,
+                response_format=COVER_LETTER_FORMAT,
+            )
+            parsed_response = self._parse_cover_letter(response.text)
+            letter_id = self._remember(context, parsed_response["cover_letter"])
+            return {"index": index, "tone": tone, **parsed_response, "letter_id": letter_id}
+
+        generation_start = time.perf_counter()
+        tasks = {asyncio.ensure_future(write(index)): index for index in range(count)}
+        pending = set(tasks)
+        completed = 0
+        try:
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(finished, key=tasks.__getitem__):
+                    error = task.exception()
+                    if error is not None:
+                        index = tasks[task]
+                        logger.error(f"Cover letter variant {index} failed: {error}")
+                        yield "variant_error", {"index": index, "tone": VARIANT_TONES[index], "detail": str(error)}
+                        continue
+                    variant = task.result()
+                    completed += 1
+                    metrics.inc("cover_letter_variants", tone=variant["tone"])
+                    yield "variant", variant
+        finally:
+            # A consumer that stops early shouldn't leave letters being written
+            for task in tasks:
+                task.cancel()
+        timings["generation"] = round(time.perf_counter() - generation_start, 3)
+        metrics.observe("cover_letter_stage_seconds", timings["generation"], stage="generation")
+        timings["total"] = round(time.perf_counter() - start, 3)
+        logger.info(f"{completed}/{count} cover letter variants completed in {timings['total']:.2f}s: {timings}")
+        yield "done", {"requested": count, "completed": completed, "stage_seconds": timings}
+
+    async def regenerate_paragraph(self, letter_id: str, context: LetterContext, paragraph_index: int,
+                                   instruction: Optional[str] = None) -> dict:
+        """
+        Rewrite one paragraph of a letter, reusing its stored research and
+        project context. The prompt carries only that context and the letter,
+        and the reply is a single paragraph, so an edit takes seconds.
+
+        Returns:
+            dict: The new paragraph, its index and the updated letter
+        """
+        paragraphs = check_paragraph_index(context.cover_letter, paragraph_index)
+        marked = [
+            f"[REWRITE]\n{paragraph}\n[/REWRITE]" if i == paragraph_index else paragraph
+            for i, paragraph in enumerate(paragraphs)
+        ]
+        prompt = PARAGRAPH_PROMPT.render(
+            company_research=context.company_research,
+            extracted_projects=context.extracted_projects,
+            cover_letter="\n\n".join(marked),
+            instruction=fit_input("cover_letter.paragraph", instruction or "Make it more compelling.", "instruction"),
+        )
+        response = await complete(
+            "cover_letter.paragraph",
+            [
+                {
+                    "role": "system",
+                    "content": "You are an expert career coach who edits cover letters one paragraph at a time. Reply with the rewritten paragraph only."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            model=routing.choose("cover_letter.paragraph"),
+            max_tokens=400,
+            temperature=0.8,
+        )
+        paragraph = response.text.replace("[REWRITE]", "").replace("[/REWRITE]", "").strip()
+        if not paragraph:
+            raise ValueError("The model returned an empty paragraph")
+
+        paragraphs[paragraph_index] = paragraph
+        cover_letter = "\n\n".join(paragraphs)
+        # Later edits build on this one
+        self._contexts.set(letter_id, replace(context, cover_letter=cover_letter), CONTEXT_TTL)
+        logger.info(f"Regenerated paragraph {paragraph_index} of letter {letter_id}")
+        return {"paragraph_index": paragraph_index, "paragraph": paragraph, "cover_letter": cover_letter}
+
     def generate_narrative_examples(self, company_name: str, candidate_projects: str) -> str:
         """
         Generate example narrative connections for testing and inspiration
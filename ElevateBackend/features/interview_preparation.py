@@ -1,27 +1,52 @@
 # features/interview_preparation.py
-import os
-import re
-import json
-import openai
-from dotenv import load_dotenv
 from datetime import datetime, UTC
+from typing import Dict
 from database import store_interview_analysis, store_interview_feedback
+from features.schemas import AnswerFeedback, QuestionAnalysis
+from llm import routing, structured
+from llm.client import complete
+from llm.tokens import fit_input
+from llm.semantic_cache import SemanticCache
 
-# Load environment variables from .env file
-load_dotenv()
 
-# Configure OpenAI API key
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables!")
-openai.api_key = OPENAI_API_KEY
+# Bump when a prompt changes so cached responses for the old prompt are not reused
+ANALYSIS_PROMPT_VERSION = "2"
+FEEDBACK_PROMPT_VERSION = "2"
 
+# Strict JSON schemas, so every reply parses without repair
+ANALYSIS_FORMAT = structured.response_format(QuestionAnalysis)
+FEEDBACK_FORMAT = structured.response_format(AnswerFeedback)
+
+# Paraphrases of the same classic question ("reverse a linked list" /
+# "reverse the singly linked list in place") share one stored analysis.
+# One index per routed model, so the arms of an A/B split never serve each other's analyses
+analysis_semantic_caches: Dict[str, SemanticCache] = {}
+
+
+def analysis_semantic_cache(model: str) -> SemanticCache:
+    """The semantic cache of analyses written by `model` with the current prompt."""
+    if model not in analysis_semantic_caches:
+        analysis_semantic_caches[model] = SemanticCache(f"interview_analysis:{model}:v{ANALYSIS_PROMPT_VERSION}")
+    return analysis_semantic_caches[model]
 
-DEFAULT_MODEL = "gpt-4o"
 
 class InterviewPreparation:
     @staticmethod
-    def analyze_question(user_id: str, question: str) -> dict:
+    async def analyze_question(user_id: str, question: str) -> dict:
+        model = routing.choose("interview_analysis", user_id)
+        question = fit_input("interview_analysis", question, "question", model)
+        # Return the stored analysis of a near-identical question if there is one
+        cached_analysis = analysis_semantic_cache(model).lookup(question)
+        if cached_analysis is not None:
+            cached_analysis["question"] = question
+            store_interview_analysis(user_id, {
+                "question": question,
+                "analysis": cached_analysis,
+                "timestamp": datetime.now(UTC),
+                "semantic_cache_hit": True
+            })
+            return cached_analysis
+
         prompt = f"""
         As an expert interview coach, provide detailed analysis for this coding question.
         Use this JSON format:
@@ -79,33 +104,31 @@ class InterviewPreparation:
         """
         try:
             # Send the prompt to the OpenAI API
-            resp = openai.chat.completions.create(
-                model=DEFAULT_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.0
+            resp = await complete(
+                "interview_analysis",
+                [{"role": "user", "content": prompt}],
+                model=model,
+                temperature=0.0,
+                response_format=ANALYSIS_FORMAT,
+                cache_inputs={"question": question},
+                prompt_version=ANALYSIS_PROMPT_VERSION
             )
-            raw = resp.choices[0].message.content.strip()
+            raw = resp.text
         except Exception as e:
-            # Handle any errors that occur during the API call
-            err = {"error": f"OpenAI API error: {e}"}
+            # Record the failure, then let the endpoint answer with an error status
             store_interview_analysis(user_id, {
                 "question": question,
-                "analysis": err,
+                "analysis": {"error": f"OpenAI API error: {e}"},
                 "timestamp": datetime.now(UTC)
             })
-            return err
-
-        # Extract JSON block from the response
-        json_match = re.search(r"```json\s*(\{[\s\S]*\})\s*```", raw)
-        json_str = json_match.group(1).strip() if json_match else raw
+            raise
 
-        # Parse the extracted JSON
-        try:
-            analysis_result = json.loads(json_str)
-        except json.JSONDecodeError as e:
-            # Handle JSON parsing errors
+        # Validate the reply against the analysis schema
+        analysis_result = structured.parse("interview_analysis", QuestionAnalysis, raw)
+        if analysis_result is None:
+            structured.record_fallback("interview_analysis", model)
             error_result = {
-                "error": f"JSON parsing error: {e}",
+                "error": "Model output did not match the analysis schema",
                 "raw_response": raw
             }
             store_interview_analysis(user_id, {
@@ -115,7 +138,8 @@ class InterviewPreparation:
             })
             return error_result
 
-        # Persist successful analysis
+        # Index the fresh analysis for future paraphrases, then persist it
+        analysis_semantic_cache(model).add(question, analysis_result)
         store_interview_analysis(user_id, {
             "question": question,
             "analysis": analysis_result,
@@ -124,7 +148,10 @@ class InterviewPreparation:
         return analysis_result
 
     @staticmethod
-    def feedback_on_answer(user_id: str, question: str, user_answer: str) -> dict:
+    async def feedback_on_answer(user_id: str, question: str, user_answer: str) -> dict:
+        model = routing.choose("interview_feedback", user_id)
+        question = fit_input("interview_feedback", question, "question", model)
+        user_answer = fit_input("interview_feedback", user_answer, "user_answer", model)
         prompt = f"""
         Provide detailed feedback on this coding answer using:
     
@@ -177,34 +204,32 @@ class InterviewPreparation:
         """
         try:
             # Send the prompt to the OpenAI API
-            resp = openai.chat.completions.create(
-                model=DEFAULT_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.0
+            resp = await complete(
+                "interview_feedback",
+                [{"role": "user", "content": prompt}],
+                model=model,
+                temperature=0.0,
+                response_format=FEEDBACK_FORMAT,
+                cache_inputs={"question": question, "user_answer": user_answer},
+                prompt_version=FEEDBACK_PROMPT_VERSION
             )
-            raw = resp.choices[0].message.content.strip()
+            raw = resp.text
         except Exception as e:
-            # Handle any errors that occur during the API call
-            err = {"error": f"OpenAI API error: {e}"}
+            # Record the failure, then let the endpoint answer with an error status
             store_interview_feedback(user_id, {
                 "question": question,
                 "user_answer": user_answer,
-                "feedback": err,
+                "feedback": {"error": f"OpenAI API error: {e}"},
                 "timestamp": datetime.now(UTC)
             })
-            return err
+            raise
 
-        # Extract JSON block from the response
-        json_match = re.search(r"```json\s*(\{[\s\S]*\})\s*```", raw)
-        json_str = json_match.group(1).strip() if json_match else raw
-
-        # Parse the extracted JSON
-        try:
-            feedback_result = json.loads(json_str)
-        except json.JSONDecodeError as e:
-            # Handle JSON parsing errors
+        # Validate the reply against the feedback schema
+        feedback_result = structured.parse("interview_feedback", AnswerFeedback, raw)
+        if feedback_result is None:
+            structured.record_fallback("interview_feedback", model)
             feedback_error = {
-                "error": f"JSON parsing error: {e}",
+                "error": "Model output did not match the feedback schema",
                 "raw_response": raw
             }
             store_interview_feedback(user_id, {
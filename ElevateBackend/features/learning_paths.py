@@ -1,53 +1,35 @@
-import os
-import re
-import json
 import uuid
+import asyncio
 import logging
-import openai
-from dotenv import load_dotenv
 from datetime import datetime, UTC
+from typing import Optional
 from database import store_learning_pathway_result
+from features.schemas import LearningPathway
+from llm import jsonparse, routing, structured
+from llm.client import complete, stream
+from llm.prompts import register
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Load and configure environment variables
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
-    raise ValueError("OPENAI_API_KEY not found")
-
-class LearningPathways:
-    def __init__(self, model: str = "gpt-4o"):
-        self.model = model
-
-    def generate_pathway(self, user_id: str, topic: str) -> dict:
-        pathway_id = str(uuid.uuid4())
-        now = datetime.now(UTC)
-
-        # 1. Store initial "processing" state
-        store_learning_pathway_result(user_id, {
-            "pathway_id": pathway_id,
-            "topic": topic,
-            "status": "processing",
-            "createdAt": now,
-            "updatedAt": now
-        })
-        
-        prompt = f"""
-You are an expert curriculum architect with deep industry knowledge. Create a comprehensive, actionable learning pathway for "{topic}".
+# Static instructions first and the topic last, so the provider can cache the prefix
+LEARNING_PATHWAY_PROMPT = register(
+    "learning_pathways",
+    version="2",
+    static="""
+You are an expert curriculum architect with deep industry knowledge. Create a comprehensive, actionable learning pathway for the topic given at the end of this message.
 
 Return a **pure JSON** object with this EXACT structure:
 
-{{
-  "topic": "{topic}",
+{
+  "topic": "<the topic, as given>",
   "overview": "Brief 2-3 sentence overview of what learners will achieve",
   "prerequisites": ["prerequisite1", "prerequisite2"],
   "timeline": "Total duration (e.g., 12-18 months)",
   "career_outcomes": ["role1", "role2", "role3"],
   "steps": [
-    {{
+    {
       "step": 1,
       "title": "Phase title",
       "duration": "2-3 months",
@@ -55,82 +37,82 @@ Return a **pure JSON** object with this EXACT structure:
       "core_goals": ["specific measurable goal 1", "goal 2", "goal 3"],
       "learning_outcomes": ["outcome1", "outcome2"],
       "topics": [
-        {{
+        {
           "name": "Specific topic name",
           "why_important": "1-2 sentences on relevance",
           "subtopics": ["subtopic1", "subtopic2", "subtopic3"],
           "concepts_to_master": ["concept1", "concept2"],
           "resources": [
-            {{
+            {
               "title": "Exact resource name",
               "type": "Course|Book|Tutorial|Documentation|Video",
               "url": "https://actual-url.com",
               "duration": "X hours|pages",
               "free": true|false,
               "description": "What this covers"
-            }}
+            }
           ],
           "practice_resources": [
-            {{
+            {
               "title": "Practice platform name",
               "url": "https://actual-url.com",
               "description": "Type of practice"
-            }}
+            }
           ],
           "projects": [
-            {{
+            {
               "title": "Specific project name",
               "description": "Detailed project description",
               "skills_used": ["skill1", "skill2"],
               "estimated_time": "X hours",
               "difficulty": "Beginner|Intermediate|Advanced",
               "github_search_terms": ["term1", "term2"]
-            }}
+            }
           ]
-        }}
+        }
       ],
-      "milestone_project": {{
+      "milestone_project": {
         "title": "Capstone project for this phase",
         "description": "Detailed description",
         "deliverables": ["deliverable1", "deliverable2"],
         "skills_demonstrated": ["skill1", "skill2"]
-      }},
+      },
       "assessment_ideas": ["assessment1", "assessment2"]
-    }}
+    }
   ],
   "industry_readiness": [
-    {{
+    {
       "category": "Technical Skills|Soft Skills|Portfolio",
       "recommendation": "Specific actionable advice",
       "resources": ["resource1", "resource2"]
-    }}
+    }
   ],
   "continuous_learning": [
-    {{
+    {
       "area": "Advanced topic area",
       "description": "Why this matters",
       "resources": ["resource1", "resource2"],
       "communities": ["community1", "community2"]
-    }}
+    }
   ],
   "communities_to_join": [
-    {{
+    {
       "name": "Community name",
       "platform": "Discord|Reddit|Slack|Forum",
       "url": "https://actual-url.com",
       "description": "What to expect"
-    }}
+    }
   ],
   "certification_paths": [
-    {{
+    {
       "name": "Certification name",
       "provider": "Provider name",
       "url": "https://actual-url.com",
       "cost": "$XXX",
       "value": "Why this cert matters"
-    }}
+    }
   ]
-}}
+}
 
 CRITICAL REQUIREMENTS:
 1. **MANDATORY**: ALL URLs must be REAL, WORKING links to actual resources. Examples:
@@ -156,7 +138,7 @@ CRITICAL REQUIREMENTS:
 
 6. Include modern, up-to-date resources (2022-2024 preferred)
 
-7. For {topic}, include:
+7. For the topic, include:
    - Industry-standard tools and technologies
    - Real project ideas that build portfolio pieces
    - Specific communities and forums
@@ -190,37 +172,59 @@ CRITICAL REQUIREMENTS:
 - [ ] Certification URLs link to official certification programs
 - [ ] Each resource has accurate duration and pricing information
 
-Generate a comprehensive pathway that someone could actually follow step-by-step to master {topic}.
+Generate a comprehensive pathway that someone could actually follow step-by-step to master the topic.
 
-**IMPORTANT**: Before finalizing, mentally verify each URL exists and is relevant to {topic}.
+**IMPORTANT**: Before finalizing, mentally verify each URL exists and is relevant to the topic.
 
-Return ONLY the JSON, no additional text."""
+Return ONLY the JSON, no additional text.
+""",
+    variable="""
+Topic: "{topic}"
+""",
+)
 
-        # 3. Call the API to generate the learning pathway
-        try:
-            logger.info(f"[{user_id}] Calling OpenAI for topic='{topic}'")
-            resp = openai.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,  # Slightly higher for more creative resources
-                max_tokens=4000,  # Increased for richer content
-            )
-        except Exception as e:
-            logger.exception(f"[{user_id}] OpenAI API call failed")
-            raise
+# Strict JSON schema, so every reply parses without repair
+PATHWAY_FORMAT = structured.response_format(LearningPathway)
 
-        # 4. Parse out JSON from the response
-        raw = resp.choices[0].message.content.strip()
-        match = re.search(r"```json\s*(\{[\s\S]+\})\s*```", raw)
-        json_str = match.group(1) if match else raw
+class LearningPathways:
+    def __init__(self, model: Optional[str] = None):
+        # A pinned model; otherwise each call goes through the model router
+        self.model = model
+
+    def _model(self, user_id: str) -> str:
+        return self.model or routing.choose("learning_pathways", user_id)
+
+    def _build_prompt(self, topic: str) -> str:
+        """Build the learning pathway generation prompt for a topic."""
+        return LEARNING_PATHWAY_PROMPT.render(topic=topic)
+
+    def _parse_pathway(self, user_id: str, raw: str) -> dict:
+        """Validate the pathway JSON, falling back to a tolerant parse of replies that don't match the schema."""
+        pathway = structured.parse("learning_pathways", LearningPathway, raw)
+        if pathway is not None:
+            return pathway
 
         try:
-            data = json.loads(json_str)
-        except json.JSONDecodeError as e:
-            logger.error(f"[{user_id}] Failed to parse JSON:\n{json_str}")
+            return jsonparse.loads_object(raw, "learning_pathways")
+        except ValueError:
+            logger.error(f"[{user_id}] Failed to parse JSON:\n{raw}")
             raise
 
-        # 5. Persist completed result
+    def _start_pathway(self, user_id: str, topic: str) -> str:
+        """Store the initial "processing" state and return the new pathway id."""
+        pathway_id = str(uuid.uuid4())
+        now = datetime.now(UTC)
+        store_learning_pathway_result(user_id, {
+            "pathway_id": pathway_id,
+            "topic": topic,
+            "status": "processing",
+            "createdAt": now,
+            "updatedAt": now
+        })
+        return pathway_id
+
+    def _complete_pathway(self, user_id: str, pathway_id: str, data: dict) -> dict:
+        """Persist the completed pathway and build the response payload."""
         store_learning_pathway_result(user_id, {
             "pathway_id": pathway_id,
             "status": "completed",
@@ -230,3 +234,66 @@ Return ONLY the JSON, no additional text."""
 
         logger.info(f"[{user_id}] Learning pathway generation succeeded (pathway_id={pathway_id})")
         return {"pathway_id": pathway_id, "learning_pathway": data, "status": "completed"}
+
+    def _fail_pathway(self, user_id: str, pathway_id: str, error: str) -> None:
+        """Record that generation of the pathway failed."""
+        store_learning_pathway_result(user_id, {
+            "pathway_id": pathway_id,
+            "status": "failed",
+            "error": error,
+            "updatedAt": datetime.now(UTC)
+        })
+
+    async def generate_pathway(self, user_id: str, topic: str) -> dict:
+        # 1. Store initial "processing" state
+        pathway_id = self._start_pathway(user_id, topic)
+
+        # 2. Call the API to generate the learning pathway
+        try:
+            logger.info(f"[{user_id}] Calling OpenAI for topic='{topic}'")
+            resp = await complete(
+                "learning_pathways",
+                [{"role": "user", "content": self._build_prompt(topic)}],
+                model=self._model(user_id),
+                temperature=0.3,  # Slightly higher for more creative resources
+                max_tokens=4000,  # Increased for richer content
+                response_format=PATHWAY_FORMAT,
+            )
+        except Exception as e:
+            logger.exception(f"[{user_id}] OpenAI API call failed")
+            raise
+
+        # 3. Parse out JSON from the response
+        data = self._parse_pathway(user_id, resp.text)
+
+        # 4. Persist completed result
+        return self._complete_pathway(user_id, pathway_id, data)
+
+    async def stream_pathway(self, user_id: str, topic: str):
+        """
+        Streaming variant of generate_pathway.
+        Yields ("token", {"delta": ...}) events as the model writes, then a
+        final ("result", {...}) event with the parsed, persisted pathway.
+        """
+        pathway_id = self._start_pathway(user_id, topic)
+
+        logger.info(f"[{user_id}] Streaming OpenAI generation for topic='{topic}'")
+        chunks = []
+        try:
+            async for delta in stream(
+                "learning_pathways",
+                [{"role": "user", "content": self._build_prompt(topic)}],
+                model=self._model(user_id),
+                temperature=0.3,
+                max_tokens=4000,
+                response_format=PATHWAY_FORMAT,
+            ):
+                chunks.append(delta)
+                yield "token", {"delta": delta}
+
+            data = self._parse_pathway(user_id, "".join(chunks).strip())
+        except (Exception, asyncio.CancelledError) as e:
+            # A failed or abandoned stream must not leave the entry "processing"
+            self._fail_pathway(user_id, pathway_id, str(e) or type(e).__name__)
+            raise
+        yield "result", self._complete_pathway(user_id, pathway_id, data)
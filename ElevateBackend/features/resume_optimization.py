@@ -9,13 +9,19 @@ Persists input + output to MongoDB (via store_optimization_results)
 
 import re
 import time
-import openai
 from dotenv import load_dotenv
 import os
 import json
 import logging
 from datetime import datetime, UTC
+from typing import Optional
 from database import store_optimization_results
+from features.schemas import ResumeOptimization
+from llm import jsonparse, routing, structured
+from llm.backends import LLM_BACKEND
+from llm.client import PASSTHROUGH_ERRORS, complete, stream
+from llm.prompts import register
+from llm.tokens import fit_input
 
 # Configure logging
 logging.basicConfig(
@@ -28,16 +34,17 @@ logger = logging.getLogger("features.resume_optimization")
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Check if we're in development mode with a dummy key
-DEVELOPMENT_MODE = OPENAI_API_KEY == "sk-dummy-key-for-development"
+# Check if we're in development mode with a dummy key (the fake and replay
+# LLM backends need no key, so they run the real code path instead)
+DEVELOPMENT_MODE = OPENAI_API_KEY == "sk-dummy-key-for-development" and LLM_BACKEND == "openai"
 if DEVELOPMENT_MODE:
     logger.warning("Using development mode with mock data for resume optimization")
-else:
-    if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY not found in environment variables!")
-    openai.api_key = OPENAI_API_KEY
 
-COMPREHENSIVE_OPTIMIZER_PROMPT = """
+# Static instructions first and user data last, so the provider can cache the prefix
+COMPREHENSIVE_OPTIMIZER_PROMPT = register(
+    "resume_optimization",
+    version="2",
+    static="""
 You are an expert career coach, resume designer, and ATS-compliance specialist. Given the user's existing resume, formatting details, and the job description below:
 
 1. **Produce an ATS-Optimized Résumé** using only content from the original:
@@ -103,8 +110,8 @@ DO NOT include any additional text outside the JSON object. DO NOT use single qu
 
 **Do not invent** new experiences—only rephrase what's in the user's resume.
 
----
-
+""",
+    variable="""
 **Job Description:**  
 {job_description}
 
@@ -113,7 +120,11 @@ DO NOT include any additional text outside the JSON object. DO NOT use single qu
 
 **Resume Formatting Details:**
 {format_details}
-"""
+""",
+)
+
+# Strict JSON schema, so every reply parses without repair
+RESUME_FORMAT = structured.response_format(ResumeOptimization)
 
 # Helper function to generate mock data for development mode
 def _generate_mock_response():
@@ -169,85 +180,14 @@ def _generate_mock_response():
     }
 
 class ResumeOptimizer:
-    def __init__(self, model_name: str = "gpt-4o"):
+    def __init__(self, model_name: Optional[str] = None):
+        # A pinned model; otherwise each call goes through the model router
         self.model_name = model_name
 
-#Helper functions to clean up the response text
-    def _clean_response(self, text: str) -> str:
-        # Remove code block delimiters and trailing code block delimiter
-        cleaned = re.sub(r"```(?:json)?\s*", "", text)
-        cleaned = re.sub(r"```$", "", cleaned)
-        return cleaned.strip()
+    def _model(self, user_id: Optional[str] = None) -> str:
+        return self.model_name or routing.choose("resume_optimization", user_id)
 
-    def _extract_json(self, text: str) -> str:
-        """
-        Extract the first {...} block by locating the first '{' and the matching last '}'.
-        """
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            return text[start:end+1]
-        return text
-
-    def _validate_schema(self, data: dict) -> None:
-        # Validate the JSON response against the expected schema
-        missing_keys = []
-        for key in ("optimized_resume", "analysis", "ats_score"):
-            if key not in data:
-                missing_keys.append(key)
-        
-        if missing_keys:
-            logger.error(f"Missing required top-level keys: {', '.join(missing_keys)}")
-            logger.error(f"Keys present in response: {', '.join(data.keys())}")
-            raise RuntimeError(f"Missing required top-level keys in JSON: {', '.join(missing_keys)}")
-        
-        # Check analysis keys
-        analysis = data["analysis"]
-        missing_analysis_keys = []
-        for key in ("strengths", "weaknesses", "recommendations"):
-            if key not in analysis:
-                missing_analysis_keys.append(key)
-        
-        if missing_analysis_keys:
-            logger.error(f"Missing required analysis keys: {', '.join(missing_analysis_keys)}")
-            logger.error(f"Keys present in analysis: {', '.join(analysis.keys())}")
-            raise RuntimeError(f"Analysis block missing required keys: {', '.join(missing_analysis_keys)}")
-        
-        # Validate new fields if they exist
-        if "format_analysis" in data:
-            format_analysis = data["format_analysis"]
-            missing_format_keys = []
-            for key in ("page_count_assessment", "format_recommendations"):
-                if key not in format_analysis:
-                    missing_format_keys.append(key)
-            if missing_format_keys:
-                logger.error(f"Missing required format_analysis keys: {', '.join(missing_format_keys)}")
-                logger.error(f"Keys present in format_analysis: {', '.join(format_analysis.keys())}")
-                raise RuntimeError(f"Format analysis block missing required keys: {', '.join(missing_format_keys)}")
-        
-        if "ats_score_breakdown" in data:
-            score_breakdown = data["ats_score_breakdown"]
-            missing_score_keys = []
-            for key in ("keyword_matching", "content_quality"):
-                if key not in score_breakdown:
-                    missing_score_keys.append(key)
-            if missing_score_keys:
-                logger.error(f"Missing required ats_score_breakdown keys: {', '.join(missing_score_keys)}")
-                logger.error(f"Keys present in ats_score_breakdown: {', '.join(score_breakdown.keys())}")
-                raise RuntimeError(f"ATS score breakdown missing required keys: {', '.join(missing_score_keys)}")
-        
-        if "human_readability" in data:
-            readability = data["human_readability"]
-            missing_readability_keys = []
-            for key in ("score", "improvement_suggestions"):
-                if key not in readability:
-                    missing_readability_keys.append(key)
-            if missing_readability_keys:
-                logger.error(f"Missing required human_readability keys: {', '.join(missing_readability_keys)}")
-                logger.error(f"Keys present in human_readability: {', '.join(readability.keys())}")
-                raise RuntimeError(f"Human readability block missing required keys: {', '.join(missing_readability_keys)}")
-
-    def _create_fallback_response(self, resume_text: str, job_description: str, raw_response: str = None) -> dict:
+    def _create_fallback_response(self, resume_text: str, job_description: str, raw_response: Optional[str] = None) -> dict:
         """
         Create a fallback response when the OpenAI API fails to return properly formatted JSON.
         This ensures the user still gets a useful response even if there are API issues.
@@ -332,160 +272,160 @@ class ResumeOptimizer:
             }
         }
 
-#Main entry point called by /optimize_resume endpoint. 
-    # 1. Builds prompt  2. Calls OpenAI  3. Cleans & parses JSON
-        
-    def optimize(self, user_id: str, resume_text: str, job_description: str, format_details: dict = None, dry_run: bool = False) -> dict:
+    # Helpers shared by optimize() and stream_optimize()
+    def _check_inputs(self, resume_text: str, job_description: str) -> None:
         # Check if the resume text and job description are long enough for meaningful optimization
         if len(resume_text) < 100:
             raise ValueError("Resume text too short for meaningful optimization")
         if len(job_description) < 50:
             raise ValueError("Job description too short for meaningful optimization")
 
+    def _build_prompt(self, resume_text: str, job_description: str, format_details: Optional[dict] = None) -> str:
+        # Format the prompt with the provided resume text and job description
+        format_details_str = json.dumps(format_details, indent=2) if format_details else "{}"
+        model = self.model_name or routing.base_model("resume_optimization")
+        return COMPREHENSIVE_OPTIMIZER_PROMPT.render(
+            resume_text=fit_input("resume_optimization", resume_text, "resume_text", model),
+            job_description=fit_input("resume_optimization", job_description, "job_description", model),
+            format_details=format_details_str
+        )
+
+    def _persist(self, user_id: str, resume_text: str, job_description: str, format_details: Optional[dict],
+                 result: dict, fallback_used: bool = False, dry_run: bool = False) -> None:
+        # If in dry run mode, skip persistence
+        if dry_run:
+            logger.info("Dry run enabled – skipping persistence")
+            return
+        entry = {
+            "input": {
+                "resume": resume_text, 
+                "job_description": job_description,
+                "format_details": format_details
+            },
+            "output": result,
+            "timestamp": datetime.now(UTC)
+        }
+        if fallback_used:
+            entry["fallback_used"] = True
+        store_optimization_results(user_id, entry)
+
+    def _process_response(self, raw: str, resume_text: str, job_description: str, model: Optional[str] = None) -> tuple:
+        """
+        Clean, parse and validate a raw model response from `model`.
+        Returns (result, fallback_used).
+        """
+        # Replies constrained by the schema validate directly
+        result = structured.parse("resume_optimization", ResumeOptimization, raw)
+        if result is not None:
+            return result, False
+
+        # Lenient path for replies that don't match the schema: one tolerant
+        # parse handles fences, trailing commas, stray quotes and truncation
+        try:
+            result = jsonparse.loads_object(raw, "resume_optimization")
+        except ValueError as e:
+            # Nothing recoverable, use fallback response
+            logger.error(f"Failed to parse JSON from OpenAI response ({e}). Using fallback response.")
+            logger.error(f"Raw response preview: {raw[:500]}...")
+            structured.record_fallback("resume_optimization", model)
+            return self._create_fallback_response(resume_text, job_description, raw), True
+
+        # Pre-schema replies only had to carry the core keys; the later sections stay optional here
+        if "optimized_resume" not in result and "resume" in result:
+            result["optimized_resume"] = result.pop("resume")
+        if "ats_score" not in result and "score" in result:
+            result["ats_score"] = result.pop("score")
+        missing = self._missing_keys(result)
+        if missing:
+            logger.error(f"Reply missing required keys: {', '.join(missing)}. Using fallback response.")
+            structured.record_fallback("resume_optimization", model)
+            return self._create_fallback_response(resume_text, job_description, raw), True
+
+        return result, False
+
+    @staticmethod
+    def _missing_keys(result: dict) -> list:
+        """Required keys absent from a reply parsed on the lenient path."""
+        missing = [key for key in ("optimized_resume", "analysis", "ats_score") if key not in result]
+        analysis = result.get("analysis")
+        if isinstance(analysis, dict):
+            missing += [f"analysis.{key}" for key in ("strengths", "weaknesses", "recommendations")
+                        if key not in analysis]
+        elif "analysis" in result:
+            missing.append("analysis")
+        return missing
+
+#Main entry point called by /optimize_resume endpoint. 
+    # 1. Builds prompt  2. Calls OpenAI  3. Cleans & parses JSON
+        
+    async def optimize(self, user_id: str, resume_text: str, job_description: str, format_details: Optional[dict] = None, dry_run: bool = False) -> dict:
+        self._check_inputs(resume_text, job_description)
+
         # If in development mode, return mock data
         if DEVELOPMENT_MODE:
             logger.info("Development mode: Returning mock optimization data")
             result = _generate_mock_response()
-            
-            # If not in dry_run mode, store the optimization results
-            if not dry_run:
-                store_optimization_results(user_id, {
-                    "input": {
-                        "resume": resume_text, 
-                        "job_description": job_description,
-                        "format_details": format_details
-                    },
-                    "output": result,
-                    "timestamp": datetime.now(UTC)
-                })
-                
+            self._persist(user_id, resume_text, job_description, format_details, result, dry_run=dry_run)
             return result
 
-        # Format the prompt with the provided resume text and job description
-        format_details_str = json.dumps(format_details, indent=2) if format_details else "{}"
-        prompt = COMPREHENSIVE_OPTIMIZER_PROMPT.format(
-            resume_text=resume_text,
-            job_description=job_description,
-            format_details=format_details_str
-        )
+        model = self._model(user_id)
+        prompt = self._build_prompt(resume_text, job_description, format_details)
         logger.info(f"Starting resume optimization (resume {len(resume_text)} chars, JD {len(job_description)} chars)")
 
         start = time.time()
         # Call the OpenAI API
         try:
-            resp = openai.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
+            resp = await complete(
+                "resume_optimization",
+                [{"role": "user", "content": prompt}],
+                model=model,
                 temperature=0.2,
-                response_format={"type": "json_object"}
+                response_format=RESUME_FORMAT
             )
             duration = time.time() - start
-            raw = resp.choices[0].message.content.strip()
+            raw = resp.text
             logger.info(f"Received {len(raw)} chars from OpenAI in {duration:.1f}s")
+        except PASSTHROUGH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"OpenAI API call failed: {str(e)}")
             raise RuntimeError(f"OpenAI API error: {str(e)}")
 
-        # Clean the response text by removing code block delimiters and trailing delimiters
-        cleaned = self._clean_response(raw)
-        extracted = self._extract_json(cleaned)
-        
-        # Log the first 500 characters of the response for debugging
-        logger.info(f"JSON response preview: {extracted[:500]}...")
-
-        # Attempt to parse the extracted JSON, retrying once after removing trailing commas
-        for attempt in (1, 2):
-            try:
-                result = json.loads(extracted)
-                break
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSON parse error on attempt {attempt}: {e}")
-                if attempt == 1:
-                    # Fix common JSON issues
-                    extracted = re.sub(r",\s*([\]}])", r"\1", extracted)
-                    extracted = re.sub(r"'", '"', extracted)  # Replace single quotes with double quotes
-        else:
-            # If both attempts fail, use fallback response
-            logger.error(f"Failed to parse JSON from OpenAI response. Using fallback response.")
-            logger.error(f"Raw response preview: {raw[:500]}...")
-            result = self._create_fallback_response(resume_text, job_description, raw)
-            
-            # If not in dry_run mode, store the optimization results
-            if not dry_run:
-                store_optimization_results(user_id, {
-                    "input": {
-                        "resume": resume_text, 
-                        "job_description": job_description,
-                        "format_details": format_details
-                    },
-                    "output": result,
-                    "timestamp": datetime.now(UTC),
-                    "fallback_used": True
-                })
-            return result
+        result, fallback_used = self._process_response(raw, resume_text, job_description, model)
+        self._persist(user_id, resume_text, job_description, format_details, result, fallback_used, dry_run)
+        return result
 
-        try:
-            # Validate the parsed JSON against the expected schema
-            self._validate_schema(result)
-        except Exception as e:
-            # If validation fails, try to fix common issues
-            logger.warning(f"Schema validation failed: {str(e)}")
-            logger.info("Attempting to fix schema issues...")
-            
-            try:
-                # Ensure required top-level keys exist
-                if "optimized_resume" not in result and "resume" in result:
-                    logger.info("Fixing: 'resume' -> 'optimized_resume'")
-                    result["optimized_resume"] = result.pop("resume")
-                    
-                if "analysis" not in result:
-                    logger.info("Creating missing 'analysis' section")
-                    result["analysis"] = {
-                        "strengths": ["Strong technical skills", "Relevant experience", "Good education background"],
-                        "weaknesses": ["Could improve formatting", "Missing some keywords", "Limited quantifiable achievements"],
-                        "recommendations": ["Add more keywords from job description", "Quantify achievements", "Improve formatting"]
-                    }
-                    
-                if "ats_score" not in result and "score" in result:
-                    logger.info("Fixing: 'score' -> 'ats_score'")
-                    result["ats_score"] = result.pop("score")
-                elif "ats_score" not in result:
-                    logger.info("Adding default 'ats_score'")
-                    result["ats_score"] = 75
-                    
-                # Validate again after fixes
-                self._validate_schema(result)
-            except Exception as e2:
-                # If fixes fail, use fallback response
-                logger.error(f"Failed to fix schema issues: {str(e2)}. Using fallback response.")
-                result = self._create_fallback_response(resume_text, job_description, raw)
-                
-                # If not in dry_run mode, store the optimization results
-                if not dry_run:
-                    store_optimization_results(user_id, {
-                        "input": {
-                            "resume": resume_text, 
-                            "job_description": job_description,
-                            "format_details": format_details
-                        },
-                        "output": result,
-                        "timestamp": datetime.now(UTC),
-                        "fallback_used": True
-                    })
-                return result
-
-        # If not in dry run mode, store the optimization results
-        if not dry_run:
-            store_optimization_results(user_id, {
-                "input": {
-                    "resume": resume_text, 
-                    "job_description": job_description,
-                    "format_details": format_details
-                },
-                "output": result,
-                "timestamp": datetime.now(UTC)
-            })
-        else:
-            logger.info("Dry run enabled – skipping persistence")
+    async def stream_optimize(self, user_id: str, resume_text: str, job_description: str, format_details: Optional[dict] = None):
+        """
+        Streaming variant of optimize().
+        Yields ("token", {"delta": ...}) events as the model writes, then a
+        final ("result", {...}) event with the parsed, validated result.
+        """
+        self._check_inputs(resume_text, job_description)
 
-        return result
+        if DEVELOPMENT_MODE:
+            logger.info("Development mode: Returning mock optimization data")
+            result = _generate_mock_response()
+            self._persist(user_id, resume_text, job_description, format_details, result)
+            yield "result", result
+            return
+
+        model = self._model(user_id)
+        prompt = self._build_prompt(resume_text, job_description, format_details)
+        logger.info(f"Streaming resume optimization (resume {len(resume_text)} chars, JD {len(job_description)} chars)")
+
+        chunks = []
+        async for delta in stream(
+            "resume_optimization",
+            [{"role": "user", "content": prompt}],
+            model=model,
+            temperature=0.2,
+            response_format=RESUME_FORMAT
+        ):
+            chunks.append(delta)
+            yield "token", {"delta": delta}
+
+        raw = "".join(chunks).strip()
+        result, fallback_used = self._process_response(raw, resume_text, job_description, model)
+        self._persist(user_id, resume_text, job_description, format_details, result, fallback_used)
+        yield "result", result
@@ -1,29 +1,20 @@
 # features/role_transition.py
 
-import os
-import re
-import json
 from datetime import datetime, UTC
 from typing import Optional
 
-import openai
 from database import store_role_transition
-from dotenv import load_dotenv
+from features.schemas import RoleTransitionPlan
+from llm import routing, structured
+from llm.client import PASSTHROUGH_ERRORS, complete
+from llm.tokens import fit_input
 
-# Load .env
-load_dotenv()
-
-# Configure OpenAI API key
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found")
-openai.api_key = OPENAI_API_KEY
-
-MODEL = "gpt-4o"
+# Strict JSON schema, so every reply parses without repair
+PLAN_FORMAT = structured.response_format(RoleTransitionPlan)
 
 
 class RoleTransition:
-    def generate_plan(
+    async def generate_plan(
         self,
         user_id: str,
         current: str,
@@ -32,6 +23,8 @@ class RoleTransition:
     ) -> dict:
         # If user entered a resume, include it in a fenced block
         resume_section = ""
+        model = routing.choose("role_transition", user_id)
+        resume_text = fit_input("role_transition", resume_text, "resume_text", model)
         if resume_text:
             resume_section = (
                 "\nRésumé:\n```text\n"
@@ -111,19 +104,18 @@ Respond STRICTLY in valid JSON. No Markdown formatting.
 """
         try:
             # Call OpenAI
-            response = openai.chat.completions.create(
-                model=MODEL,
-                messages=[{"role": "user", "content": prompt}],
+            response = await complete(
+                "role_transition",
+                [{"role": "user", "content": prompt}],
+                model=model,
                 temperature=0.2,
-                timeout=60,  # 60 second timeout
-                max_tokens=4000
+                max_tokens=4000,
+                response_format=PLAN_FORMAT
             )
-            text = response.choices[0].message.content.strip()
-            
-            # Strip markdown fences if present
-            match = re.search(r"```json\s*(\{.*\})\s*```", text, re.DOTALL)
-            json_str = match.group(1) if match else text
-            plan = json.loads(json_str)
+            plan = structured.parse("role_transition", RoleTransitionPlan, response.text)
+            if plan is None:
+                structured.record_fallback("role_transition", model)
+                raise ValueError("Model output did not match the transition plan schema")
             
             # Persist final plan (with resume snapshot)
             store_role_transition(user_id, {
@@ -135,6 +127,8 @@ Respond STRICTLY in valid JSON. No Markdown formatting.
             })
             return plan
             
+        except PASSTHROUGH_ERRORS:
+            raise
         except Exception as e:
             # Log the error and return a simplified error response
             import logging
@@ -0,0 +1,475 @@
+# features/schemas.py
+"""
+Pydantic models of every feature's LLM output.
+They mirror the JSON layouts described in each feature's prompt, are sent
+to the provider as strict json_schema response formats (llm.structured)
+and validate the replies. Field names follow the existing payloads, which
+the frontend reads as-is.
+"""
+
+from typing import Dict, List, Type
+
+from pydantic import BaseModel, field_validator
+
+
+# Interview preparation: question analysis
+class ApproachStep(BaseModel):
+    step: str
+    reasoning: str
+    keyOperation: str
+
+
+class ComplexityValue(BaseModel):
+    value: str
+    explanation: str
+
+
+class ComplexityAnalysis(BaseModel):
+    time: ComplexityValue
+    space: ComplexityValue
+    comparison: str
+
+
+class EdgeCase(BaseModel):
+    case: str
+    handling: str
+    testExample: str
+
+
+class SampleSolution(BaseModel):
+    code: str
+    codeExplanation: str
+
+
+class OptimizationTip(BaseModel):
+    tip: str
+    benefit: str
+    tradeoff: str
+
+
+class Pitfall(BaseModel):
+    mistake: str
+    consequence: str
+    prevention: str
+
+
+class QuestionAnalysis(BaseModel):
+    question: str
+    approach: List[ApproachStep]
+    complexityAnalysis: ComplexityAnalysis
+    edgeCases: List[EdgeCase]
+    sampleSolution: SampleSolution
+    optimizationTips: List[OptimizationTip]
+    commonPitfalls: List[Pitfall]
+
+
+# Interview preparation: answer feedback
+class ScoreCategories(BaseModel):
+    correctness: int
+    efficiency: int
+    readability: int
+
+
+class FeedbackScore(BaseModel):
+    overall: int
+    categories: ScoreCategories
+
+
+class ImprovementArea(BaseModel):
+    issue: str
+    severity: str
+    suggestion: str
+    example: str
+
+
+class AlternativeApproach(BaseModel):
+    name: str
+    description: str
+    tradeoffs: str
+
+
+class CodeQuality(BaseModel):
+    structure: str
+    naming: str
+    bestPractices: str
+
+
+class RecommendedResource(BaseModel):
+    type: str
+    title: str
+    url: str
+
+
+class AnswerFeedback(BaseModel):
+    score: FeedbackScore
+    strengths: List[str]
+    improvementAreas: List[ImprovementArea]
+    alternativeApproaches: List[AlternativeApproach]
+    codeQuality: CodeQuality
+    recommendedResources: List[RecommendedResource]
+
+
+# Project evaluation
+class CriterionScore(BaseModel):
+    score: int
+    analysis: str
+
+
+class EvaluationBreakdown(BaseModel):
+    innovation: CriterionScore
+    technical_complexity: CriterionScore
+    completeness_feasibility: CriterionScore
+    scalability_maintainability: CriterionScore
+    industry_relevance: CriterionScore
+
+
+class ScalingSuggestions(BaseModel):
+    architecture: List[str]
+    performance: List[str]
+    user_base: List[str]
+
+
+class MarketPotential(BaseModel):
+    target_audience: str
+    competitive_advantage: str
+    monetization_options: List[str]
+
+
+class Competitor(BaseModel):
+    name: str
+    positioning: str
+    differentiation_strategy: str
+
+
+class CompetitiveLandscape(BaseModel):
+    direct_competitors: List[Competitor]
+    indirect_competitors: List[str]
+    market_position: str
+
+
+class CriticalRisks(BaseModel):
+    founder_blind_spots: List[str]
+    market_risks: List[str]
+    technical_risks: List[str]
+    business_model_risks: List[str]
+
+
+class ResumeMention(BaseModel):
+    include: bool
+    justification: str
+
+
+class ProjectEvaluation(BaseModel):
+    overall_score: int
+    breakdown: EvaluationBreakdown
+    strengths: List[str]
+    areas_for_improvement: List[str]
+    feature_ideas: List[str]
+    scaling_suggestions: ScalingSuggestions
+    market_potential: MarketPotential
+    competitive_landscape: CompetitiveLandscape
+    critical_risks: CriticalRisks
+    resume_mention: ResumeMention
+
+
+# Résumé optimization
+class ResumeAnalysis(BaseModel):
+    strengths: List[str]
+    weaknesses: List[str]
+    recommendations: List[str]
+
+
+class FormatAnalysis(BaseModel):
+    page_count_assessment: str
+    font_assessment: str
+    color_assessment: str
+    spacing_assessment: str
+    overall_design_assessment: str
+    format_recommendations: List[str]
+
+
+class AtsScoreBreakdown(BaseModel):
+    keyword_matching: int
+    content_quality: int
+    format_readability: int
+    quantified_achievements: int
+
+
+class HumanReadability(BaseModel):
+    score: int
+    visual_appeal: str
+    storytelling: str
+    impact_assessment: str
+    improvement_suggestions: List[str]
+
+
+class ResumeOptimization(BaseModel):
+    optimized_resume: str
+    analysis: ResumeAnalysis
+    ats_score: int
+    format_analysis: FormatAnalysis
+    ats_score_breakdown: AtsScoreBreakdown
+    human_readability: HumanReadability
+
+
+# Learning pathways
+class PathwayResource(BaseModel):
+    title: str
+    type: str
+    url: str
+    duration: str
+    free: bool
+    description: str
+
+
+class PracticeResource(BaseModel):
+    title: str
+    url: str
+    description: str
+
+
+class PathwayProject(BaseModel):
+    title: str
+    description: str
+    skills_used: List[str]
+    estimated_time: str
+    difficulty: str
+    github_search_terms: List[str]
+
+
+class PathwayTopic(BaseModel):
+    name: str
+    why_important: str
+    subtopics: List[str]
+    concepts_to_master: List[str]
+    resources: List[PathwayResource]
+    practice_resources: List[PracticeResource]
+    projects: List[PathwayProject]
+
+
+class MilestoneProject(BaseModel):
+    title: str
+    description: str
+    deliverables: List[str]
+    skills_demonstrated: List[str]
+
+
+class PathwayStep(BaseModel):
+    step: int
+    title: str
+    duration: str
+    skill_level: str
+    core_goals: List[str]
+    learning_outcomes: List[str]
+    topics: List[PathwayTopic]
+    milestone_project: MilestoneProject
+    assessment_ideas: List[str]
+
+
+class IndustryReadiness(BaseModel):
+    category: str
+    recommendation: str
+    resources: List[str]
+
+
+class ContinuousLearning(BaseModel):
+    area: str
+    description: str
+    resources: List[str]
+    communities: List[str]
+
+
+class PathwayCommunity(BaseModel):
+    name: str
+    platform: str
+    url: str
+    description: str
+
+
+class CertificationPath(BaseModel):
+    name: str
+    provider: str
+    url: str
+    cost: str
+    value: str
+
+
+class LearningPathway(BaseModel):
+    topic: str
+    overview: str
+    prerequisites: List[str]
+    timeline: str
+    career_outcomes: List[str]
+    steps: List[PathwayStep]
+    industry_readiness: List[IndustryReadiness]
+    continuous_learning: List[ContinuousLearning]
+    communities_to_join: List[PathwayCommunity]
+    certification_paths: List[CertificationPath]
+
+
+# Role transition
+class SkillGapAnalysis(BaseModel):
+    hardSkills: List[str]
+    softSkills: List[str]
+
+
+class PersonalizedSummary(BaseModel):
+    transferableSkills: List[str]
+    skillGapAnalysis: SkillGapAnalysis
+    confidenceScore: float
+
+
+class ExistingSkill(BaseModel):
+    skill: str
+    application: str
+
+
+class TransitionResource(BaseModel):
+    type: str
+    title: str
+    url: str
+
+
+class NewSkill(BaseModel):
+    skill: str
+    priority: str
+    resources: List[TransitionResource]
+
+
+class SkillDevelopment(BaseModel):
+    existingToLeverage: List[ExistingSkill]
+    newToAcquire: List[NewSkill]
+
+
+class ProjectSuggestion(BaseModel):
+    title: str
+    objective: str
+    usesExisting: List[str]
+    developsNew: List[str]
+    complexity: str
+
+
+class ImmediateAction(BaseModel):
+    action: str
+    reason: str
+    metrics: List[str]
+
+
+class TimelinePhase(BaseModel):
+    phase: str
+    duration: str
+    objectives: List[str]
+    successMarkers: List[str]
+    confidenceBoosters: List[str]
+
+
+class ActionPlan(BaseModel):
+    immediateActions: List[ImmediateAction]
+    phaseBasedTimeline: List[TimelinePhase]
+
+
+class NetworkingCommunity(BaseModel):
+    name: str
+    type: str
+
+
+class NetworkingStrategy(BaseModel):
+    targetCompanies: List[str]
+    keyRolesToConnect: List[str]
+    communities: List[NetworkingCommunity]
+
+
+class RoleTransitionPlan(BaseModel):
+    personalizedSummary: PersonalizedSummary
+    skillDevelopment: SkillDevelopment
+    projectSuggestions: List[ProjectSuggestion]
+    actionPlan: ActionPlan
+    networkingStrategy: NetworkingStrategy
+
+
+# Skill benchmark
+class ParseQuality(BaseModel):
+    skills_extracted: int
+    projects_analyzed: int
+    leadership_roles: int
+    parse_attempts: int
+
+
+class BenchmarkMetadata(BaseModel):
+    parse_quality: ParseQuality
+    benchmark_sources: List[str]
+
+
+class BenchmarkStrength(BaseModel):
+    skill: str
+    reasoning: str
+
+
+class ImprovementCategory(BaseModel):
+    category: str
+    current_situation: str
+    ideal_situation: str
+    urgency: str
+    reasoning: str
+
+
+class GapAnalysis(BaseModel):
+    strengths: List[BenchmarkStrength]
+    areas_for_improvement: List[ImprovementCategory]
+
+
+class RoadmapGoal(BaseModel):
+    timeframe: str
+    goal: str
+    actions: List[str]
+    reasoning: str
+
+
+class StrategicRoadmap(BaseModel):
+    short_term_goals: List[RoadmapGoal]
+    medium_term_goals: List[RoadmapGoal]
+    long_term_goals: List[RoadmapGoal]
+
+
+class ResumeImprovement(BaseModel):
+    section: str
+    original: str
+    improved: str
+
+
+class SkillBenchmarkReport(BaseModel):
+    metadata: BenchmarkMetadata
+    detailed_gap_analysis: GapAnalysis
+    strategic_roadmap: StrategicRoadmap
+    resume_improvements: List[ResumeImprovement]
+
+
+# Cover letters
+class CoverLetter(BaseModel):
+    cover_letter: str
+    narrative_strengths: List[str]
+    research_depth: str
+    improvement_suggestions: List[str]
+    story_flow_score: int
+    alignment_explanation: str
+
+    @field_validator("story_flow_score")
+    @classmethod
+    def _score_in_range(cls, value: int) -> int:
+        # The range is checked here; the strict schema only constrains types
+        if not 1 <= value <= 10:
+            raise ValueError("story_flow_score must be between 1 and 10")
+        return value
+
+
+# Output model per LLM feature name (the name passed to llm.client)
+FEATURE_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    "interview_analysis": QuestionAnalysis,
+    "interview_feedback": AnswerFeedback,
+    "project_evaluation": ProjectEvaluation,
+    "resume_optimization": ResumeOptimization,
+    "learning_pathways": LearningPathway,
+    "role_transition": RoleTransitionPlan,
+    "skill_benchmark": SkillBenchmarkReport,
+    "cover_letter": CoverLetter,
+}
@@ -1,23 +1,19 @@
-import re
-import json
-import os
 import logging
 from datetime import datetime, UTC
+from typing import Optional
 
-import openai
-from dotenv import load_dotenv
 from database import store_user_feature
+from features.schemas import SkillBenchmarkReport
+from llm import jsonparse, routing, structured
+from llm.client import PASSTHROUGH_ERRORS, complete
+from llm.tokens import fit_input
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment and configure OpenAI
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables!")
-openai.api_key = OPENAI_API_KEY
+# Strict JSON schema, so every reply parses without repair
+BENCHMARK_FORMAT = structured.response_format(SkillBenchmarkReport)
 
 # Prompt template 
 SKILL_BENCHMARK_PROMPT = """
@@ -116,59 +112,57 @@ Return only valid JSON, ensuring highly detailed explanations and actionable ins
 """
 
 class SkillBenchmark:
-    def __init__(self, model_name: str = "gpt-4o"):
+    def __init__(self, model_name: Optional[str] = None):
+        # A pinned model; otherwise each call goes through the model router
         self.model_name = model_name
 
-    def _clean_response(self, text: str) -> str:
-        # Strip markdown fences if present
-        text = re.sub(r"```(?:json)?\s*", "", text)
-        return re.sub(r"```$", "", text).strip()
-
-    def _run_step(self, prompt: str) -> dict:
-        logger.info(f"Sending prompt to OpenAI (size: {len(prompt)} chars)")
+    async def _run_step(self, prompt: str, model: str) -> dict:
+        logger.info(f"Sending prompt to {model} (size: {len(prompt)} chars)")
         try:
-            response = openai.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
+            response = await complete(
+                "skill_benchmark",
+                [{"role": "user", "content": prompt}],
+                model=model,
                 temperature=0.2,
-                timeout=60,  # 60 second timeout
-                max_tokens=4000
+                max_tokens=4000,
+                response_format=BENCHMARK_FORMAT
             )
             
             # Get the response text
-            text = response.choices[0].message.content
-            
-            # Clean out any markdown fencing
-            cleaned = self._clean_response(text)
-            
-            # Strip any stray C0 control chars 
-            sanitized = re.sub(r'[^\x09\x0A\x0D\x20-\x7E]', '', cleaned)
+            text = response.text
+            result = structured.parse("skill_benchmark", SkillBenchmarkReport, text)
+            if result is not None:
+                return result
             
+            # Lenient path for replies that don't match the schema
             try:
-                # Allow control characters inside strings on Python 
-                return json.loads(sanitized, strict=False)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parsing failed after sanitization: {e}\nSanitized response was:\n{sanitized}")
+                return jsonparse.loads_object(text, "skill_benchmark")
+            except ValueError as e:
+                logger.error(f"JSON parsing failed: {e}")
+                structured.record_fallback("skill_benchmark", model)
                 raise RuntimeError(f"OpenAI JSON parse error: {e}")
                 
+        except PASSTHROUGH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"OpenAI API call failed: {str(e)}")
             raise RuntimeError(f"OpenAI API error: {str(e)}")
 
-    def run(self, user_id: str, entry_id: str, resume_text: str, domain: str, target_role_level: str) -> dict:
+    async def run(self, user_id: str, entry_id: str, resume_text: str, domain: str, target_role_level: str) -> dict:
         if len(resume_text) < 100:
             raise ValueError("Resume text too short for meaningful analysis.")
 
-        # Construct final prompt with dynamic fields
+        # Construct final prompt with dynamic fields, keeping the résumé inside its token budget
+        model = self.model_name or routing.choose("skill_benchmark", user_id)
         prompt = SKILL_BENCHMARK_PROMPT.format(
             domain=domain,
             target_role_level=target_role_level,
-            resume_text=resume_text
+            resume_text=fit_input("skill_benchmark", resume_text, "resume_text", model)
         )
 
         try:
             # Call OpenAI and parse result
-            result = self._run_step(prompt)
+            result = await self._run_step(prompt, model)
             
             # Persist the feature result
             store_user_feature(
@@ -187,6 +181,8 @@ class SkillBenchmark:
             )
             
             return result
+        except PASSTHROUGH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Skill benchmark failed: {str(e)}")
             # Return a simplified error response that the frontend can handle
@@ -0,0 +1,258 @@
+# jobs.py
+"""
+In-process job queue for long-running LLM work.
+Endpoints called in job mode submit their work here and return 202 with a
+job id straight away; a fixed pool of asyncio workers drains the queue and
+records the outcome, which clients fetch with GET /jobs/{id} or wait on
+with the /jobs/{id}/events SSE stream.
+
+Workers take jobs round-robin across users and never run more than
+JOB_USER_MAX_RUNNING of one user's jobs at once, so one user's backlog
+can't occupy every worker. Each job runs under its feature's deadline
+(llm.deadline), and a job that fails on admission or time limits records
+the status the synchronous endpoint would have answered with.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from llm import deadline, metrics
+from llm.retry import CircuitOpenError
+from llm.scheduler import USER_MAX_INFLIGHT, QueueTimeout, UserQueueFull
+from llm.tokens import PromptTooLarge
+
+# Configure logging
+logger = logging.getLogger("jobs")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+# Per-user limits; running jobs match the scheduler's per-user in-flight cap
+JOB_USER_MAX_QUEUED = int(os.getenv("JOB_USER_MAX_QUEUED", "20"))
+JOB_USER_MAX_RUNNING = int(os.getenv("JOB_USER_MAX_RUNNING", str(USER_MAX_INFLIGHT)))
+# Finished jobs are kept this long so clients can collect their results
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room for another submission."""
+
+
+class UserJobsFull(Exception):
+    """Raised when a user already has too many jobs queued."""
+
+
+# Failures that keep the status (and Retry-After) the synchronous endpoints answer with
+ERROR_STATUSES = (
+    (QueueTimeout, 503),
+    (CircuitOpenError, 503),
+    (UserQueueFull, 429),
+    (PromptTooLarge, 413),
+    (deadline.DeadlineExceeded, 504),
+)
+
+
+@dataclass
+class Job:
+    """A unit of queued work and its outcome."""
+    user_id: str
+    feature: str
+    # Cleared once the job has run
+    run: Optional[Callable[[], Awaitable[dict]]]
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "queued"
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    retry_after: Optional[int] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    updated_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    enqueued: float = field(default_factory=time.monotonic)
+
+    def public(self) -> dict:
+        """The job as returned to clients."""
+        data = {
+            "job_id": self.id,
+            "feature": self.feature,
+            "status": self.status,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+        }
+        if self.status == "completed":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+            data["error_status"] = self.error_status
+            if self.retry_after is not None:
+                data["retry_after"] = self.retry_after
+        return data
+
+
+class JobManager:
+    """Bounded per-user job queues drained round-robin by a pool of asyncio workers."""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_SIZE,
+                 result_ttl: float = JOB_RESULT_TTL, user_max_queued: int = JOB_USER_MAX_QUEUED,
+                 user_max_running: int = JOB_USER_MAX_RUNNING):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.user_max_queued = user_max_queued
+        self.user_max_running = user_max_running
+        self.jobs: Dict[str, Job] = {}
+        self.running: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[Job]] = {}
+        # Users with queued jobs, in the order they get their next turn
+        self._rotation: Deque[str] = deque()
+        self._ready: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def start(self) -> None:
+        """Start the workers if they aren't running."""
+        if self._ready is None:
+            self._ready = asyncio.Condition()
+            self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+            logger.info(f"Started {self.workers} job workers (queue size {self.max_queue})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._ready = None
+
+    async def submit(self, user_id: str, feature: str, run: Callable[[], Awaitable[dict]]) -> Job:
+        """Queue `run` for a worker and return the new job without waiting for it."""
+        await self.start()
+        self._purge_expired()
+        if self.queued >= self.max_queue:
+            metrics.inc("jobs_rejected", feature=feature)
+            raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs)")
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.user_max_queued:
+            metrics.inc("jobs_rejected", feature=feature)
+            raise UserJobsFull(f"Too many queued jobs ({self.user_max_queued}), retry later")
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._rotation.append(user_id)
+
+        job = Job(user_id=user_id, feature=feature, run=run)
+        queue.append(job)
+        self.jobs[job.id] = job
+        metrics.inc("jobs_submitted", feature=feature)
+        metrics.set_gauge("jobs_queued", self.queued)
+        logger.info(f"[{user_id}] Queued {feature} job {job.id}")
+        await self._notify()
+        return job
+
+    def get(self, job_id: str, user_id: str) -> Optional[Job]:
+        """Return the job if it exists and belongs to `user_id`."""
+        job = self.jobs.get(job_id)
+        if job is None or job.user_id != user_id:
+            return None
+        return job
+
+    async def _notify(self) -> None:
+        if self._ready is not None:
+            async with self._ready:
+                self._ready.notify_all()
+
+    def _take(self) -> Optional[Job]:
+        """Pop the next job of the first user in the rotation who is below the running cap."""
+        for user_id in list(self._rotation):
+            if self.running.get(user_id, 0) >= self.user_max_running:
+                continue
+            queue = self._queues[user_id]
+            job = queue.popleft()
+            # Turn used: to the back of the rotation, or out of it once drained
+            self._rotation.remove(user_id)
+            if queue:
+                self._rotation.append(user_id)
+            else:
+                del self._queues[user_id]
+            self.running[user_id] = self.running.get(user_id, 0) + 1
+            return job
+        return None
+
+    async def _worker(self, number: int) -> None:
+        ready = self._ready
+        assert ready is not None
+        while True:
+            async with ready:
+                job = self._take()
+                while job is None:
+                    await ready.wait()
+                    job = self._take()
+            metrics.set_gauge("jobs_queued", self.queued)
+            metrics.observe("job_queue_wait_seconds", time.monotonic() - job.enqueued, feature=job.feature)
+            try:
+                await self._execute(job)
+            finally:
+                self.running[job.user_id] -= 1
+                if not self.running[job.user_id]:
+                    del self.running[job.user_id]
+                # The user may have jobs that were held back by the running cap
+                await self._notify()
+
+    async def _execute(self, job: Job) -> None:
+        run = job.run
+        if run is None:
+            return
+        job.status = "processing"
+        job.updated_at = datetime.now(UTC)
+        start = time.monotonic()
+        try:
+            job.result = await deadline.guard(job.feature, run)
+            job.status = "completed"
+        except HTTPException as e:
+            job.status = "failed"
+            job.error = str(e.detail)
+            job.error_status = e.status_code
+        except tuple(error for error, _ in ERROR_STATUSES) as e:
+            logger.warning(f"[{job.user_id}] {job.feature} job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            job.error_status = next(status for error, status in ERROR_STATUSES if isinstance(e, error))
+            retry_after = getattr(e, "retry_after", None)
+            job.retry_after = max(1, int(retry_after)) if retry_after is not None else None
+        except Exception as e:
+            logger.exception(f"[{job.user_id}] {job.feature} job {job.id} failed")
+            job.status = "failed"
+            job.error = str(e)
+            job.error_status = 500
+        finally:
+            job.updated_at = datetime.now(UTC)
+            job.finished_at = time.monotonic()
+            # Drop the closure so finished jobs don't pin request data in memory
+            job.run = None
+            job.done.set()
+        metrics.inc("jobs_finished", feature=job.feature, status=job.status)
+        metrics.observe("job_run_seconds", job.finished_at - start, feature=job.feature)
+        logger.info(f"[{job.user_id}] {job.feature} job {job.id} {job.status}")
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+# Global instance
+job_manager = JobManager()
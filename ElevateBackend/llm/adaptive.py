@@ -0,0 +1,146 @@
+# llm/adaptive.py
+"""
+Adaptive (AIMD) concurrency limit for upstream LLM calls.
+The limit grows by roughly one slot per window of healthy calls (additive
+increase) and is cut by a factor on 429s, 5xx responses, timeouts or
+latency spikes (multiplicative decrease), within fixed bounds. It finds
+the concurrency our rate-limit tier and current provider latency allow
+instead of relying on a hard-coded number.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import openai
+
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.adaptive")
+
+INITIAL_LIMIT = float(os.getenv("LLM_CONCURRENCY_INITIAL", "10"))
+MIN_LIMIT = float(os.getenv("LLM_CONCURRENCY_MIN", "2"))
+MAX_LIMIT = float(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+# A call slower than this multiple of the feature's typical latency counts as a spike
+LATENCY_SPIKE_FACTOR = float(os.getenv("LLM_LATENCY_SPIKE_FACTOR", "2.5"))
+# Healthy calls needed before a feature's latency baseline is trusted
+BASELINE_MIN_SAMPLES = 20
+
+
+def overload_reason(error: Exception) -> Optional[str]:
+    """Classify an upstream error as an overload signal, or None if it isn't one."""
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIStatusError) and error.status_code >= 500:
+        return "server_error"
+    return None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter with FIFO waiters."""
+
+    def __init__(
+        self,
+        name: str = "openai",
+        initial: float = INITIAL_LIMIT,
+        minimum: float = MIN_LIMIT,
+        maximum: float = MAX_LIMIT,
+        decrease: float = 0.5,
+        spike_factor: float = LATENCY_SPIKE_FACTOR,
+        cooldown: float = 1.0,
+    ):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+        self.inflight = 0
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+        self._baselines: dict = {}
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("llm_concurrency_limit", self.limit, limiter=self.name)
+        metrics.set_gauge("llm_inflight", self.inflight, limiter=self.name)
+
+    async def acquire(self) -> None:
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            self._publish()
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            raise
+
+    def release(self) -> None:
+        self.inflight -= 1
+        self._wake()
+        self._publish()
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.inflight += 1
+                future.set_result(None)
+
+    def on_success(self, feature: str, latency: float, kind: str = "call") -> None:
+        """
+        Record a healthy call: grow the limit unless its latency was a spike.
+        `kind` names what `latency` measures ("call" for a whole completion,
+        "first_token" for a stream); each kind keeps its own baseline.
+        """
+        key = (feature, kind)
+        count, baseline = self._baselines.get(key, (0, latency))
+        if count >= BASELINE_MIN_SAMPLES and latency > baseline * self.spike_factor:
+            self.on_overload("latency")
+            return
+        # Exponentially weighted baseline of healthy latencies
+        self._baselines[key] = (count + 1, baseline + 0.1 * (latency - baseline))
+        # Additive increase: about +1 per window of `limit` successful calls
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        self._wake()
+        self._publish()
+
+    def on_overload(self, reason: str) -> None:
+        """Multiplicative decrease, at most once per cooldown so one burst counts once."""
+        metrics.inc("llm_overload_signals", limiter=self.name, reason=reason)
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        metrics.inc("llm_limit_decreases", limiter=self.name, reason=reason)
+        logger.warning(f"[{self.name}] Concurrency limit {previous:.1f} -> {self.limit:.1f} ({reason})")
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one upstream slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+# Global instance shared by every call through llm.client
+limiter = AdaptiveLimiter()
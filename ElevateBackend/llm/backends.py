@@ -0,0 +1,186 @@
+# llm/backends.py
+"""
+Pluggable LLM backends, selected with LLM_BACKEND:
+    openai  - the real API (default)
+    fake    - the local fake server (llm.fake_server), started in-process
+              unless LLM_FAKE_URL points at one already running
+    record  - the real API, with every response also written to a cassette
+    replay  - responses served byte-for-byte from a cassette, no network
+
+Record and replay work at the HTTP transport level, so streaming, usage
+and errors come back exactly as recorded. A cassette is a JSONL file
+(LLM_CASSETTE, default cassettes/llm.jsonl) with one interaction per line,
+keyed by a hash of the request body; repeated identical requests replay
+their recordings in order. With LLM_REPLAY_TIMING=true, replay also
+reproduces the recorded latency, for realistic throughput benchmarks.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, cast
+
+import httpx
+
+# Configure logging
+logger = logging.getLogger("llm.backends")
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", os.path.join("cassettes", "llm.jsonl"))
+LLM_REPLAY_TIMING = os.getenv("LLM_REPLAY_TIMING", "false").lower() == "true"
+BACKENDS = ("openai", "fake", "record", "replay")
+
+# Per-call options that don't change what the model returns
+_VOLATILE_FIELDS = ("stream_options",)
+
+
+def interaction_key(request: httpx.Request) -> str:
+    """Stable identity of a request: method, path and the JSON body with sorted keys."""
+    try:
+        body = json.loads(request.content or b"{}")
+        for field in _VOLATILE_FIELDS:
+            body.pop(field, None)
+        canonical = json.dumps(body, sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        canonical = request.content.decode("utf-8", "replace")
+    payload = f"{request.method} {request.url.path}\n{canonical}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _RecordedStream(httpx.AsyncByteStream):
+    """Yields the recorded body chunks, optionally at their recorded pace."""
+
+    def __init__(self, chunks: List[str], gaps: Optional[List[float]] = None):
+        self.chunks = chunks
+        self.gaps = gaps
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self.chunks):
+            if self.gaps:
+                await asyncio.sleep(self.gaps[i])
+            yield chunk.encode("utf-8")
+
+
+class _TeeStream(httpx.AsyncByteStream):
+    """Passes the upstream body through while capturing it for the cassette."""
+
+    def __init__(self, upstream: httpx.AsyncByteStream, on_close):
+        self.upstream = upstream
+        self.on_close = on_close
+        self.chunks: List[str] = []
+        self.gaps: List[float] = []
+
+    async def __aiter__(self):
+        last = time.perf_counter()
+        async for chunk in self.upstream:
+            now = time.perf_counter()
+            self.gaps.append(round(now - last, 4))
+            last = now
+            self.chunks.append(chunk.decode("utf-8"))
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self.upstream.aclose()
+        self.on_close(self.chunks, self.gaps)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests to `inner` and appends every response to the cassette."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, path: str = LLM_CASSETTE):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = interaction_key(request)
+        response = await self.inner.handle_async_request(request)
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() != "content-encoding"]
+
+        def save(chunks: List[str], gaps: List[float]) -> None:
+            self._append({
+                "key": key,
+                "feature": request.headers.get("x-llm-feature", ""),
+                "status": response.status_code,
+                "headers": headers,
+                "chunks": chunks,
+                "gaps": gaps,
+            })
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=headers,
+            # An async transport always answers with an async body
+            stream=_TeeStream(cast(httpx.AsyncByteStream, response.stream), save),
+            extensions=response.extensions,
+        )
+
+    def _append(self, interaction: dict) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serves recorded responses; unrecorded requests get a 400 so they fail fast, without retries."""
+
+    def __init__(self, path: str = LLM_CASSETTE, timing: bool = LLM_REPLAY_TIMING):
+        self.timing = timing
+        self._interactions: Dict[str, List[dict]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    self._interactions[interaction["key"]].append(interaction)
+        logger.info(f"Loaded {sum(map(len, self._interactions.values()))} recorded LLM interactions from {path}")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = interaction_key(request)
+        recorded = self._interactions.get(key)
+        if not recorded:
+            return httpx.Response(400, json={"error": {
+                "message": f"No recorded response for this request in the cassette (key {key[:12]})",
+                "type": "cassette_miss",
+            }})
+        # Identical requests replay their recordings in order, then cycle
+        interaction = recorded[self._served[key] % len(recorded)]
+        self._served[key] += 1
+        return httpx.Response(
+            status_code=interaction["status"],
+            headers=interaction["headers"],
+            stream=_RecordedStream(interaction["chunks"], interaction["gaps"] if self.timing else None),
+        )
+
+
+_fake_server = None
+
+
+def fake_server_url() -> str:
+    """URL of the fake server: LLM_FAKE_URL, or one started in-process on first use."""
+    global _fake_server
+    url = os.getenv("LLM_FAKE_URL")
+    if url:
+        return url.rstrip("/")
+    if _fake_server is None:
+        from llm.fake_server import FakeLLMServer, load_fake_responses
+        error_rate = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))
+        seed = os.getenv("LLM_FAKE_SEED")
+        _fake_server = FakeLLMServer(
+            responses=load_fake_responses(),
+            latency=os.getenv("LLM_FAKE_LATENCY"),
+            error_rate=error_rate,
+            seed=int(seed) if seed else None,
+            chunk_size=int(os.getenv("LLM_FAKE_CHUNK_SIZE", "16")),
+        ).start()
+        logger.info(f"Started in-process fake LLM server at {_fake_server.url}")
+    return _fake_server.url
@@ -0,0 +1,169 @@
+# llm/batch.py
+"""
+Batch-completions backends for offline bulk generation.
+OpenAIBatchBackend submits a JSONL of chat completion requests to the
+provider's Batch API, which runs them within a 24h window at a lower
+per-token price and on a separate rate limit, so bulk work never competes
+with interactive traffic. LocalBatchBackend is a stand-in with the same
+interface that runs the requests against the configured client with low
+concurrency (used in tests and against the fake server).
+"""
+
+import json
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional
+
+from llm.client import get_client
+
+# Configure logging
+logger = logging.getLogger("llm.batch")
+
+COMPLETION_WINDOW: Literal["24h"] = "24h"
+
+
+@dataclass
+class BatchRequest:
+    """One chat completion in a batch, matched back to its input by custom_id."""
+    custom_id: str
+    messages: list
+    model: str
+    temperature: float
+    max_tokens: Optional[int] = None
+    response_format: Optional[dict] = None
+
+    def body(self) -> dict:
+        body = {"model": self.model, "messages": self.messages, "temperature": self.temperature}
+        if self.max_tokens is not None:
+            body["max_tokens"] = self.max_tokens
+        if self.response_format is not None:
+            body["response_format"] = self.response_format
+        return body
+
+
+@dataclass
+class BatchStatus:
+    """Progress of a submitted batch."""
+    state: str  # validating | in_progress | finalizing | completed | failed | expired | cancelled
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("completed", "failed", "expired", "cancelled")
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one request: the response text or an error message."""
+    custom_id: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+class OpenAIBatchBackend:
+    """Provider Batch API: upload a JSONL file, create a batch, poll, download the output."""
+
+    name = "openai"
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        lines = [
+            json.dumps({"custom_id": r.custom_id, "method": "POST", "url": "/v1/chat/completions", "body": r.body()})
+            for r in requests
+        ]
+        client = get_client()
+        upload = await client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = await client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window=COMPLETION_WINDOW,
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+        return batch.id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = await get_client().batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return BatchStatus(
+            state=batch.status,
+            total=counts.total if counts else 0,
+            completed=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0,
+        )
+
+    async def results(self, batch_id: str) -> List[BatchResult]:
+        client = get_client()
+        batch = await client.batches.retrieve(batch_id)
+        results = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await client.files.content(file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    results.append(_parse_output_line(json.loads(line)))
+        return results
+
+
+def _parse_output_line(record: dict) -> BatchResult:
+    custom_id = record.get("custom_id", "")
+    if record.get("error"):
+        return BatchResult(custom_id, error=str(record["error"].get("message", record["error"])))
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code", 200) >= 400:
+        return BatchResult(custom_id, error=str((body.get("error") or {}).get("message", body)))
+    choices = body.get("choices") or [{}]
+    text = ((choices[0].get("message") or {}).get("content") or "").strip()
+    return BatchResult(custom_id, text=text, usage=body.get("usage") or {})
+
+
+class LocalBatchBackend:
+    """
+    Runs batch requests in-process through the configured client, a few at a
+    time. Same interface as OpenAIBatchBackend; results live in memory.
+    """
+
+    name = "local"
+
+    def __init__(self, concurrency: int = 2):
+        self.concurrency = concurrency
+        self._batches: Dict[str, dict] = {}
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        state = {"status": BatchStatus("in_progress", total=len(requests)), "results": []}
+        state["task"] = asyncio.ensure_future(self._run(state, requests))
+        self._batches[batch_id] = state
+        return batch_id
+
+    async def _run(self, state: dict, requests: List[BatchRequest]) -> None:
+        sem = asyncio.Semaphore(self.concurrency)
+        status: BatchStatus = state["status"]
+
+        async def one(request: BatchRequest) -> None:
+            async with sem:
+                try:
+                    resp = await get_client().chat.completions.create(**request.body())
+                    usage = resp.usage.model_dump() if resp.usage else {}
+                    text = (resp.choices[0].message.content or "").strip()
+                    state["results"].append(BatchResult(request.custom_id, text=text, usage=usage))
+                    status.completed += 1
+                except Exception as e:
+                    state["results"].append(BatchResult(request.custom_id, error=str(e)))
+                    status.failed += 1
+
+        await asyncio.gather(*(one(r) for r in requests))
+        status.state = "completed"
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        return self._batches[batch_id]["status"]
+
+    async def results(self, batch_id: str) -> List[BatchResult]:
+        return list(self._batches[batch_id]["results"])
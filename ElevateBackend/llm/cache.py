@@ -0,0 +1,192 @@
+# llm/cache.py
+"""
+Content-hash cache for LLM responses.
+Responses are keyed by a hash of (model, prompt template version,
+normalized inputs, temperature). Features opt in through CACHE_POLICIES,
+each with its own TTL. Lookups hit an in-process LRU first and, when
+LLM_SHARED_CACHE is enabled or the feature's policy persists its entries,
+fall back to the shared MongoDB tier.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+import database
+from database import fetch_llm_cache, store_llm_cache
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.cache")
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Per-feature caching policy. Features without a policy are not cached.
+    `persist` keeps entries in the shared MongoDB tier even when
+    LLM_SHARED_CACHE is off, so they survive restarts. Replies cut off at
+    max_tokens are only cached with `cache_truncated`, for free-text
+    features where a truncated reply is still usable as it is.
+    """
+    enabled: bool = False
+    ttl: float = 3600.0
+    persist: bool = False
+    cache_truncated: bool = False
+
+
+# Only features whose output depends on nothing but their inputs are opted
+# in by default; generative features such as cover letters stay uncached.
+DEFAULT_POLICIES = {
+    "interview_analysis": CachePolicy(enabled=True, ttl=7 * 24 * 3600),
+    "interview_feedback": CachePolicy(enabled=True, ttl=24 * 3600),
+    # The same résumé is reused across many cover letters
+    "cover_letter.extract_projects": CachePolicy(enabled=True, ttl=30 * 24 * 3600, persist=True, cache_truncated=True),
+}
+
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+SHARED_CACHE_ENABLED = os.getenv("LLM_SHARED_CACHE", "false").lower() == "true"
+
+
+def _load_policies() -> dict:
+    # LLM_CACHE_POLICIES='{"feature": {"enabled": true, "ttl": 600}}' overrides the defaults
+    policies = dict(DEFAULT_POLICIES)
+    raw = os.getenv("LLM_CACHE_POLICIES")
+    if raw:
+        try:
+            for feature, config in json.loads(raw).items():
+                policies[feature] = CachePolicy(**config)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid LLM_CACHE_POLICIES: {e}")
+    return policies
+
+
+CACHE_POLICIES = _load_policies()
+
+
+def get_policy(feature: str) -> CachePolicy:
+    return CACHE_POLICIES.get(feature, CachePolicy())
+
+
+def normalize(value):
+    """Normalize inputs so cosmetic differences (unicode forms, line endings,
+    trailing whitespace, dict ordering) map to the same key."""
+    if isinstance(value, str):
+        text = unicodedata.normalize("NFKC", value).replace("\r\n", "\n")
+        return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def make_key(model: str, prompt_version: str, inputs: dict, temperature: float) -> str:
+    """Hash the call identity into a stable cache key."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "prompt_version": prompt_version,
+            "inputs": normalize(inputs),
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Size-bounded LRU with a per-entry expiry time."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float) -> None:
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ResponseCache:
+    """Two-tier response cache with per-feature hit-rate tracking."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, shared: bool = SHARED_CACHE_ENABLED):
+        self.local = LRUCache(max_entries)
+        self.shared = shared
+        self.hits: dict = {}
+        self.misses: dict = {}
+
+    def _uses_shared(self, feature: str) -> bool:
+        # Without a MongoDB collection there is no shared tier to consult
+        if database.llm_cache_collection is None:
+            return False
+        return self.shared or get_policy(feature).persist
+
+    async def get(self, feature: str, key: str) -> Optional[str]:
+        tier = "local"
+        value = self.local.get(key)
+        if value is None and self._uses_shared(feature):
+            tier = "shared"
+            value = await asyncio.to_thread(fetch_llm_cache, key)
+            if value is not None:
+                # Promote shared hits into the local tier
+                self.local.set(key, value, get_policy(feature).ttl)
+
+        if value is None:
+            self.misses[feature] = self.misses.get(feature, 0) + 1
+            metrics.inc("llm_cache_misses", feature=feature)
+        else:
+            self.hits[feature] = self.hits.get(feature, 0) + 1
+            metrics.inc("llm_cache_hits", feature=feature, tier=tier)
+        metrics.set_gauge("llm_cache_hit_rate", self.hit_rate(feature), feature=feature)
+        metrics.set_gauge("llm_cache_entries", len(self.local))
+        return value
+
+    async def set(self, feature: str, key: str, value: str, ttl: float) -> None:
+        self.local.set(key, value, ttl)
+        if self._uses_shared(feature):
+            expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+            await asyncio.to_thread(store_llm_cache, key, feature, value, expires_at)
+        metrics.set_gauge("llm_cache_entries", len(self.local))
+
+    def hit_rate(self, feature: str) -> float:
+        hits = self.hits.get(feature, 0)
+        total = hits + self.misses.get(feature, 0)
+        return hits / total if total else 0.0
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+
+# Global instance
+response_cache = ResponseCache()
@@ -0,0 +1,559 @@
+# llm/client.py
+"""
+Shared async OpenAI client used by every feature.
+Owns a single AsyncOpenAI instance backed by one pooled httpx client
+(keep-alive connections, HTTP/2 when `h2` is installed) and exposes
+`complete` as the single call path for chat completions, so timeouts,
+retries, hedging, provider failover, timing and token usage are handled
+in one place. Every attempt's timeout is capped by the request deadline
+(llm.deadline).
+"""
+
+import os
+import time
+import asyncio
+import logging
+import importlib.util
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Iterable, Optional
+
+import httpx
+from openai import AsyncOpenAI, AuthenticationError, NotFoundError, PermissionDeniedError, RateLimitError
+from dotenv import load_dotenv
+
+from llm import deadline, metrics, routing
+from llm.adaptive import limiter, overload_reason
+from llm.backends import BACKENDS, LLM_BACKEND, RecordingTransport, ReplayTransport, fake_server_url
+from llm.cache import CachePolicy, get_policy, make_key, response_cache
+from llm.providers import Provider, providers
+from llm.singleflight import singleflight
+from llm.retry import MAX_ATTEMPTS, CircuitOpenError, backoff_delay, is_retryable, retry_budget
+from llm.tokens import PromptTooLarge, check_prompt, get_budget, token_bucket
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+HAS_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Configure logging
+logger = logging.getLogger("llm.client")
+
+# Load environment variables
+load_dotenv()
+
+# Connection pool and timeout settings (overridable from the environment)
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+DEFAULT_TIMEOUT = float(os.getenv("LLM_DEFAULT_TIMEOUT", "120"))
+
+# Errors the API answers with their own status (503 with Retry-After, 413);
+# feature code and endpoints re-raise them instead of wrapping them
+PASSTHROUGH_ERRORS = (CircuitOpenError, PromptTooLarge)
+
+_client: Optional[AsyncOpenAI] = None
+
+
+@dataclass
+class Completion:
+    """Text and token usage of a single chat completion."""
+    text: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cached: bool = False
+    coalesced: bool = False
+
+
+def _build_http_client(backend: str = "openai") -> httpx.AsyncClient:
+    # One pool shared by every feature so concurrent calls reuse warm TLS connections
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT)
+    if backend == "record":
+        transport = RecordingTransport(httpx.AsyncHTTPTransport(http2=HAS_HTTP2, limits=limits))
+        return httpx.AsyncClient(transport=transport, timeout=timeout)
+    if backend == "replay":
+        return httpx.AsyncClient(transport=ReplayTransport(), timeout=timeout)
+    return httpx.AsyncClient(http2=HAS_HTTP2, limits=limits, timeout=timeout)
+
+
+def get_client() -> AsyncOpenAI:
+    """Return the process-wide AsyncOpenAI client for LLM_BACKEND, creating it on first use."""
+    global _client
+    if _client is None:
+        if LLM_BACKEND not in BACKENDS:
+            raise RuntimeError(f"Unknown LLM_BACKEND '{LLM_BACKEND}' (expected one of {', '.join(BACKENDS)})")
+        base_url = None
+        api_key = os.getenv("OPENAI_API_KEY")
+        if LLM_BACKEND == "fake":
+            base_url, api_key = fake_server_url() + "/v1", "fake"
+        elif LLM_BACKEND == "replay":
+            api_key = "replay"
+        elif not api_key:
+            raise RuntimeError("OPENAI_API_KEY not found in environment variables!")
+        _client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=_build_http_client(LLM_BACKEND),
+            timeout=DEFAULT_TIMEOUT,
+            # Retries are handled by llm.retry, under the shared budget and circuit breaker
+            max_retries=0,
+        )
+        logger.info(
+            f"Created shared OpenAI client (backend={LLM_BACKEND}, max_connections={MAX_CONNECTIONS}, "
+            f"keepalive={MAX_KEEPALIVE_CONNECTIONS}, http2={HAS_HTTP2})"
+        )
+    return _client
+
+
+def set_client(client: Optional[AsyncOpenAI]) -> None:
+    """Replace the shared client (used by tests and alternate backends)."""
+    global _client
+    _client = client
+
+
+async def close_client() -> None:
+    """Close the shared client, the other providers' clients and their connection pools."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+    for provider in providers.providers:
+        if provider.client is not None:
+            await provider.client.close()
+            provider.client = None
+
+
+def _client_for(provider: Provider) -> AsyncOpenAI:
+    """The shared client for OpenAI, wherever it is listed; a lazily built one for the others."""
+    if provider.name == "openai":
+        return get_client()
+    if provider.client is None:
+        provider.client = AsyncOpenAI(
+            api_key=os.getenv(provider.api_key_env) or "unset",
+            base_url=provider.base_url,
+            http_client=_build_http_client(),
+            timeout=DEFAULT_TIMEOUT,
+            max_retries=0,
+        )
+        logger.info(f"Created {provider.name} client (base_url={provider.base_url})")
+    return provider.client
+
+
+def _pick_provider(response_format: Optional[dict]) -> Provider:
+    return providers.pick(response_format)
+
+
+def _fallback_provider(response_format: Optional[dict], failed: Iterable[str]) -> Optional[Provider]:
+    return providers.fallback(response_format, avoid=failed)
+
+
+def _request_kwargs(feature, messages, model, temperature, max_tokens, response_format, timeout) -> dict:
+    kwargs = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "timeout": timeout or DEFAULT_TIMEOUT,
+        # Lets the fake server answer per feature and labels cassette entries
+        "extra_headers": {"X-LLM-Feature": feature},
+    }
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    return kwargs
+
+
+async def _admit(feature: str, messages: list, model: str, max_tokens: Optional[int]) -> int:
+    """Token-count the prompt, refuse it if over budget, and reserve its tokens in the TPM bucket."""
+    prompt_tokens = check_prompt(feature, messages, model)
+    reserved = prompt_tokens + (max_tokens or get_budget(feature).expected_completion_tokens)
+    await token_bucket.acquire(reserved, feature)
+    return reserved
+
+
+def _cached_tokens(usage) -> int:
+    """Prompt tokens the provider served from its prompt cache."""
+    details = getattr(usage, "prompt_tokens_details", None) if usage else None
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def _record_usage(feature: str, reserved: int, prompt_tokens: int, completion_tokens: int,
+                  cached_tokens: int = 0) -> None:
+    used = prompt_tokens + completion_tokens
+    if used:
+        metrics.observe("llm_prompt_tokens", prompt_tokens, feature=feature)
+        metrics.observe("llm_completion_tokens", completion_tokens, feature=feature)
+    if prompt_tokens:
+        # Share of prompt tokens served from the provider's prompt cache
+        metrics.inc("llm_prompt_tokens_total", prompt_tokens, feature=feature)
+        metrics.inc("llm_cached_prompt_tokens_total", cached_tokens, feature=feature)
+        metrics.set_gauge(
+            "llm_cached_token_ratio",
+            metrics.get_counter("llm_cached_prompt_tokens_total", feature=feature)
+            / metrics.get_counter("llm_prompt_tokens_total", feature=feature),
+            feature=feature,
+        )
+    # Calls without reported usage are charged the full reservation
+    token_bucket.settle(reserved, used or reserved)
+
+
+# Errors that are another provider's business: its key, access or model name
+_PROVIDER_SETUP_ERRORS = (AuthenticationError, PermissionDeniedError, NotFoundError)
+
+
+async def _should_retry(feature: str, error: Exception, attempt: int,
+                        provider_breaker, failover: bool = False) -> bool:
+    """
+    Record a failed attempt with the provider's circuit breaker and decide
+    whether to try again. With `failover` the next attempt goes to another
+    provider straight away; retrying the same provider first waits out a
+    jittered backoff.
+    """
+    if isinstance(error, CircuitOpenError):
+        return failover
+    if not deadline.allows(0):
+        # A timeout cut short by our own deadline says nothing about provider health
+        provider_breaker.release_probe()
+        return False
+    if not is_retryable(error):
+        # Our own mistakes (bad request, auth) say nothing about provider health
+        provider_breaker.release_probe()
+        if not (failover and isinstance(error, _PROVIDER_SETUP_ERRORS)):
+            return False
+    elif isinstance(error, RateLimitError):
+        # Throttling is the adaptive limiter's job; the breaker tracks provider failures
+        provider_breaker.release_probe()
+    else:
+        provider_breaker.record_failure()
+    if attempt + 1 >= MAX_ATTEMPTS or (provider_breaker.state == "open" and not failover):
+        return False
+    if not retry_budget.try_spend():
+        metrics.inc("llm_retry_budget_exhausted", feature=feature)
+        logger.warning(f"[{feature}] Retry budget exhausted, giving up after {type(error).__name__}")
+        return False
+    delay = 0.0 if failover else backoff_delay(attempt, error)
+    if not deadline.allows(delay):
+        logger.warning(f"[{feature}] No time left before the deadline to retry {type(error).__name__}")
+        return False
+    metrics.inc("llm_retries", feature=feature, error=type(error).__name__)
+    if not failover:
+        logger.warning(
+            f"[{feature}] {type(error).__name__}, retrying in {delay:.2f}s "
+            f"(attempt {attempt + 2}/{MAX_ATTEMPTS})"
+        )
+        await asyncio.sleep(delay)
+    return True
+
+
+async def _send(feature: str, model: str, provider: Provider, kwargs: dict):
+    """
+    Send one chat completion to `provider` as `model`. On routes with
+    hedging enabled, a second copy is sent if the first is still running
+    after the route's p95 latency; whichever answers first is used and the
+    other is cancelled. Hedges spend from the retry budget, so they can't
+    multiply load during an incident.
+    """
+    create = _client_for(provider).chat.completions.create
+    kwargs = {**kwargs, "model": model}
+    delay = routing.hedge_delay(feature, model)
+    if delay is None or not deadline.allows(delay):
+        return await create(**kwargs)
+
+    first = asyncio.ensure_future(create(**kwargs))
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not retry_budget.try_spend():
+            return await first
+        metrics.inc("llm_hedges", feature=feature)
+        logger.info(f"[{feature}] No reply after {delay:.2f}s (p95), sending a hedged request")
+        hedge = asyncio.ensure_future(create(**kwargs))
+        tasks.append(hedge)
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is not None:
+                break
+        else:
+            # Both copies failed; surface the original request's error
+            error = first.exception()
+            assert error is not None
+            raise error
+
+        resp = winner.result()
+        if winner is hedge:
+            metrics.inc("llm_hedge_wins", feature=feature)
+        # Upper bound: the cancelled copy is billed at most what the winner used
+        usage = resp.usage
+        if usage:
+            extra = routing.cost(model, usage.prompt_tokens, usage.completion_tokens, _cached_tokens(usage))
+            metrics.inc("llm_hedge_extra_cost_usd", extra, feature=feature)
+        metrics.set_gauge(
+            "llm_hedge_win_rate",
+            metrics.get_counter("llm_hedge_wins", feature=feature) / metrics.get_counter("llm_hedges", feature=feature),
+            feature=feature,
+        )
+        return resp
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def _record_provider(provider: Provider, outcome: str, duration: Optional[float] = None) -> None:
+    metrics.inc("llm_provider_calls", provider=provider.name, outcome=outcome)
+    if duration is not None:
+        provider.observe_latency(duration)
+
+
+def _record_failover(feature: str, source: Provider, target: Provider, error: Exception) -> None:
+    metrics.inc("llm_failovers", feature=feature, source=source.name, target=target.name)
+    logger.warning(f"[{feature}] {source.name} failed with {type(error).__name__}, failing over to {target.name}")
+
+
+async def _call_upstream(
+    feature: str,
+    messages: list,
+    model: str,
+    temperature: float,
+    max_tokens: Optional[int],
+    response_format: Optional[dict],
+    timeout: Optional[float],
+    cache_key: Optional[str],
+    cache_policy: CachePolicy,
+) -> Completion:
+    """Admit, send (with retries) and account for one upstream chat completion."""
+    kwargs = _request_kwargs(feature, messages, model, temperature, max_tokens, response_format, timeout)
+    reserved = await _admit(feature, messages, model, max_tokens)
+
+    retry_budget.record_request()
+
+    attempt = 0
+    provider = _pick_provider(response_format)
+    failed = set()
+    while True:
+        served = provider.model_for(model)
+        try:
+            # Each attempt gets only the time left before the request deadline
+            kwargs["timeout"] = deadline.cap(timeout or DEFAULT_TIMEOUT)
+            provider.breaker.before_call()
+            # The adaptive limiter bounds upstream concurrency and learns from each outcome
+            async with limiter.slot():
+                start = time.perf_counter()
+                try:
+                    resp = await _send(feature, served, provider, kwargs)
+                except Exception as e:
+                    reason = overload_reason(e)
+                    if reason:
+                        limiter.on_overload(reason)
+                    raise
+                duration = time.perf_counter() - start
+                limiter.on_success(feature, duration)
+            provider.breaker.record_success()
+            _record_provider(provider, "ok", duration)
+            break
+        except Exception as e:
+            _record_provider(provider, "error")
+            failed.add(provider.name)
+            fallback = _fallback_provider(response_format, failed)
+            if not await _should_retry(feature, e, attempt, provider.breaker, failover=fallback is not None):
+                token_bucket.settle(reserved, 0)
+                raise
+            if fallback is not None:
+                _record_failover(feature, provider, fallback, e)
+                provider = fallback
+            attempt += 1
+    metrics.observe("llm_call_seconds", duration, feature=feature, model=model)
+
+    usage = resp.usage
+    completion = Completion(
+        text=(resp.choices[0].message.content or "").strip(),
+        model=resp.model or model,
+        prompt_tokens=usage.prompt_tokens if usage else 0,
+        completion_tokens=usage.completion_tokens if usage else 0,
+        cached_tokens=_cached_tokens(usage),
+    )
+    _record_usage(feature, reserved, completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens)
+    routing.record_call(feature, served, duration, completion.prompt_tokens, completion.completion_tokens, completion.cached_tokens)
+    logger.info(
+        f"[{feature}] {provider.name}/{served} completed in {duration:.2f}s "
+        f"(prompt={completion.prompt_tokens}, cached={completion.cached_tokens}, "
+        f"completion={completion.completion_tokens} tokens)"
+    )
+
+    # Only cache complete, non-empty responses, or truncated ones where the policy accepts them
+    finish_reason = resp.choices[0].finish_reason
+    if cache_key and completion.text and (
+            finish_reason == "stop" or (finish_reason == "length" and cache_policy.cache_truncated)):
+        await response_cache.set(feature, cache_key, completion.text, cache_policy.ttl)
+    return completion
+
+
+async def complete(
+    feature: str,
+    messages: list,
+    *,
+    model: str,
+    temperature: float,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[dict] = None,
+    timeout: Optional[float] = None,
+    cache_inputs: Optional[dict] = None,
+    prompt_version: str = "1",
+) -> Completion:
+    """
+    Run one chat completion through the shared client.
+
+    When the feature has an enabled CachePolicy and `cache_inputs` is given,
+    the response is served from / stored in the response cache. The prompt
+    is token-counted first and refused with PromptTooLarge if it exceeds the
+    feature's budget. Transient provider errors are retried with jittered
+    backoff; CircuitOpenError is raised while the provider is degraded.
+    Concurrent calls with an identical normalized prompt are coalesced into
+    one upstream request.
+
+    Args:
+        feature: Name of the calling feature, used for logging
+        messages: Chat messages to send
+        model: Model name
+        temperature: Sampling temperature
+        max_tokens: Optional completion token cap
+        response_format: Optional OpenAI response_format
+        timeout: Per-call timeout in seconds (defaults to LLM_DEFAULT_TIMEOUT)
+        cache_inputs: The user-variable inputs that determine the response
+        prompt_version: Version of the prompt template, part of the cache key
+
+    Returns:
+        Completion: The stripped response text and token usage
+    """
+    # Serve deterministic features from the response cache when possible
+    cache_key = None
+    policy = get_policy(feature)
+    if policy.enabled and cache_inputs is not None:
+        cache_key = make_key(model, prompt_version, cache_inputs, temperature)
+        cached_text = await response_cache.get(feature, cache_key)
+        if cached_text is not None:
+            logger.info(f"[{feature}] Served from response cache")
+            return Completion(text=cached_text, model=model, cached=True)
+
+    # Identical concurrent calls share one upstream request; each caller gets its own Completion
+    flight_key = make_key(model, "singleflight", {
+        "feature": feature,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "response_format": response_format,
+    }, temperature)
+    completion, shared = await singleflight.do(
+        flight_key,
+        lambda: _call_upstream(
+            feature, messages, model, temperature, max_tokens, response_format, timeout,
+            cache_key, policy,
+        ),
+        feature,
+    )
+    return replace(completion, coalesced=shared)
+
+
+async def stream(
+    feature: str,
+    messages: list,
+    *,
+    model: str,
+    temperature: float,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[dict] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream one chat completion through the shared client, yielding content
+    deltas as they arrive. Usage and time-to-first-token are logged once the
+    stream finishes. Failures before the first token are retried like
+    `complete`; once text has been yielded the error is raised as-is.
+    """
+    kwargs = _request_kwargs(feature, messages, model, temperature, max_tokens, response_format, timeout)
+    reserved = await _admit(feature, messages, model, max_tokens)
+    retry_budget.record_request()
+
+    first_token = None
+    usage = None
+    attempt = 0
+    provider = _pick_provider(response_format)
+    failed = set()
+    try:
+        while True:
+            served = provider.model_for(model)
+            try:
+                kwargs["timeout"] = deadline.cap(timeout or DEFAULT_TIMEOUT)
+                provider.breaker.before_call()
+                async with limiter.slot():
+                    start = time.perf_counter()
+                    try:
+                        response = await _client_for(provider).chat.completions.create(
+                            **{**kwargs, "model": served}, stream=True, stream_options={"include_usage": True}
+                        )
+                        try:
+                            async for chunk in response:
+                                if chunk.usage:
+                                    usage = chunk.usage
+                                if not chunk.choices or not chunk.choices[0].delta.content:
+                                    continue
+                                if first_token is None:
+                                    first_token = time.perf_counter() - start
+                                    metrics.observe("llm_time_to_first_token_seconds", first_token, feature=feature, model=model)
+                                    # Time to first token is the latency signal for streams
+                                    limiter.on_success(feature, first_token, kind="first_token")
+                                    provider.breaker.record_success()
+                                    _record_provider(provider, "ok", first_token)
+                                yield chunk.choices[0].delta.content
+                        finally:
+                            # Release the connection even when the consumer stops early
+                            await response.close()
+                    except Exception as e:
+                        reason = overload_reason(e)
+                        if reason:
+                            limiter.on_overload(reason)
+                        raise
+                if first_token is None:
+                    provider.breaker.record_success()
+                    _record_provider(provider, "ok")
+                break
+            except Exception as e:
+                # Text already sent to the caller can't be taken back, so only retry or fail over before it
+                if first_token is not None:
+                    raise
+                _record_provider(provider, "error")
+                failed.add(provider.name)
+                fallback = _fallback_provider(response_format, failed)
+                if not await _should_retry(feature, e, attempt, provider.breaker, failover=fallback is not None):
+                    raise
+                if fallback is not None:
+                    _record_failover(feature, provider, fallback, e)
+                    provider = fallback
+                attempt += 1
+    finally:
+        _record_usage(
+            feature, reserved,
+            usage.prompt_tokens if usage else 0,
+            usage.completion_tokens if usage else 0,
+            _cached_tokens(usage),
+        )
+
+    duration = time.perf_counter() - start
+    metrics.observe("llm_call_seconds", duration, feature=feature, model=model)
+    routing.record_call(
+        feature, served, duration,
+        usage.prompt_tokens if usage else 0,
+        usage.completion_tokens if usage else 0,
+        _cached_tokens(usage),
+    )
+    logger.info(
+        f"[{feature}] {provider.name}/{served} streamed in {duration:.2f}s (first token {first_token or 0:.2f}s, "
+        f"prompt={usage.prompt_tokens if usage else 0}, cached={_cached_tokens(usage)}, completion={usage.completion_tokens if usage else 0} tokens)"
+    )
@@ -0,0 +1,146 @@
+# llm/deadline.py
+"""
+End-to-end request deadlines.
+Each endpoint has a time budget. `guard()` runs the endpoint's work under
+that budget and records the absolute deadline in a context variable, so
+everything below it can see how much time is left. That covers scheduler
+queueing, each LLM attempt's timeout, retries and hedges, as well as
+tasks started from the request. The work is cancelled when the budget
+runs out or the client disconnects.
+
+Budgets can be overridden from the environment:
+    LLM_DEADLINES='{"resume_optimization": 45}'
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.deadline")
+
+# Seconds each endpoint may take end to end, queueing included
+DEFAULT_BUDGETS = {
+    "interview_analysis": 30.0,
+    "interview_feedback": 30.0,
+    "resume_optimization": 60.0,
+    "cover_letter": 90.0,
+    "cover_letter.paragraph": 20.0,
+    "project_evaluation": 60.0,
+    "skill_benchmark": 60.0,
+    "role_transition": 60.0,
+    "learning_pathways": 90.0,
+}
+DEFAULT_BUDGET = float(os.getenv("LLM_DEFAULT_DEADLINE", "120"))
+
+# How often a running request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("LLM_DISCONNECT_POLL_SECONDS", "1"))
+
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of its time budget."""
+
+    def __init__(self, feature: str, budget: float):
+        super().__init__(f"{feature} did not finish within its {budget:g}s deadline")
+        self.feature = feature
+        self.budget = budget
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away and its request was abandoned."""
+
+    def __init__(self, feature: str):
+        super().__init__(f"Client disconnected during {feature}, work cancelled")
+        self.feature = feature
+
+
+def _load_budgets() -> dict:
+    budgets = dict(DEFAULT_BUDGETS)
+    raw = os.getenv("LLM_DEADLINES")
+    if raw:
+        try:
+            budgets.update({str(k): float(v) for k, v in json.loads(raw).items()})
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid LLM_DEADLINES: {e}")
+    return budgets
+
+
+BUDGETS = _load_budgets()
+
+
+def get_budget(feature: str) -> float:
+    return BUDGETS.get(feature, DEFAULT_BUDGET)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def cap(timeout: float) -> float:
+    """Shorten a timeout so it ends no later than the current deadline."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return max(0.0, min(timeout, left))
+
+
+def allows(seconds: float) -> bool:
+    """True if waiting `seconds` more still leaves time before the deadline."""
+    left = remaining()
+    return left is None or left > seconds
+
+
+async def guard(feature: str, run: Callable[[], Awaitable],
+                is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                budget: Optional[float] = None):
+    """
+    Run `run()` under the feature's deadline (or `budget` seconds).
+    Raises DeadlineExceeded when the budget runs out, and ClientDisconnected
+    once `is_disconnected()` reports the client has gone; either way the
+    work, including any in-flight LLM calls, is cancelled.
+    """
+    budget = budget if budget is not None else get_budget(feature)
+    deadline = time.monotonic() + budget
+    outer = _deadline.get()
+    if outer is not None:
+        # A nested guard never extends the deadline it runs under
+        deadline = min(outer, deadline)
+    token = _deadline.set(deadline)
+    try:
+        # The task copies the context, so it sees the deadline set above
+        task = asyncio.ensure_future(run())
+    finally:
+        _deadline.reset(token)
+
+    try:
+        while True:
+            left = deadline - time.monotonic()
+            timeout = left if is_disconnected is None else min(left, DISCONNECT_POLL_SECONDS)
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, timeout))
+            if done:
+                return task.result()
+            if time.monotonic() >= deadline:
+                metrics.inc("llm_deadline_exceeded", feature=feature)
+                logger.warning(f"[{feature}] Deadline of {budget:g}s exceeded, cancelling")
+                raise DeadlineExceeded(feature, budget)
+            if is_disconnected is not None and await is_disconnected():
+                metrics.inc("llm_client_disconnects", feature=feature)
+                logger.info(f"[{feature}] Client disconnected, cancelling")
+                raise ClientDisconnected(feature)
+    finally:
+        if not task.done():
+            task.cancel()
+            # Let the work unwind (closing upstream connections) before returning
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,281 @@
+# llm/fake_server.py
+"""
+Local stand-in for the OpenAI chat completions API.
+Serves /v1/chat/completions with either a JSON body or an SSE token
+stream, so streaming and client behaviour can be exercised without
+network access or an API key. It can also throttle like the real API:
+with `max_concurrent` set, requests beyond that many in flight get a 429.
+Like the provider's prompt cache, it reports a prompt prefix shared with an
+earlier request (1024 tokens or more, in 128-token steps) as cached tokens,
+and a reply longer than the request's max_tokens is cut off with
+finish_reason "length".
+
+For load tests it can answer per feature (from the X-LLM-Feature header
+llm.client sends) with canned, parseable responses, draw latency from a
+distribution and fail a fraction of requests. Randomness is seeded, so a
+run is reproducible.
+
+Usage:
+    with FakeLLMServer(content='{"ok": true}') as server:
+        set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+
+    # Standalone, for LLM_BACKEND=fake with LLM_FAKE_URL=http://127.0.0.1:8001
+    python -m llm.fake_server --port 8001 --latency lognormal:0.8,0.5 --error-rate 0.01
+"""
+
+import os
+import json
+import time
+import math
+import random
+import socket
+import asyncio
+import argparse
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# Prompt caching granularity of the real API, in tokens (~4 characters each)
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+
+def _cached_tokens(prompt: str, previous: list) -> int:
+    """Tokens of the longest prefix `prompt` shares with an earlier prompt."""
+    best = max((len(os.path.commonprefix([prompt, earlier])) for earlier in previous), default=0)
+    tokens = best // 4 // CACHE_STEP_TOKENS * CACHE_STEP_TOKENS
+    return tokens if tokens >= CACHE_MIN_TOKENS else 0
+
+
+FAKE_RESPONSES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fake_responses.json")
+FEATURE_HEADER = "x-llm-feature"
+
+
+def load_fake_responses(path: str = FAKE_RESPONSES_PATH) -> Dict[str, str]:
+    """Canned completion text per feature, shaped so every feature's parser accepts it."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {feature: value if isinstance(value, str) else json.dumps(value) for feature, value in data.items()}
+
+
+def parse_latency(spec: Optional[str], rng: random.Random) -> Callable[[], float]:
+    """
+    Build a latency sampler (seconds) from a spec:
+        0.5 | fixed:0.5 | uniform:0.2,1.5 | normal:0.8,0.2 | lognormal:<median>,<sigma>
+    """
+    if not spec:
+        return lambda: 0.0
+    if ":" not in spec:
+        spec = f"fixed:{spec}"
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _chunks(text: str, size: int):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def create_app(content: str = "", chunk_size: int = 8, delay: float = 0.0,
+               max_concurrent: Optional[int] = None, responses: Optional[Dict[str, str]] = None,
+               latency: Optional[str] = None, error_rate: float = 0.0, error_status: int = 500,
+               seed: Optional[int] = None) -> FastAPI:
+    """
+    Build the fake API app.
+
+    Args:
+        content: Text every completion answers with
+        chunk_size: Characters per streamed delta
+        delay: Seconds to sleep before each streamed delta (or the whole
+            response when not streaming)
+        max_concurrent: Answer 429 once more than this many requests are in flight
+        responses: Text per feature, used instead of `content` when the
+            request's X-LLM-Feature header matches
+        latency: Latency distribution spec (see parse_latency), applied once
+            before the response or the first streamed delta
+        error_rate: Fraction of requests answered with `error_status`
+        seed: Seed for latency and error sampling
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    sample_latency = parse_latency(latency, rng)
+    app.state.content = content
+    app.state.responses = responses or {}
+    app.state.error_rate = error_rate
+    # Most recent request bodies, bounded so long load tests don't grow without limit
+    app.state.requests = deque(maxlen=10000)
+    app.state.max_concurrent = max_concurrent
+    app.state.inflight = 0
+    app.state.throttled = 0
+    app.state.prompts = []
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests.append(body)
+        if app.state.error_rate and rng.random() < app.state.error_rate:
+            return JSONResponse(status_code=error_status, content={"error": {
+                "message": "The server had an error while processing your request.",
+                "type": "server_error",
+            }})
+        limit = app.state.max_concurrent
+        if limit is not None and app.state.inflight >= limit:
+            app.state.throttled += 1
+            return JSONResponse(status_code=429, content={"error": {
+                "message": "Rate limit reached for requests",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }})
+        app.state.inflight += 1
+        try:
+            return await respond(body, request.headers.get(FEATURE_HEADER, ""))
+        finally:
+            if not body.get("stream"):
+                app.state.inflight -= 1
+
+    async def respond(body: dict, feature: str):
+        model = body.get("model", "gpt-4o")
+        text = app.state.responses.get(feature, app.state.content)
+        # Like the real API, a reply longer than max_tokens is cut off (~4 characters a token)
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(text) // 4 > body["max_tokens"]:
+            text, finish_reason = text[:body["max_tokens"] * 4], "length"
+        wait = sample_latency()
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+        cached_tokens = _cached_tokens(prompt, app.state.prompts)
+        app.state.prompts = (app.state.prompts + [prompt])[-32:]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": prompt_tokens + len(text) // 4,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": model}
+
+        if not body.get("stream"):
+            if delay or wait:
+                await asyncio.sleep(delay + wait)
+            return JSONResponse({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": finish_reason,
+                    "message": {"role": "assistant", "content": text},
+                }],
+                "usage": usage,
+            })
+
+        async def events():
+            try:
+                async for frame in frames():
+                    yield frame
+            finally:
+                app.state.inflight -= 1
+
+        async def frames():
+            if wait:
+                await asyncio.sleep(wait)
+            for piece in _chunks(text, chunk_size):
+                if delay:
+                    await asyncio.sleep(delay)
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                ]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            done = {**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {}, "finish_reason": finish_reason}
+            ]}
+            yield f"data: {json.dumps(done)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+class FakeLLMServer:
+    """Runs the fake API with uvicorn on a free local port in a background thread."""
+
+    def __init__(self, content: str = "", chunk_size: int = 8, delay: float = 0.0,
+                 max_concurrent: Optional[int] = None, **options):
+        self.app = create_app(content, chunk_size, delay, max_concurrent, **options)
+        self.port: Optional[int] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def requests(self) -> list:
+        return self.app.state.requests
+
+    def start(self) -> "FakeLLMServer":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        self.port = sock.getsockname()[1]
+        config = uvicorn.Config(self.app, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 5
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake LLM server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None and self._thread is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", help="e.g. fixed:0.5, uniform:0.2,1.5, lognormal:0.8,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds between streamed deltas")
+    parser.add_argument("--max-concurrent", type=int)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    app = create_app(
+        chunk_size=args.chunk_size, delay=args.delay, max_concurrent=args.max_concurrent,
+        responses=load_fake_responses(), latency=args.latency, error_rate=args.error_rate,
+        error_status=args.error_status, seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# llm/jsonparse.py
+"""
+Tolerant JSON parsing for model replies.
+Well-formed replies (nearly all of them under structured outputs) take the
+C json.loads fast path. Anything else goes through one pass of json_repair,
+which copes with markdown fences and surrounding prose, trailing commas,
+unescaped quotes inside strings, single-quoted keys, raw control characters
+and output truncated mid-value. Repairs are counted per feature.
+"""
+
+import json
+import logging
+from typing import Any
+
+from json_repair import repair_json
+
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.jsonparse")
+
+
+def loads(text: str, feature: str = "") -> Any:
+    """Parse the JSON in a model reply. Raises ValueError if it holds none."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    repaired = repair_json(text or "", return_objects=True)
+    # json_repair answers "" when there is nothing JSON-like to recover
+    if not isinstance(repaired, (dict, list)):
+        raise ValueError(f"No JSON found in model output: {(text or '')[:100]!r}")
+    metrics.inc("llm_json_repairs", feature=feature or "unknown")
+    logger.info(f"[{feature or 'unknown'}] Repaired malformed JSON in model output ({len(text)} chars)")
+    return repaired
+
+
+def loads_object(text: str, feature: str = "") -> dict:
+    """Like loads(), but the reply must hold a JSON object."""
+    result = loads(text, feature)
+    if not isinstance(result, dict):
+        raise ValueError(f"Expected a JSON object in model output, got {type(result).__name__}")
+    return result
@@ -0,0 +1,110 @@
+# llm/metrics.py
+"""
+Minimal in-process metrics registry for the LLM layer.
+Counters, gauges and histograms are keyed by name plus a label set and
+are exported as one JSON document by the /metrics endpoint.
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+# Number of recent observations kept per histogram for quantile estimates
+HISTOGRAM_WINDOW = 2048
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, tuple], float] = {}
+_gauges: Dict[Tuple[str, tuple], float] = {}
+_histograms: Dict[Tuple[str, tuple], "Histogram"] = {}
+
+
+class Histogram:
+    """Running count/sum plus a sliding window of recent values for quantiles."""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.values: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.values.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Increment a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Set a gauge to an absolute value."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one observation in a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+
+
+def get_counter(name: str, **labels) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+def get_gauge(name: str, **labels) -> float:
+    return _gauges.get(_key(name, labels), 0)
+
+
+def get_histogram(name: str, **labels) -> Histogram:
+    """Return the histogram for name/labels (an empty one if never observed)."""
+    return _histograms.get(_key(name, labels)) or Histogram()
+
+
+def snapshot() -> dict:
+    """Export every metric as {name: [{"labels": {...}, "value": ...}, ...]}."""
+    with _lock:
+        out: Dict[str, list] = {}
+        for (name, labels), value in _counters.items():
+            out.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), value in _gauges.items():
+            out.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), histogram in _histograms.items():
+            out.setdefault(name, []).append({"labels": dict(labels), **histogram.summary()})
+        return out
+
+
+def reset() -> None:
+    """Clear every metric (used by tests)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
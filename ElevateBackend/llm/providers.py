@@ -0,0 +1,158 @@
+# llm/providers.py
+"""
+LLM providers and latency-aware failover between them.
+Every provider is reached through its OpenAI-compatible chat completions
+endpoint, so the same AsyncOpenAI client, retry layer, streaming and
+fake-server tooling work for all of them. Each provider has its own
+circuit breaker and an EWMA of its successful call latency. `pick()`
+returns the fastest healthy provider that can honour the request's output
+format; strict json_schema outputs only go to providers that enforce them.
+
+Enabled providers, in order of preference:
+    LLM_PROVIDERS=openai,gemini,anthropic
+Each provider's endpoint can be pointed elsewhere, e.g. a local stand-in
+(python -m llm.fake_server) for offline failover drills:
+    GEMINI_BASE_URL=http://127.0.0.1:8100/v1
+"""
+
+import os
+import random
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from openai import AsyncOpenAI
+
+from llm import metrics, routing
+from llm.retry import CircuitBreaker, breaker as openai_breaker
+
+# Configure logging
+logger = logging.getLogger("llm.providers")
+
+# Weight of the newest sample in the latency EWMA
+LATENCY_ALPHA = float(os.getenv("LLM_PROVIDER_LATENCY_ALPHA", "0.2"))
+# Share of calls sent to a random healthy provider, so every EWMA stays current
+EXPLORE_RATE = float(os.getenv("LLM_PROVIDER_EXPLORE_RATE", "0.05"))
+
+
+@dataclass
+class Provider:
+    """One OpenAI-compatible LLM endpoint and its live health and latency."""
+    name: str
+    base_url: Optional[str]
+    api_key_env: str
+    # Model per routing tier; empty means model names are used as given
+    models: Dict[str, str] = field(default_factory=dict)
+    # Whether the endpoint enforces strict json_schema response formats
+    json_schema: bool = True
+    latency_ewma: Optional[float] = None
+    client: Optional[AsyncOpenAI] = field(default=None, repr=False)
+    # Passing None gives the provider a breaker of its own
+    breaker: CircuitBreaker = field(default=None, repr=False)  # type: ignore[assignment]
+
+    def __post_init__(self):
+        if self.breaker is None:
+            self.breaker = CircuitBreaker(name=self.name)
+
+    def model_for(self, model: str) -> str:
+        """This provider's model for the tier `model` belongs to."""
+        if not self.models:
+            return model
+        return self.models.get(routing.tier_of(model), self.models.get("large", model))
+
+    def supports(self, response_format: Optional[dict]) -> bool:
+        return self.json_schema or (response_format or {}).get("type") != "json_schema"
+
+    def observe_latency(self, seconds: float) -> None:
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma += LATENCY_ALPHA * (seconds - self.latency_ewma)
+        metrics.set_gauge("llm_provider_latency_ewma", self.latency_ewma, provider=self.name)
+
+
+# OpenAI-compatible endpoints of the providers the requirements already pin
+DEFAULT_PROVIDERS = {
+    # OpenAI keeps the shared breaker the rest of the LLM layer reports on
+    "openai": lambda: Provider("openai", None, "OPENAI_API_KEY", breaker=openai_breaker),
+    "gemini": lambda: Provider(
+        "gemini", "https://generativelanguage.googleapis.com/v1beta/openai/", "GEMINI_API_KEY",
+        models={"small": "gemini-2.0-flash", "large": "gemini-1.5-pro"},
+    ),
+    # Anthropic's compatibility layer ignores response_format, so it only takes free-text calls
+    "anthropic": lambda: Provider(
+        "anthropic", "https://api.anthropic.com/v1/", "ANTHROPIC_API_KEY",
+        models={"small": "claude-3-5-haiku-latest", "large": "claude-3-5-sonnet-latest"},
+        json_schema=False,
+    ),
+}
+
+
+class ProviderPool:
+    """The enabled providers, in order of preference."""
+
+    def __init__(self, providers: List[Provider], explore_rate: float = EXPLORE_RATE,
+                 rng: Optional[random.Random] = None):
+        self.providers = providers
+        self.explore_rate = explore_rate
+        self._rng = rng or random.Random()
+
+    @property
+    def primary(self) -> Provider:
+        return self.providers[0]
+
+    def get(self, name: str) -> Optional[Provider]:
+        return next((p for p in self.providers if p.name == name), None)
+
+    def pick(self, response_format: Optional[dict] = None,
+             available: Optional[Callable[[Provider], bool]] = None) -> Provider:
+        """
+        The fastest healthy provider that supports `response_format`. Providers
+        with no latency yet rank after those with one, in configured order.
+        Falls back to the primary provider if none supports the format.
+        """
+        return self._choose(response_format, available, ()) or self.primary
+
+    def fallback(self, response_format: Optional[dict] = None,
+                 available: Optional[Callable[[Provider], bool]] = None,
+                 avoid: Iterable[str] = ()) -> Optional[Provider]:
+        """Like pick(), but skipping the names in `avoid`; None if no compatible provider is left."""
+        return self._choose(response_format, available, avoid)
+
+    def _choose(self, response_format: Optional[dict], available: Optional[Callable[[Provider], bool]],
+                avoid: Iterable[str]) -> Optional[Provider]:
+        available = available or (lambda p: p.breaker.available())
+        candidates = [p for p in self.providers if p.supports(response_format) and p.name not in avoid]
+        if not candidates:
+            return None
+        healthy = [p for p in candidates if available(p)] or candidates
+        if len(healthy) > 1 and self._rng.random() < self.explore_rate:
+            return self._rng.choice(healthy)
+        order = {p.name: i for i, p in enumerate(self.providers)}
+        return min(healthy, key=lambda p: (p.latency_ewma is None, p.latency_ewma or 0.0, order[p.name]))
+
+    def snapshot(self) -> list:
+        return [
+            {"provider": p.name, "latency_ewma": p.latency_ewma, "breaker": p.breaker.state,
+             "json_schema": p.json_schema}
+            for p in self.providers
+        ]
+
+
+def _load_providers() -> List[Provider]:
+    providers = []
+    for name in os.getenv("LLM_PROVIDERS", "openai").split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in DEFAULT_PROVIDERS:
+            logger.warning(f"Ignoring unknown provider '{name}' in LLM_PROVIDERS")
+            continue
+        provider = DEFAULT_PROVIDERS[name]()
+        provider.base_url = os.getenv(f"{name.upper()}_BASE_URL", provider.base_url)
+        providers.append(provider)
+    return providers or [DEFAULT_PROVIDERS["openai"]()]
+
+
+# Global instance
+providers = ProviderPool(_load_providers())
@@ -0,0 +1,184 @@
+# llm/retry.py
+"""
+Retry layer for upstream LLM calls.
+Errors are classified as retryable (429, 5xx, timeouts, connection errors)
+or not (bad requests, auth, our own budget rejections). Retryable failures
+are retried with exponential backoff and full jitter, honouring the
+provider's Retry-After hint, but only while the global retry budget allows
+it, so retries can't multiply load during an outage. A circuit breaker
+trips when most recent calls fail and then fails fast until a probe call
+succeeds again. All waiting is done with asyncio.sleep.
+"""
+
+import os
+import time
+import random
+import logging
+from collections import deque
+from typing import Optional
+
+import httpx
+import openai
+
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.retry")
+
+MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = float(os.getenv("LLM_RETRY_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("LLM_RETRY_BACKOFF_CAP", "8"))
+# Retries may add at most this fraction on top of first attempts (plus a small floor)
+RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))
+BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM provider is degraded; failing fast for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for transient provider failures worth another attempt."""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None,
+                  base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff; a provider Retry-After hint sets the floor."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    hint = _retry_after(error) if error is not None else None
+    if hint is not None:
+        delay = max(delay, min(hint, cap))
+    return delay
+
+
+class RetryBudget:
+    """
+    Sliding-window retry budget: within `window` seconds, retries may not
+    exceed `ratio` x first attempts plus `min_retries`.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: int = 10, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        """Claim one retry if the budget allows it."""
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Closed -> open when the failure rate over the last `window` calls reaches
+    `failure_rate` (with at least `min_calls`); open -> half-open after
+    `reset_timeout`, letting one probe through; a successful probe closes it.
+    """
+
+    def __init__(self, name: str = "openai", failure_rate: float = BREAKER_FAILURE_RATE,
+                 window: int = 20, min_calls: int = 10, reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"[{self.name}] Circuit breaker {self.state} -> {state}")
+            self.state = state
+        metrics.set_gauge("llm_circuit_open", 1 if state == "open" else 0, breaker=self.name)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if calls should not reach the provider right now."""
+        if self.state == "open":
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                metrics.inc("llm_circuit_rejections", breaker=self.name)
+                raise CircuitOpenError(remaining)
+            self._set_state("half_open")
+        if self.state == "half_open":
+            # A probe that never reported back (e.g. cancelled) stops blocking after reset_timeout
+            now = time.monotonic()
+            if self._probing and now - self._probe_started < self.reset_timeout:
+                metrics.inc("llm_circuit_rejections", breaker=self.name)
+                raise CircuitOpenError(1)
+            self._probing = True
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        self._probing = False
+        self._outcomes.append(True)
+        if self.state != "closed":
+            self._outcomes.clear()
+            self._set_state("closed")
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self._outcomes.append(False)
+        if self.state == "half_open":
+            self._open()
+            return
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def available(self) -> bool:
+        """True unless the breaker is open and still inside its reset timeout."""
+        return self.state != "open" or time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def release_probe(self) -> None:
+        """Let another probe through when the current one ended without a verdict."""
+        self._probing = False
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._set_state("open")
+
+
+# Global instances shared by every call through llm.client
+retry_budget = RetryBudget()
+breaker = CircuitBreaker()
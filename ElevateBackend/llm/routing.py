@@ -0,0 +1,204 @@
+# llm/routing.py
+"""
+Model routing.
+Every LLM call site is a route (the feature name it passes to
+llm.client) mapped to a model tier, so sub-tasks such as project
+extraction run on a small, fast model and only the main generations pay
+for the large one. Routes can pin a specific model or split traffic
+between tiers for A/B tests, and can opt in to hedging. Latency, cost
+and fallback rate are recorded per route and model, so a sub-task can be
+moved to a smaller tier with data behind the decision.
+"""
+
+import os
+import json
+import random
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.routing")
+
+# LLM_MODEL_TIERS='{"small": "gpt-4o-mini"}' overrides the model behind a tier
+DEFAULT_TIERS = {
+    "small": "gpt-4o-mini",
+    "large": "gpt-4o",
+}
+
+# A hedge fires once a call outlives the route's p95 latency, but only
+# after enough calls to know the p95, and never sooner than the floor
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+
+# USD per million tokens: (input, cached input, output)
+PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "gemini-1.5-pro": (1.25, 0.3125, 5.00),
+    "claude-3-5-haiku-latest": (0.80, 0.08, 4.00),
+    "claude-3-5-sonnet-latest": (3.00, 0.30, 15.00),
+}
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    Model choice for one call site.
+    `model` pins a specific model over the tier. `split` sends a share of
+    traffic to other tiers or models, e.g. {"small": 0.1} for a 10% trial.
+    `hedge` sends a second copy of a call that runs past the route's p95.
+    """
+    tier: str = "large"
+    model: Optional[str] = None
+    split: Dict[str, float] = field(default_factory=dict)
+    hedge: bool = False
+
+
+# Extraction sub-steps feed a larger generation, so they start on the small tier.
+# Hedging is on where a slow tail dominates the wait and the call is idempotent.
+DEFAULT_ROUTES = {
+    "cover_letter.extract_projects": Route(tier="small"),
+    "cover_letter": Route(),
+    "cover_letter.paragraph": Route(),
+    "interview_analysis": Route(hedge=True),
+    "interview_feedback": Route(hedge=True),
+    "learning_pathways": Route(),
+    "project_evaluation": Route(),
+    "resume_optimization": Route(hedge=True),
+    "role_transition": Route(),
+    "skill_benchmark": Route(),
+}
+
+
+def _load_tiers() -> dict:
+    tiers = dict(DEFAULT_TIERS)
+    raw = os.getenv("LLM_MODEL_TIERS")
+    if raw:
+        try:
+            tiers.update({str(k): str(v) for k, v in json.loads(raw).items()})
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid LLM_MODEL_TIERS: {e}")
+    return tiers
+
+
+def _load_routes() -> dict:
+    # LLM_ROUTES='{"route": {"tier": "small", "split": {"large": 0.2}}}' overrides the defaults
+    routes = dict(DEFAULT_ROUTES)
+    raw = os.getenv("LLM_ROUTES")
+    if raw:
+        try:
+            for name, config in json.loads(raw).items():
+                routes[name] = Route(**config)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid LLM_ROUTES: {e}")
+    return routes
+
+
+TIERS = _load_tiers()
+ROUTES = _load_routes()
+
+
+def get_route(name: str) -> Route:
+    return ROUTES.get(name, Route())
+
+
+def resolve(target: str) -> str:
+    """Model name for a tier name; anything else is taken as a model name."""
+    return TIERS.get(target, target)
+
+
+def tier_of(model: str) -> str:
+    """Tier a model name belongs to; models outside every tier count as large."""
+    return next((tier for tier, name in TIERS.items() if name == model), "large")
+
+
+def _bucket(name: str, key: Optional[str]) -> float:
+    # A stable key (e.g. the user id) keeps one user on one arm of a split
+    if key is None:
+        return random.random()
+    digest = hashlib.sha256(f"{name}:{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def base_model(name: str) -> str:
+    """The model route `name` uses outside any A/B split."""
+    route = get_route(name)
+    return route.model or resolve(route.tier)
+
+
+def choose(name: str, key: Optional[str] = None) -> str:
+    """Pick the model for one call on route `name`."""
+    route = get_route(name)
+    if route.split:
+        point = _bucket(name, key)
+        for target, share in route.split.items():
+            if point < share:
+                return resolve(target)
+            point -= share
+    return base_model(name)
+
+
+def hedge_delay(name: str, model: str) -> Optional[float]:
+    """Seconds to wait before hedging a call on this route, or None to not hedge."""
+    if not get_route(name).hedge:
+        return None
+    latency = metrics.get_histogram("llm_route_seconds", route=name, model=model)
+    if latency.count < HEDGE_MIN_SAMPLES:
+        return None
+    return max(HEDGE_MIN_DELAY, latency.quantile(0.95))
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """USD cost of one call, or 0 for models without a known price."""
+    price = PRICES.get(model)
+    if price is None:
+        return 0.0
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * price[0] + cached_tokens * price[1] + completion_tokens * price[2]) / 1_000_000
+
+
+def _update_fallback_rate(route: str, model: str) -> None:
+    calls = metrics.get_counter("llm_route_calls", route=route, model=model)
+    if calls:
+        fallbacks = metrics.get_counter("llm_route_fallbacks", route=route, model=model)
+        metrics.set_gauge("llm_route_fallback_rate", fallbacks / calls, route=route, model=model)
+
+
+def record_call(route: str, model: str, seconds: float, prompt_tokens: int = 0,
+                completion_tokens: int = 0, cached_tokens: int = 0) -> None:
+    """Record latency and cost of one upstream call on a route."""
+    metrics.inc("llm_route_calls", route=route, model=model)
+    metrics.observe("llm_route_seconds", seconds, route=route, model=model)
+    metrics.inc("llm_route_cost_usd", cost(model, prompt_tokens, completion_tokens, cached_tokens), route=route, model=model)
+    _update_fallback_rate(route, model)
+
+
+def record_fallback(route: str, model: str) -> None:
+    """Count a call whose output had to be replaced by a fallback."""
+    metrics.inc("llm_route_fallbacks", route=route, model=model)
+    _update_fallback_rate(route, model)
+
+
+def report() -> list:
+    """Per route and model: calls, latency, cost and fallback rate."""
+    rows = []
+    for entry in metrics.snapshot().get("llm_route_calls", []):
+        labels = entry["labels"]
+        seconds = metrics.get_histogram("llm_route_seconds", **labels)
+        calls = entry["value"]
+        rows.append({
+            **labels,
+            "calls": calls,
+            "p50_seconds": seconds.quantile(0.50),
+            "p95_seconds": seconds.quantile(0.95),
+            "cost_usd": round(metrics.get_counter("llm_route_cost_usd", **labels), 6),
+            "cost_per_call_usd": round(metrics.get_counter("llm_route_cost_usd", **labels) / calls, 6),
+            "fallback_rate": metrics.get_gauge("llm_route_fallback_rate", **labels),
+        })
+    return sorted(rows, key=lambda row: (row["route"], row["model"]))
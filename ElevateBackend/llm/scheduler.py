@@ -0,0 +1,304 @@
+# llm/scheduler.py
+"""
+Lane-based admission scheduler for LLM work.
+Each feature runs in a named lane (interactive, heavy, batch) with its own
+concurrency limit and queue-wait timeout, so a burst of long generations
+can't starve quick calls. Inside a lane, waiting requests are admitted by
+feature priority (lower runs first) and, within a priority, round-robin
+across users, so one account firing many requests can't monopolise the
+lane: each user has an in-flight cap and a bounded queue. Per-user wait
+stats on /metrics are labelled with a keyed hash of the user id
+(METRICS_USER_KEY), never the raw id.
+
+Lanes and feature assignments can be overridden from the environment:
+    SCHEDULER_LANES='{"heavy": {"concurrency": 20, "queue_timeout": 90}}'
+    SCHEDULER_FEATURES='{"cover_letter": {"lane": "interactive", "priority": 1}}'
+    SCHEDULER_USER_WEIGHTS='{"<user_id>": 3}'
+"""
+
+import os
+import hmac
+import json
+import time
+import heapq
+import hashlib
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from llm import metrics
+from llm.metrics import Histogram
+
+# Configure logging
+logger = logging.getLogger("llm.scheduler")
+
+
+@dataclass(frozen=True)
+class LaneConfig:
+    """Concurrency limit and queue-wait timeout (seconds) of one lane."""
+    concurrency: int
+    queue_timeout: float
+
+
+@dataclass(frozen=True)
+class FeatureConfig:
+    """Lane a feature runs in and its priority there (lower runs first)."""
+    lane: str = "heavy"
+    priority: int = 5
+
+
+# Per-user limits inside each lane
+USER_MAX_INFLIGHT = int(os.getenv("SCHEDULER_USER_MAX_INFLIGHT", "2"))
+USER_MAX_QUEUED = int(os.getenv("SCHEDULER_USER_MAX_QUEUED", "10"))
+# Number of users whose wait-time stats are kept for /metrics
+USER_STATS_LIMIT = 1000
+# Key for the pseudonymous user labels on /metrics; random per process unless set
+METRICS_USER_KEY = (os.getenv("METRICS_USER_KEY") or os.urandom(16).hex()).encode()
+
+DEFAULT_LANES = {
+    "interactive": LaneConfig(concurrency=20, queue_timeout=15.0),
+    "heavy": LaneConfig(concurrency=10, queue_timeout=60.0),
+    "batch": LaneConfig(concurrency=4, queue_timeout=600.0),
+}
+
+DEFAULT_FEATURES = {
+    "interview_analysis": FeatureConfig(lane="interactive", priority=0),
+    "interview_feedback": FeatureConfig(lane="interactive", priority=0),
+    "resume_optimization": FeatureConfig(lane="heavy", priority=2),
+    "cover_letter": FeatureConfig(lane="heavy", priority=2),
+    "project_evaluation": FeatureConfig(lane="heavy", priority=3),
+    "skill_benchmark": FeatureConfig(lane="heavy", priority=3),
+    "role_transition": FeatureConfig(lane="heavy", priority=4),
+    "learning_pathways": FeatureConfig(lane="heavy", priority=5),
+}
+
+
+def user_label(user_id: str) -> str:
+    """Pseudonymous label for a user id, so raw ids never reach /metrics."""
+    return hmac.new(METRICS_USER_KEY, user_id.encode(), hashlib.sha256).hexdigest()[:12]
+
+
+class QueueTimeout(Exception):
+    """Raised when a request waits longer than its lane's queue timeout."""
+
+    def __init__(self, lane: str, timeout: float):
+        super().__init__(f"Timed out after {timeout:.0f}s waiting for a slot in the {lane} lane")
+        self.lane = lane
+        self.retry_after = max(1, int(timeout / 4))
+
+
+class UserQueueFull(Exception):
+    """Raised when a user already has too many requests queued in a lane."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"Too many queued requests in the {lane} lane, retry later")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+def _load(env_name: str, defaults: dict, config_cls) -> dict:
+    configs = dict(defaults)
+    raw = os.getenv(env_name)
+    if raw:
+        try:
+            for name, values in json.loads(raw).items():
+                configs[name] = config_cls(**values) if config_cls else values
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid {env_name}: {e}")
+    return configs
+
+
+class Lane:
+    """
+    Counting semaphore with fair admission: waiters are grouped per user,
+    the best waiting priority goes first, and users at that priority take
+    turns (a user with weight N gets N turns in a row).
+    """
+
+    def __init__(self, name: str, config: LaneConfig, user_max_inflight: int = USER_MAX_INFLIGHT,
+                 user_max_queued: int = USER_MAX_QUEUED, weights: Optional[dict] = None):
+        self.name = name
+        self.config = config
+        self.user_max_inflight = user_max_inflight
+        self.user_max_queued = user_max_queued
+        self.weights = weights or {}
+        self.active = 0
+        self.inflight: dict = {}
+        self._queues: dict = {}
+        self._rotation: deque = deque()
+        self._credit: dict = {}
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _publish(self) -> None:
+        metrics.set_gauge("scheduler_active", self.active, lane=self.name)
+        metrics.set_gauge("scheduler_queue_depth", self.queued, lane=self.name)
+        metrics.set_gauge("scheduler_users_waiting", len(self._queues), lane=self.name)
+
+    def _below_cap(self, user_id: str) -> bool:
+        return self.inflight.get(user_id, 0) < self.user_max_inflight
+
+    def _fits(self, weight: int) -> bool:
+        return self.active + weight <= self.config.concurrency
+
+    def _grant(self, user_id: str, weight: int) -> None:
+        self.active += weight
+        self.inflight[user_id] = self.inflight.get(user_id, 0) + 1
+
+    async def acquire(self, user_id: str, priority: int, weight: int = 1) -> None:
+        """
+        Wait for a slot worth `weight` units of lane concurrency. A weighted
+        slot is still one request against the user's in-flight cap.
+        """
+        waiting = any(self._below_cap(u) for u in self._rotation)
+        if self._fits(weight) and self._below_cap(user_id) and not waiting:
+            self._grant(user_id, weight)
+            self._publish()
+            return
+
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.user_max_queued:
+            metrics.inc("scheduler_rejections", lane=self.name)
+            raise UserQueueFull(self.name, max(1, int(self.config.queue_timeout / 4)))
+        if queue is None:
+            queue = self._queues[user_id] = []
+            self._rotation.append(user_id)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue, (priority, next(self._seq), future, weight))
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.config.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release(user_id, weight)
+            else:
+                future.cancel()
+                self._drop_cancelled(user_id)
+            self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.inc("scheduler_timeouts", lane=self.name)
+                raise QueueTimeout(self.name, self.config.queue_timeout)
+            raise
+
+    def release(self, user_id: str, weight: int = 1) -> None:
+        self.active -= weight
+        self.inflight[user_id] -= 1
+        if not self.inflight[user_id]:
+            del self.inflight[user_id]
+        self._dispatch()
+        self._publish()
+
+    def _dispatch(self) -> None:
+        # Hand free slots to waiters, one user's turn at a time
+        while self.active < self.config.concurrency:
+            user_id = self._next_user()
+            if user_id is None:
+                return
+            queue = self._queues[user_id]
+            _, _, future, weight = heapq.heappop(queue)
+            if not queue:
+                self._forget(user_id)
+            self._grant(user_id, weight)
+            future.set_result(None)
+
+    def _next_user(self) -> Optional[str]:
+        # A weighted waiter is skipped until enough of the lane is free for it
+        eligible = [u for u in self._rotation if self._below_cap(u) and self._fits(self._queues[u][0][3])]
+        if not eligible:
+            return None
+        best = min(self._queues[u][0][0] for u in eligible)
+        user_id = next(u for u in eligible if self._queues[u][0][0] == best)
+        credit = self._credit.get(user_id, self.weights.get(user_id, 1)) - 1
+        if credit > 0:
+            self._credit[user_id] = credit
+        else:
+            # Turn used up: move to the back of the rotation
+            self._credit.pop(user_id, None)
+            self._rotation.remove(user_id)
+            self._rotation.append(user_id)
+        return user_id
+
+    def _forget(self, user_id: str) -> None:
+        self._queues.pop(user_id, None)
+        self._credit.pop(user_id, None)
+        if user_id in self._rotation:
+            self._rotation.remove(user_id)
+
+    def _drop_cancelled(self, user_id: str) -> None:
+        queue = [w for w in self._queues.get(user_id, []) if not w[2].done()]
+        if queue:
+            heapq.heapify(queue)
+            self._queues[user_id] = queue
+        else:
+            self._forget(user_id)
+        # Our departure may unblock a waiter that was queued behind us
+        self._dispatch()
+
+
+class Scheduler:
+    """Routes each feature to its lane and records how long requests queue."""
+
+    def __init__(self, lanes: Optional[dict] = None, features: Optional[dict] = None,
+                 user_max_inflight: int = USER_MAX_INFLIGHT, user_max_queued: int = USER_MAX_QUEUED,
+                 weights: Optional[dict] = None):
+        lane_configs = lanes if lanes is not None else _load("SCHEDULER_LANES", DEFAULT_LANES, LaneConfig)
+        self.features = features if features is not None else _load(
+            "SCHEDULER_FEATURES", DEFAULT_FEATURES, FeatureConfig
+        )
+        weights = weights if weights is not None else _load("SCHEDULER_USER_WEIGHTS", {}, None)
+        self.lanes = {
+            name: Lane(name, config, user_max_inflight, user_max_queued, weights)
+            for name, config in lane_configs.items()
+        }
+        self._user_waits: "OrderedDict[str, Histogram]" = OrderedDict()
+
+    def lane_for(self, feature: str) -> Lane:
+        config = self.features.get(feature, FeatureConfig())
+        return self.lanes[config.lane]
+
+    @asynccontextmanager
+    async def slot(self, feature: str, user_id: str = "anonymous", weight: int = 1):
+        """
+        Hold one slot in the feature's lane for the duration of the block.
+        `weight` is how many concurrent LLM calls the block makes (at most the
+        lane's concurrency); the lane counts all of them, the user's cap one.
+        """
+        config = self.features.get(feature, FeatureConfig())
+        lane = self.lanes[config.lane]
+        weight = max(1, min(weight, lane.config.concurrency))
+        start = time.perf_counter()
+        await lane.acquire(user_id, config.priority, weight)
+        wait = time.perf_counter() - start
+        metrics.observe("scheduler_wait_seconds", wait, lane=lane.name, feature=feature)
+        self._record_user_wait(user_id, wait)
+        if wait > 1:
+            logger.info(f"[{user_id}] Waited {wait:.2f}s for a {lane.name} slot ({feature})")
+        try:
+            yield
+        finally:
+            lane.release(user_id, weight)
+
+    def _record_user_wait(self, user_id: str, wait: float) -> None:
+        histogram = self._user_waits.pop(user_id, None) or Histogram(window=256)
+        histogram.observe(wait)
+        self._user_waits[user_id] = histogram
+        while len(self._user_waits) > USER_STATS_LIMIT:
+            self._user_waits.popitem(last=False)
+
+    def user_wait_snapshot(self) -> list:
+        """Per-user queue wait summaries for the most recently active users, labelled by user_label()."""
+        return [{"labels": {"user": user_label(user_id)}, **histogram.summary()}
+                for user_id, histogram in self._user_waits.items()]
+
+
+# Global instance
+scheduler = Scheduler()
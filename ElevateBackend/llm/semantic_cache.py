@@ -0,0 +1,268 @@
+# llm/semantic_cache.py
+"""
+Embedding-backed nearest-neighbour cache for paraphrased prompts.
+Texts are embedded with a pluggable embedding function (a local hashing
+embedder by default, so it works offline) and indexed in an HNSW index
+from chroma-hnswlib when available, or an exact numpy scan otherwise.
+A lookup whose cosine similarity clears the threshold returns the stored
+value; misses are added by the caller once a fresh result exists. Entries
+expire after `ttl` seconds, and the oldest is evicted at capacity.
+
+Threshold tuning:
+    python -m llm.semantic_cache eval llm/data/semantic_pairs.jsonl
+prints precision/recall for a labelled set of question pairs.
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import zlib
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llm import metrics
+
+# chroma-hnswlib provides the `hnswlib` module; fall back to an exact scan without it
+try:
+    import hnswlib  # type: ignore[import-untyped]
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+# Configure logging
+logger = logging.getLogger("llm.semantic_cache")
+
+# Lowest threshold the eval below reports at precision >= 0.95 on semantic_pairs.jsonl
+DEFAULT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.84"))
+# Thresholds the eval command reports on
+EVAL_THRESHOLDS = [t / 100 for t in range(50, 100, 2)]
+DEFAULT_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "5000"))
+# Matches the interview_analysis response cache policy
+DEFAULT_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600)))
+EMBEDDING_DIM = 512
+
+# Words that carry no meaning for matching interview questions
+STOPWORDS = frozenset("""
+a an the of in on to for and or with without is are be by as at from that this
+it its given write implement function program code how do does can you your
+find return using use into all each any
+""".split())
+
+EmbeddingFunction = Callable[[Sequence[str]], np.ndarray]
+
+
+class HashingEmbedder:
+    """
+    Offline TF embedder using the hashing trick.
+    Word unigrams, word bigrams and character trigrams are hashed into a
+    fixed-size signed vector, log-scaled and L2-normalised.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        tokens = []
+        for word in words:
+            if word in STOPWORDS:
+                continue
+            # Crude plural folding: "lists" -> "list"
+            if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+                word = word[:-1]
+            tokens.append(word)
+        return tokens
+
+    def _features(self, text: str):
+        tokens = self._tokens(text)
+        for token in tokens:
+            yield "w:" + token, 1.0
+        for first, second in zip(tokens, tokens[1:]):
+            yield "b:" + first + "_" + second, 0.7
+        joined = " " + " ".join(tokens) + " "
+        for i in range(len(joined) - 2):
+            yield "c:" + joined[i:i + 3], 0.2
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * weight
+            # Sublinear term frequency, then unit length for cosine similarity
+            vectors[row] = np.sign(vectors[row]) * np.log1p(np.abs(vectors[row]))
+            norm = np.linalg.norm(vectors[row])
+            if norm > 0:
+                vectors[row] /= norm
+        return vectors
+
+
+class SemanticCache:
+    """Nearest-neighbour cache with a similarity threshold, a TTL and bounded capacity."""
+
+    def __init__(
+        self,
+        name: str,
+        embed: Optional[EmbeddingFunction] = None,
+        threshold: float = DEFAULT_THRESHOLD,
+        capacity: int = DEFAULT_CAPACITY,
+        use_hnsw: bool = HAS_HNSWLIB,
+        ttl: float = DEFAULT_TTL,
+    ):
+        self.name = name
+        self.embed = embed or HashingEmbedder()
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self.use_hnsw = use_hnsw
+        self._values: dict = {}
+        self._order: deque = deque()
+        self._next_id = 0
+        # hnswlib.Index once the first entry fixes the dimension
+        self._index: Any = None
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[int] = []
+
+    def _init_hnsw(self, dim: int) -> None:
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        self._index.init_index(max_elements=self.capacity, ef_construction=200, M=16,
+                               allow_replace_deleted=True)
+        self._index.set_ef(64)
+
+    def _nearest(self, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        if not self._values:
+            return None, 0.0
+        if self.use_hnsw:
+            try:
+                labels, distances = self._index.knn_query(vector.reshape(1, -1), k=1)
+            except RuntimeError as e:
+                logger.warning(f"[{self.name}] HNSW query failed: {e}")
+                return None, 0.0
+            return int(labels[0][0]), 1.0 - float(distances[0][0])
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        return self._ids[best], float(similarities[best])
+
+    def lookup(self, text: str):
+        """Return a copy of the cached value for the nearest neighbour, or None."""
+        self._expire()
+        vector = self.embed([text])[0]
+        item_id, similarity = self._nearest(vector)
+        metrics.observe("semantic_cache_similarity", similarity, cache=self.name)
+        if item_id is None or similarity < self.threshold:
+            metrics.inc("semantic_cache_lookups", cache=self.name, result="miss")
+            return None
+        metrics.inc("semantic_cache_lookups", cache=self.name, result="hit")
+        logger.info(f"[{self.name}] Semantic cache hit (similarity={similarity:.3f})")
+        # Every caller gets its own copy so later mutation can't leak between users
+        return copy.deepcopy(self._values[item_id][1])
+
+    def add(self, text: str, value) -> None:
+        """Index a fresh result, evicting the oldest entry when full."""
+        self._expire()
+        vector = self.embed([text])[0]
+        if len(self._order) >= self.capacity:
+            self._evict_oldest()
+
+        item_id = self._next_id
+        self._next_id += 1
+        self._values[item_id] = (text, copy.deepcopy(value), time.monotonic() + self.ttl)
+        self._order.append(item_id)
+
+        if self.use_hnsw:
+            if self._index is None:
+                self._init_hnsw(len(vector))
+            self._index.add_items(vector.reshape(1, -1), [item_id], replace_deleted=True)
+        else:
+            row = vector.reshape(1, -1)
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+            self._ids.append(item_id)
+        metrics.set_gauge("semantic_cache_entries", len(self._values), cache=self.name)
+
+    def _expire(self) -> None:
+        # Every entry gets the same TTL, so the expired ones are the oldest
+        now = time.monotonic()
+        while self._order and self._values[self._order[0]][2] <= now:
+            self._evict_oldest()
+        metrics.set_gauge("semantic_cache_entries", len(self._values), cache=self.name)
+
+    def _evict_oldest(self) -> None:
+        oldest = self._order.popleft()
+        self._values.pop(oldest, None)
+        if self.use_hnsw:
+            self._index.mark_deleted(oldest)
+        elif self._matrix is not None:
+            position = self._ids.index(oldest)
+            self._ids.pop(position)
+            self._matrix = np.delete(self._matrix, position, axis=0)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+def evaluate_thresholds(
+    pairs: Sequence[Tuple[str, str, bool]],
+    thresholds: Sequence[float],
+    embed: Optional[EmbeddingFunction] = None,
+) -> List[dict]:
+    """
+    Score labelled (text_a, text_b, is_same_question) pairs and report
+    precision/recall/F1 of "similarity >= threshold" at each threshold.
+    """
+    embed = embed or HashingEmbedder()
+    left = embed([a for a, _, _ in pairs])
+    right = embed([b for _, b, _ in pairs])
+    similarities = np.sum(left * right, axis=1)
+    labels = np.array([same for _, _, same in pairs], dtype=bool)
+
+    report = []
+    for threshold in thresholds:
+        predicted = similarities >= threshold
+        tp = int(np.sum(predicted & labels))
+        fp = int(np.sum(predicted & ~labels))
+        fn = int(np.sum(~predicted & labels))
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        report.append({
+            "threshold": round(float(threshold), 3),
+            "precision": round(precision, 3),
+            "recall": round(recall, 3),
+            "f1": round(f1, 3),
+        })
+    return report
+
+
+def recommend_threshold(report: List[dict], min_precision: float = 0.95) -> Optional[float]:
+    """Lowest threshold (highest recall) that still meets the precision target."""
+    eligible = [row for row in report if row["precision"] >= min_precision and row["recall"] > 0]
+    return min(row["threshold"] for row in eligible) if eligible else None
+
+
+def _load_pairs(path: str) -> List[Tuple[str, str, bool]]:
+    pairs = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                pairs.append((row["a"], row["b"], bool(row["same"])))
+    return pairs
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "eval":
+        print("usage: python -m llm.semantic_cache eval <pairs.jsonl>")
+        sys.exit(1)
+    report = evaluate_thresholds(_load_pairs(sys.argv[2]), EVAL_THRESHOLDS)
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>6} {'f1':>6}")
+    for row in report:
+        print(f"{row['threshold']:>9.2f} {row['precision']:>9.3f} {row['recall']:>6.3f} {row['f1']:>6.3f}")
+    print(f"recommended threshold (precision >= 0.95): {recommend_threshold(report)}")
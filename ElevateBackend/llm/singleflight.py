@@ -0,0 +1,79 @@
+# llm/singleflight.py
+"""
+Single-flight de-duplication of identical in-flight LLM calls.
+The first caller for a key starts the upstream call; callers arriving with
+the same key while it is running await that same call instead of sending
+their own. The call runs as its own task, so one caller disconnecting
+doesn't cancel it for the others; it is only cancelled once every caller
+has gone.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.singleflight")
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], feature: str = "") -> Tuple[T, bool]:
+        """
+        Run `fn` once for all concurrent callers with the same key.
+
+        Returns:
+            tuple: The result and whether it was shared from another caller's call
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._finish(key, call))
+        else:
+            logger.info(f"[{feature}] Joined an identical in-flight call")
+
+        metrics.inc("llm_singleflight_requests", feature=feature)
+        if shared:
+            metrics.inc("llm_singleflight_coalesced", feature=feature)
+        requests = metrics.get_counter("llm_singleflight_requests", feature=feature)
+        coalesced = metrics.get_counter("llm_singleflight_coalesced", feature=feature)
+        metrics.set_gauge("llm_coalescing_ratio", coalesced / requests, feature=feature)
+
+        call.waiters += 1
+        try:
+            # Shielded so a cancelled caller only stops waiting
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _finish(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark a failure as seen when every caller has already gone
+        if not call.task.cancelled():
+            call.task.exception()
+
+
+# Global instance shared by every call through llm.client
+singleflight = SingleFlight()
@@ -0,0 +1,90 @@
+# llm/structured.py
+"""
+Schema-constrained structured outputs.
+Each feature declares its output as a Pydantic model (features/schemas.py).
+`response_format()` turns the model into a strict json_schema
+response_format, so the provider's constrained decoding can only produce
+JSON matching it, and `parse()` validates the reply against the same model.
+Validation failures and fallback responses are counted per feature, so the
+parse-failure and fallback rates are visible on /metrics.
+"""
+
+import logging
+from typing import Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from llm import metrics, routing
+
+# Configure logging
+logger = logging.getLogger("llm.structured")
+
+
+def _strict(node: dict) -> dict:
+    # Strict mode wants every property required and no extra keys, on every object
+    node.pop("title", None)
+    node.pop("default", None)
+    if "properties" in node:
+        node["additionalProperties"] = False
+        node["required"] = list(node["properties"])
+        for child in node["properties"].values():
+            _strict(child)
+    for child in node.get("$defs", {}).values():
+        _strict(child)
+    if isinstance(node.get("items"), dict):
+        _strict(node["items"])
+    for child in node.get("anyOf", []):
+        _strict(child)
+    return node
+
+
+def strict_schema(model: Type[BaseModel]) -> dict:
+    """JSON schema of `model` in the subset accepted by strict structured outputs."""
+    return _strict(model.model_json_schema())
+
+
+def response_format(model: Type[BaseModel]) -> dict:
+    """Strict json_schema response_format for a Pydantic output model."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "strict": True, "schema": strict_schema(model)},
+    }
+
+
+def _update_rates(feature: str) -> None:
+    valid = metrics.get_counter("llm_structured_outputs", feature=feature, outcome="valid")
+    invalid = metrics.get_counter("llm_structured_outputs", feature=feature, outcome="invalid")
+    total = valid + invalid
+    if total:
+        metrics.set_gauge("llm_parse_failure_rate", invalid / total, feature=feature)
+        metrics.set_gauge("llm_fallback_rate", metrics.get_counter("llm_fallbacks", feature=feature) / total, feature=feature)
+
+
+def parse(feature: str, model: Type[BaseModel], raw: str) -> Optional[dict]:
+    """
+    Validate a raw model reply against `model`.
+    Returns the validated output as a dict, or None if it doesn't match
+    (the caller then falls back to its lenient path).
+    """
+    try:
+        result = model.model_validate_json(raw).model_dump()
+        outcome = "valid"
+    except ValidationError as e:
+        logger.warning(f"[{feature}] Output failed {model.__name__} validation ({e.error_count()} errors): {str(e)[:300]}")
+        result = None
+        outcome = "invalid"
+    metrics.inc("llm_structured_outputs", feature=feature, outcome=outcome)
+    _update_rates(feature)
+    return result
+
+
+def record_fallback(feature: str, model: Optional[str] = None) -> None:
+    """
+    Count a response the user got from a fallback instead of the model's output.
+    Passing the model that produced the output also counts it against that
+    model's route, so A/B arms can be compared.
+    """
+    metrics.inc("llm_fallbacks", feature=feature)
+    _update_rates(feature)
+    if model:
+        routing.record_fallback(feature, model)
@@ -0,0 +1,223 @@
+# llm/tokens.py
+"""
+Token accounting for prompts.
+Counts tokens with tiktoken (falling back to a ~4 characters per token
+estimate when the encoding can't be loaded, e.g. offline), applies
+per-feature budgets to user-supplied text before it reaches a prompt, and
+meters upstream calls through a tokens-per-minute bucket so admission is
+weighted by estimated tokens rather than by request count.
+
+Budgets can be overridden from the environment:
+    LLM_TOKEN_BUDGETS='{"resume_optimization": {"max_input_tokens": 8000}}'
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, overload
+
+from llm import metrics
+
+# Configure logging
+logger = logging.getLogger("llm.tokens")
+
+TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "300000"))
+# Characters per token used when tiktoken has no encoding available
+CHARS_PER_TOKEN = 4
+# Chat formatting overhead per message (role, separators)
+TOKENS_PER_MESSAGE = 4
+TRUNCATION_MARKER = "\n[... truncated ...]\n"
+
+
+@dataclass(frozen=True)
+class TokenBudget:
+    """
+    Per-feature token limits.
+    max_input_tokens caps each user-supplied field; over it the field is
+    truncated (on_overflow="truncate") or the request refused ("reject").
+    max_prompt_tokens caps the whole prompt and is always enforced by rejection.
+    expected_completion_tokens is the admission estimate when max_tokens isn't set.
+    """
+    max_input_tokens: int = 6000
+    max_prompt_tokens: int = 16000
+    expected_completion_tokens: int = 2000
+    on_overflow: str = "truncate"
+
+
+DEFAULT_BUDGETS = {
+    "resume_optimization": TokenBudget(max_input_tokens=6000, max_prompt_tokens=24000, expected_completion_tokens=3000),
+    "skill_benchmark": TokenBudget(max_input_tokens=6000, max_prompt_tokens=20000, expected_completion_tokens=3000),
+    "role_transition": TokenBudget(max_input_tokens=6000, max_prompt_tokens=16000, expected_completion_tokens=3000),
+    "project_evaluation": TokenBudget(max_input_tokens=3000, max_prompt_tokens=12000, expected_completion_tokens=3000),
+    "cover_letter": TokenBudget(max_input_tokens=6000, max_prompt_tokens=20000, expected_completion_tokens=2500),
+    "cover_letter.extract_projects": TokenBudget(max_input_tokens=6000, max_prompt_tokens=10000, expected_completion_tokens=800),
+    "cover_letter.paragraph": TokenBudget(max_input_tokens=200, max_prompt_tokens=6000, expected_completion_tokens=250,
+                                          on_overflow="reject"),
+    "learning_pathways": TokenBudget(max_input_tokens=100, max_prompt_tokens=8000, expected_completion_tokens=4000,
+                                     on_overflow="reject"),
+    "interview_analysis": TokenBudget(max_input_tokens=1500, max_prompt_tokens=4000, expected_completion_tokens=1500),
+    "interview_feedback": TokenBudget(max_input_tokens=3000, max_prompt_tokens=8000, expected_completion_tokens=1500),
+}
+
+
+class PromptTooLarge(ValueError):
+    """Raised when input or prompt exceeds its feature's token budget."""
+
+
+def _load_budgets() -> dict:
+    budgets = dict(DEFAULT_BUDGETS)
+    raw = os.getenv("LLM_TOKEN_BUDGETS")
+    if raw:
+        try:
+            for feature, config in json.loads(raw).items():
+                budgets[feature] = TokenBudget(**config)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid LLM_TOKEN_BUDGETS: {e}")
+    return budgets
+
+
+TOKEN_BUDGETS = _load_budgets()
+
+
+def get_budget(feature: str) -> TokenBudget:
+    return TOKEN_BUDGETS.get(feature, TokenBudget())
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads encodings on first use; without network we estimate
+        logger.warning(f"tiktoken encoding unavailable for {model}, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Number of tokens in `text` for `model`."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_messages(messages: list, model: str = "gpt-4o") -> int:
+    """Prompt tokens of a chat message list, including per-message overhead."""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(str(m.get("content") or ""), model) for m in messages) + 3
+
+
+def truncate_tokens(text: str, limit: int, model: str = "gpt-4o") -> str:
+    """
+    Deterministically shorten `text` to about `limit` tokens, keeping the
+    first three quarters and the last quarter of the budget (résumés and job
+    descriptions carry most signal at the start, contact/summary at the end).
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        head = limit * CHARS_PER_TOKEN * 3 // 4
+        tail = limit * CHARS_PER_TOKEN - head
+        return text[:head] + TRUNCATION_MARKER + text[-tail:]
+    tokens = encoding.encode(text, disallowed_special=())
+    head = limit * 3 // 4
+    tail = limit - head
+    return encoding.decode(tokens[:head]) + TRUNCATION_MARKER + encoding.decode(tokens[-tail:])
+
+
+@overload
+def fit_input(feature: str, text: str, field: str = ..., model: str = ...) -> str: ...
+@overload
+def fit_input(feature: str, text: None, field: str = ..., model: str = ...) -> None: ...
+@overload
+def fit_input(feature: str, text: Optional[str], field: str = ..., model: str = ...) -> Optional[str]: ...
+
+
+def fit_input(feature: str, text: Optional[str], field: str = "input", model: str = "gpt-4o") -> Optional[str]:
+    """Apply the feature's input budget to one user-supplied field."""
+    if not text:
+        return text
+    budget = get_budget(feature)
+    tokens = count_tokens(text, model)
+    metrics.observe("llm_input_tokens", tokens, feature=feature, field=field)
+    if tokens <= budget.max_input_tokens:
+        return text
+    if budget.on_overflow == "reject":
+        metrics.inc("llm_input_rejections", feature=feature, field=field)
+        raise PromptTooLarge(
+            f"{field} is too long ({tokens} tokens, limit {budget.max_input_tokens})"
+        )
+    metrics.inc("llm_input_truncations", feature=feature, field=field)
+    logger.info(f"[{feature}] Truncating {field} from {tokens} to {budget.max_input_tokens} tokens")
+    return truncate_tokens(text, budget.max_input_tokens, model)
+
+
+def check_prompt(feature: str, messages: list, model: str) -> int:
+    """Count the prompt and refuse it before dispatch if it exceeds the feature's budget."""
+    tokens = count_messages(messages, model)
+    budget = get_budget(feature)
+    if tokens > budget.max_prompt_tokens:
+        metrics.inc("llm_prompt_rejections", feature=feature)
+        raise PromptTooLarge(
+            f"Prompt for {feature} is too long ({tokens} tokens, limit {budget.max_prompt_tokens})"
+        )
+    return tokens
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute bucket. Each call reserves its estimated tokens before
+    dispatch and settles against actual usage afterwards; callers wait in
+    arrival order while the bucket refills.
+    """
+
+    def __init__(self, tokens_per_minute: int = TOKENS_PER_MINUTE):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float, feature: str = "") -> None:
+        if self.capacity <= 0:
+            return
+        # One request never needs more than a full bucket
+        tokens = min(float(tokens), self.capacity)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self.available < tokens:
+                await asyncio.sleep(min(1.0, (tokens - self.available) / self.rate))
+                self._refill()
+            self.available -= tokens
+        metrics.observe("llm_token_wait_seconds", time.monotonic() - start, feature=feature)
+        metrics.set_gauge("llm_token_bucket_available", self.available)
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Return unused reservation (or charge overuse) once actual usage is known."""
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.available = min(self.capacity, self.available + min(reserved, self.capacity) - used)
+        metrics.set_gauge("llm_token_bucket_available", self.available)
+
+
+# Global instance shared by every call through llm.client
+token_bucket = TokenBucket()
@@ -4,11 +4,13 @@ import uuid
 import asyncio
 import logging
 from datetime import datetime, UTC
+from dataclasses import replace
 import json
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, Header, HTTPException, status, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 from dotenv import load_dotenv
 
@@ -36,7 +38,7 @@ if missing_vars:
     # Set placeholder values for development
     if "OPENAI_API_KEY" in missing_vars:
         os.environ["OPENAI_API_KEY"] = "sk-dummy-key-for-development"
-        print("✓ Set placeholder OPENAI_API_KEY (resume optimization will not work)")
+        print("✓ Set placeholder OPENAI_API_KEY (set LLM_BACKEND=fake or replay to run features offline)")
     if "MONGODB_URI" in missing_vars:
         os.environ["MONGODB_URI"] = "mongodb://localhost:27017/elevate"
         print("✓ Set placeholder MONGODB_URI (database operations will not work)")
@@ -49,7 +51,7 @@ from features.interview_preparation import InterviewPreparation
 from features.role_transition import RoleTransition 
 from features.skill_benchmark import SkillBenchmark
 from features.resume_extraction import ResumeExtractor
-from features.cover_letter_generator import cover_letter_generator
+from features.cover_letter_generator import MAX_VARIANTS, check_paragraph_index, cover_letter_generator
 from features.saved_learning_pathways import SavedLearningPathways
 from database import (
     fetch_learning_pathway_results,
@@ -63,10 +65,19 @@ from database import (
     store_skill_benchmark,
     store_cover_letter,
     fetch_saved_cover_letters,
+    update_cover_letter_content,
     delete_cover_letter,
     users_collection 
 )
 from auth import verify_google_token  
+from llm.client import PASSTHROUGH_ERRORS, close_client
+from llm.providers import providers
+from jobs import job_manager, JobQueueFull, UserJobsFull
+from llm import deadline, metrics, routing
+from llm.scheduler import scheduler, QueueTimeout, UserQueueFull
+from llm.tokens import PromptTooLarge, fit_input
+from llm.retry import CircuitOpenError
+from llm.prompts import versions as prompt_versions
 
 # -------------------------
 # Logging Configuration
@@ -80,7 +91,15 @@ logger = logging.getLogger("main")
 # -------------------------
 # FastAPI App
 # -------------------------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_manager.start()
+    yield
+    # Stop job workers, then release the shared LLM connection pool
+    await job_manager.stop()
+    await close_client()
+
+app = FastAPI(lifespan=lifespan)
 # Adding CORS middleware to allow all origins, credentials, methods and headers
 app.add_middleware(
     CORSMiddleware,
@@ -90,6 +109,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# run() closures mark their entry failed, then re-raise these as they are:
+# cancellations (deadline, disconnect) and errors with their own handler below
+UNWRAPPED_ERRORS = (asyncio.CancelledError, QueueTimeout, UserQueueFull, *PASSTHROUGH_ERRORS)
+
 # Override the default JSONResponse class to use our custom encoder
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -99,6 +122,48 @@ async def http_exception_handler(request, exc):
         headers=exc.headers,
     )
 
+# Requests that waited too long for a scheduler slot are told to back off and retry
+@app.exception_handler(QueueTimeout)
+async def queue_timeout_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# A user with too many requests already queued is rate limited
+@app.exception_handler(UserQueueFull)
+async def user_queue_full_handler(request, exc):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Inputs over their feature's token budget are refused before any LLM call
+@app.exception_handler(PromptTooLarge)
+async def prompt_too_large_handler(request, exc):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+# Requests that ran out of their end-to-end time budget
+@app.exception_handler(deadline.DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+# Nobody is listening any more; 499 (client closed request) only shows up in logs
+@app.exception_handler(deadline.ClientDisconnected)
+async def client_disconnected_handler(request, exc):
+    return JSONResponse(status_code=499, content={"detail": str(exc)})
+
+# While the LLM provider is degraded, calls fail fast and clients are told when to retry
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+    )
+
 # Custom JSONResponse middleware to handle datetime objects
 @app.middleware("http")
 async def custom_json_middleware(request: Request, call_next):
@@ -128,6 +193,17 @@ async def custom_json_middleware(request: Request, call_next):
 def read_root():
     return {"message": "Hello, World!"}
 
+# Metrics endpoint exposing LLM layer counters, gauges and histograms
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        **metrics.snapshot(),
+        "scheduler_user_wait_seconds": scheduler.user_wait_snapshot(),
+        "prompt_versions": prompt_versions(),
+        "model_routes": routing.report(),
+        "providers": providers.snapshot(),
+    }
+
 # -------------------------
 # Feature Instances
 # -------------------------
@@ -140,9 +216,101 @@ skill_benchmark_instance = SkillBenchmark()
 resume_extractor = ResumeExtractor()
 saved_pathways_instance = SavedLearningPathways()
 
-# Setting the maximum number of concurrent tasks
-MAX_CONCURRENT_TASKS = 5
-semaphore = asyncio.Semaphore(MAX_CONCURRENT_TASKS)
+# LLM concurrency is governed per feature by the lane scheduler (llm/scheduler.py)
+
+# Headers for Server-Sent Event responses; X-Accel-Buffering stops nginx from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DateTimeEncoder)}\n\n"
+
+
+def wants_job(request: Request) -> bool:
+    """True when the client asked for job mode (?mode=async or Prefer: respond-async)."""
+    return (
+        request.query_params.get("mode") == "async"
+        or "respond-async" in request.headers.get("prefer", "")
+    )
+
+
+async def submit_job(user_id: str, feature: str, run) -> JSONResponse:
+    """Queue `run` on the job workers and answer 202 with where to find the result."""
+    try:
+        job = await job_manager.submit(user_id, feature, run)
+    except JobQueueFull as e:
+        logger.warning(f"[{user_id}] {feature} job rejected: {e}")
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly",
+                            headers={"Retry-After": "30"})
+    except UserJobsFull as e:
+        logger.warning(f"[{user_id}] {feature} job rejected: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
+        },
+        headers={"Location": f"/jobs/{job.id}"},
+    )
+
+
+# ----------------
+# Job Endpoints
+# ----------------
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, authorization: str = Header(None)):
+    """Poll a job submitted in job mode."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authentication token.")
+    token = authorization.split("Bearer ")[-1]
+    try:
+        user_info = verify_google_token(token)
+        user_id = user_info["sub"]
+    except Exception:
+        logger.warning("Invalid auth token on jobs")
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+
+    job = job_manager.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.public()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, authorization: str = Header(None)):
+    """SSE subscription that emits the job status now and the outcome when it finishes."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authentication token.")
+    token = authorization.split("Bearer ")[-1]
+    try:
+        user_info = verify_google_token(token)
+        user_id = user_info["sub"]
+    except Exception:
+        logger.warning("Invalid auth token on jobs/events")
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+
+    job = job_manager.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        yield _sse("status", {"job_id": job.id, "status": job.status})
+        # Comment frames keep idle proxies from closing the connection while we wait
+        while not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+        if job.status == "completed":
+            yield _sse("result", job.public())
+        else:
+            yield _sse("error", job.public())
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 # ----------------
@@ -252,41 +420,105 @@ async def evaluate_project(request: Request, authorization: str = Header(None)):
         "updatedAt": timestamp
     })
 
-    # Use semaphore to limit concurrent tasks
-    async with semaphore:
+    # Wait for a slot in the feature's scheduler lane
+    async def run():
         try:
-            logger.info(f"[{user_id}] Starting project evaluation (id={evaluation_id})")
-
-            # Run the project evaluator in a separate thread
-            evaluation: dict = await asyncio.get_event_loop().run_in_executor(
-                None,
-                project_evaluator.evaluate,
-                user_id,
-                project_description,
-                persona
-            )
+            async with scheduler.slot("project_evaluation", user_id):
+                logger.info(f"[{user_id}] Starting project evaluation (id={evaluation_id})")
 
-            logger.info(f"[{user_id}] Completed project evaluation (id={evaluation_id}) — score={evaluation.get('overall_score')}")
+                # Run the project evaluator on the shared async LLM client
+                evaluation: dict = await project_evaluator.evaluate(
+                    user_id,
+                    project_description,
+                    persona
+                )
 
-            # Update the evaluation status and result in the database
+                logger.info(f"[{user_id}] Completed project evaluation (id={evaluation_id}) — score={evaluation.get('overall_score')}")
+
+                # Update the evaluation status and result in the database
+                users_collection.update_one(
+                    {"_id": user_id, "features.projectEvaluation.evaluation_id": evaluation_id},
+                    {"$set": {
+                        "features.projectEvaluation.$.status":     "completed",
+                        "features.projectEvaluation.$.evaluation": evaluation,
+                        "features.projectEvaluation.$.updatedAt":  datetime.now(UTC)
+                    }}
+                )
+
+                # Return the evaluation dict
+                return {
+                    "evaluation_id": evaluation_id,
+                    "evaluation": evaluation
+                }
+            
+        except (Exception, asyncio.CancelledError) as e:
+            # Log and handle any exceptions during project evaluation
+            logger.exception(f"[{user_id}] Project evaluation failed (id={evaluation_id})")
             users_collection.update_one(
                 {"_id": user_id, "features.projectEvaluation.evaluation_id": evaluation_id},
                 {"$set": {
-                    "features.projectEvaluation.$.status":     "completed",
-                    "features.projectEvaluation.$.evaluation": evaluation,
-                    "features.projectEvaluation.$.updatedAt":  datetime.now(UTC)
+                    "features.projectEvaluation.$.status":    "failed",
+                    "features.projectEvaluation.$.error":     str(e),
+                    "features.projectEvaluation.$.updatedAt": datetime.now(UTC)
                 }}
             )
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
+            raise HTTPException(status_code=500, detail="Internal error during project evaluation")
 
-            # Return the evaluation dict
-            return {
-                "evaluation_id": evaluation_id,
-                "evaluation": evaluation
-            }
-            
-        except Exception as e:
-            # Log and handle any exceptions during project evaluation
-            logger.exception(f"[{user_id}] Project evaluation failed (id={evaluation_id})")
+    # Job mode: queue the work and answer 202 straight away
+    if wants_job(request):
+        return await submit_job(user_id, "project_evaluation", run)
+    return await deadline.guard("project_evaluation", run, request.is_disconnected)
+
+@app.post("/evaluate_project/stream")
+async def evaluate_project_stream(request: Request, authorization: str = Header(None)):
+    """Streaming variant of /evaluate_project: emits `token` events, then a final `result` event."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authentication token.")
+    token = authorization.split("Bearer ")[-1]
+    try:
+        user_info = verify_google_token(token)
+        user_id = user_info["sub"]
+    except Exception as e:
+        logger.warning(f"[unauthenticated] evaluate_project/stream blocked: {e}")
+        raise HTTPException(status_code=401, detail="Invalid authentication token") from e
+
+    body = await request.json()
+    project_description = body.get("project_description")
+    persona = body.get("persona", "venture_capitalist")
+    if not project_description:
+        raise HTTPException(status_code=400, detail="Project description is required.")
+
+    evaluation_id = str(uuid.uuid4())
+    timestamp = datetime.now(UTC)
+    store_evaluation_result(user_id, {
+        "evaluation_id": evaluation_id,
+        "project_description": project_description,
+        "persona": persona,
+        "status": "processing",
+        "createdAt": timestamp,
+        "updatedAt": timestamp
+    })
+
+    async def event_stream():
+        try:
+            async with scheduler.slot("project_evaluation", user_id):
+                logger.info(f"[{user_id}] Starting streamed project evaluation (id={evaluation_id})")
+                async for event, data in project_evaluator.stream_evaluate(user_id, project_description, persona):
+                    if event == "result":
+                        users_collection.update_one(
+                            {"_id": user_id, "features.projectEvaluation.evaluation_id": evaluation_id},
+                            {"$set": {
+                                "features.projectEvaluation.$.status":     "completed",
+                                "features.projectEvaluation.$.evaluation": data,
+                                "features.projectEvaluation.$.updatedAt":  datetime.now(UTC)
+                            }}
+                        )
+                        data = {"evaluation_id": evaluation_id, "evaluation": data}
+                    yield _sse(event, data)
+        except (Exception, asyncio.CancelledError) as e:
+            logger.exception(f"[{user_id}] Streamed project evaluation failed (id={evaluation_id})")
             users_collection.update_one(
                 {"_id": user_id, "features.projectEvaluation.evaluation_id": evaluation_id},
                 {"$set": {
@@ -295,7 +527,12 @@ async def evaluate_project(request: Request, authorization: str = Header(None)):
                     "features.projectEvaluation.$.updatedAt": datetime.now(UTC)
                 }}
             )
-            raise HTTPException(status_code=500, detail="Internal error during project evaluation")
+            # A client that went away gets no error event
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            yield _sse("error", {"detail": "Internal error during project evaluation"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 # ----------------
 # Resume Optimization Endpoint
@@ -340,39 +577,108 @@ async def optimize_resume(request: Request, authorization: str = Header(None)):
         "jd_snapshot": job_description[:500] + "..." if len(job_description) > 500 else job_description
     })
 
-    # Use semaphore to limit concurrent tasks
-    async with semaphore:
+    # Wait for a slot in the feature's scheduler lane
+    async def run():
         try:
-            logger.info(f"[{user_id}] Starting resume optimization (id={optimization_id})")
-            # Run the resume optimizer in a separate thread
-            result: dict = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: resume_optimizer.optimize(
+            async with scheduler.slot("resume_optimization", user_id):
+                logger.info(f"[{user_id}] Starting resume optimization (id={optimization_id})")
+                # Run the resume optimizer on the shared async LLM client
+                result: dict = await resume_optimizer.optimize(
                     user_id,
                     resume_text,
                     job_description,
                     format_details
                 )
-            )
-            logger.info(f"[{user_id}] Completed resume optimization (id={optimization_id}) ats_score={result.get('ats_score')}")
+                logger.info(f"[{user_id}] Completed resume optimization (id={optimization_id}) ats_score={result.get('ats_score')}")
+
+                # Update the optimization status and result in the database
+                users_collection.update_one(
+                    {"_id": user_id, "features.resumeOptimizer.optimization_id": optimization_id},
+                    {"$set": {
+                        "features.resumeOptimizer.$.status":    "completed",
+                        "features.resumeOptimizer.$.result":    result,
+                        "features.resumeOptimizer.$.updatedAt": datetime.now(UTC)
+                    }}
+                )
 
-            # Update the optimization status and result in the database
+                return {
+                    "optimization_id": optimization_id,
+                    **result
+                }
+        except (Exception, asyncio.CancelledError) as e:
+            # Log and handle any exceptions during resume optimization
+            logger.exception(f"[{user_id}] Resume optimization failed (id={optimization_id}): {str(e)}")
             users_collection.update_one(
                 {"_id": user_id, "features.resumeOptimizer.optimization_id": optimization_id},
                 {"$set": {
-                    "features.resumeOptimizer.$.status":    "completed",
-                    "features.resumeOptimizer.$.result":    result,
+                    "features.resumeOptimizer.$.status":    "failed",
+                    "features.resumeOptimizer.$.error":     str(e),
                     "features.resumeOptimizer.$.updatedAt": datetime.now(UTC)
                 }}
             )
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
+            raise HTTPException(status_code=500, detail=f"Internal error during resume optimization: {str(e)}")
 
-            return {
-                "optimization_id": optimization_id,
-                **result
-            }
-        except Exception as e:
-            # Log and handle any exceptions during resume optimization
-            logger.exception(f"[{user_id}] Resume optimization failed (id={optimization_id}): {str(e)}")
+    # Job mode: queue the work and answer 202 straight away
+    if wants_job(request):
+        return await submit_job(user_id, "resume_optimization", run)
+    return await deadline.guard("resume_optimization", run, request.is_disconnected)
+
+@app.post("/optimize_resume/stream")
+async def optimize_resume_stream(request: Request, authorization: str = Header(None)):
+    """Streaming variant of /optimize_resume: emits `token` events, then a final `result` event."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authentication token.")
+    token = authorization.split("Bearer ")[-1]
+    try:
+        user_info = verify_google_token(token)
+        user_id = user_info["sub"]
+    except Exception:
+        logger.warning("Invalid auth token on optimize_resume/stream")
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+
+    body = await request.json()
+    resume_text = body.get("resume_text")
+    job_description = body.get("job_description")
+    format_details = body.get("format_details")
+    if not resume_text or not job_description:
+        raise HTTPException(
+            status_code=400,
+            detail="Both `resume_text` and `job_description` are required."
+        )
+
+    optimization_id = str(uuid.uuid4())
+    now = datetime.now(UTC)
+    store_optimization_results(user_id, {
+        "optimization_id": optimization_id,
+        "status": "processing",
+        "createdAt": now,
+        "updatedAt": now,
+        "resume_snapshot": resume_text[:1000] + "..." if len(resume_text) > 1000 else resume_text,
+        "jd_snapshot": job_description[:500] + "..." if len(job_description) > 500 else job_description
+    })
+
+    async def event_stream():
+        try:
+            async with scheduler.slot("resume_optimization", user_id):
+                logger.info(f"[{user_id}] Starting streamed resume optimization (id={optimization_id})")
+                async for event, data in resume_optimizer.stream_optimize(
+                    user_id, resume_text, job_description, format_details
+                ):
+                    if event == "result":
+                        users_collection.update_one(
+                            {"_id": user_id, "features.resumeOptimizer.optimization_id": optimization_id},
+                            {"$set": {
+                                "features.resumeOptimizer.$.status":    "completed",
+                                "features.resumeOptimizer.$.result":    data,
+                                "features.resumeOptimizer.$.updatedAt": datetime.now(UTC)
+                            }}
+                        )
+                        data = {"optimization_id": optimization_id, **data}
+                    yield _sse(event, data)
+        except (Exception, asyncio.CancelledError) as e:
+            logger.exception(f"[{user_id}] Streamed resume optimization failed (id={optimization_id}): {str(e)}")
             users_collection.update_one(
                 {"_id": user_id, "features.resumeOptimizer.optimization_id": optimization_id},
                 {"$set": {
@@ -381,7 +687,11 @@ async def optimize_resume(request: Request, authorization: str = Header(None)):
                     "features.resumeOptimizer.$.updatedAt": datetime.now(UTC)
                 }}
             )
-            raise HTTPException(status_code=500, detail=f"Internal error during resume optimization: {str(e)}")
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            yield _sse("error", {"detail": f"Internal error during resume optimization: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 # ----------------
 # Learning Pathways Endpoint
@@ -405,6 +715,8 @@ async def get_learning_pathways(request: Request, authorization: str = Header(No
     topic = body.get("topic")
     if not topic:
         raise HTTPException(status_code=400, detail="`topic` is required.")
+    # Topics are short; reject oversized ones before any work is recorded
+    fit_input("learning_pathways", topic, "topic")
 
     # Generate a unique pathway ID and initialize the learning pathway
     pathway_id = str(uuid.uuid4())
@@ -417,31 +729,30 @@ async def get_learning_pathways(request: Request, authorization: str = Header(No
         "updatedAt": now
     })
 
-    async with semaphore:
+    async def run():
         try:
-            logger.info(f"[{user_id}] Starting generation for topic='{topic}' (pathway_id={pathway_id})")
-            # Generate the learning pathway
-            result = await asyncio.get_event_loop().run_in_executor(
-                None,
-                learning_pathways_instance.generate_pathway,
-                user_id,
-                topic
-            )
+            async with scheduler.slot("learning_pathways", user_id):
+                logger.info(f"[{user_id}] Starting generation for topic='{topic}' (pathway_id={pathway_id})")
+                # Generate the learning pathway
+                result = await learning_pathways_instance.generate_pathway(
+                    user_id,
+                    topic
+                )
 
-            # Update the learning pathway status and result in the database
-            users_collection.update_one(
-                {"_id": user_id, "features.learningPathways.pathway_id": pathway_id},
-                {"$set": {
-                    "features.learningPathways.$.status":     "completed",
-                    "features.learningPathways.$.result":     result["learning_pathway"],
-                    "features.learningPathways.$.updatedAt":  datetime.now(UTC)
-                }}
-            )
+                # Update the learning pathway status and result in the database
+                users_collection.update_one(
+                    {"_id": user_id, "features.learningPathways.pathway_id": pathway_id},
+                    {"$set": {
+                        "features.learningPathways.$.status":     "completed",
+                        "features.learningPathways.$.result":     result["learning_pathway"],
+                        "features.learningPathways.$.updatedAt":  datetime.now(UTC)
+                    }}
+                )
 
-            logger.info(f"[{user_id}] Completed generation for pathway_id={pathway_id}")
-            return result
+                logger.info(f"[{user_id}] Completed generation for pathway_id={pathway_id}")
+                return result
 
-        except Exception as e:
+        except (Exception, asyncio.CancelledError) as e:
             # Log and handle any exceptions during learning pathway generation
             logger.exception(f"[{user_id}] Failed to generate pathway (pathway_id={pathway_id})")
             users_collection.update_one(
@@ -453,8 +764,48 @@ async def get_learning_pathways(request: Request, authorization: str = Header(No
                 }}
             )
             # return a generic 500 to the client
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
             raise HTTPException(status_code=500, detail="Internal error generating learning pathway")
 
+    # Job mode: queue the work and answer 202 straight away
+    if wants_job(request):
+        return await submit_job(user_id, "learning_pathways", run)
+    return await deadline.guard("learning_pathways", run, request.is_disconnected)
+
+@app.post("/learning_pathways/stream")
+async def get_learning_pathways_stream(request: Request, authorization: str = Header(None)):
+    """Streaming variant of /learning_pathways: emits `token` events, then a final `result` event."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authentication token.")
+    token = authorization.split("Bearer ")[-1]
+    try:
+        user_info = verify_google_token(token)
+        user_id = user_info["sub"]
+    except Exception:
+        logger.warning("Invalid auth token on learning_pathways/stream")
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+
+    body = await request.json()
+    topic = body.get("topic")
+    if not topic:
+        raise HTTPException(status_code=400, detail="`topic` is required.")
+    # Topics are short; reject oversized ones before any work is recorded
+    fit_input("learning_pathways", topic, "topic")
+
+    async def event_stream():
+        try:
+            async with scheduler.slot("learning_pathways", user_id):
+                logger.info(f"[{user_id}] Starting streamed generation for topic='{topic}'")
+                # stream_pathway records the processing/completed entries itself
+                async for event, data in learning_pathways_instance.stream_pathway(user_id, topic):
+                    yield _sse(event, data)
+        except Exception:
+            logger.exception(f"[{user_id}] Failed to stream pathway for topic='{topic}'")
+            yield _sse("error", {"detail": "Internal error generating learning pathway"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ----------------
 # Interview Question Analysis Endpoint
 # ----------------
@@ -489,26 +840,25 @@ async def analyze_question(request: Request, authorization: str = Header(None)):
     }
     store_interview_analysis(user_id, initial_data)
 
-    async with semaphore:
+    async def run():
         try:
-            # Analyze the question
-            analysis = await asyncio.get_event_loop().run_in_executor(
-                None, interview_preparation_instance.analyze_question, user_id, question
-            )
+            async with scheduler.slot("interview_analysis", user_id):
+                # Analyze the question
+                analysis = await interview_preparation_instance.analyze_question(user_id, question)
             
-            # Update the analysis status and result
-            users_collection.update_one(
-                {"_id": user_id, "features.interviewAnalysis.analysis_id": analysis_id},
-                {"$set": {
-                    "features.interviewAnalysis.$.status": "completed",
-                    "features.interviewAnalysis.$.analysis": analysis,
-                    "features.interviewAnalysis.$.updatedAt": datetime.now(UTC)
-                }}
-            )
+                # Update the analysis status and result
+                users_collection.update_one(
+                    {"_id": user_id, "features.interviewAnalysis.analysis_id": analysis_id},
+                    {"$set": {
+                        "features.interviewAnalysis.$.status": "completed",
+                        "features.interviewAnalysis.$.analysis": analysis,
+                        "features.interviewAnalysis.$.updatedAt": datetime.now(UTC)
+                    }}
+                )
             
-            return {"analysis": analysis, "analysis_id": analysis_id}
+                return {"analysis": analysis, "analysis_id": analysis_id}
             
-        except Exception as e:
+        except (Exception, asyncio.CancelledError) as e:
             # Handle any exceptions during analysis
             users_collection.update_one(
                 {"_id": user_id, "features.interviewAnalysis.analysis_id": analysis_id},
@@ -518,8 +868,12 @@ async def analyze_question(request: Request, authorization: str = Header(None)):
                     "features.interviewAnalysis.$.updatedAt": datetime.now(UTC)
                 }}
             )
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
             raise HTTPException(status_code=500, detail=str(e))
 
+    return await deadline.guard("interview_analysis", run, request.is_disconnected)
+
 # ----------------
 # Interview Feedback Endpoint
 # ----------------
@@ -559,26 +913,27 @@ async def interview_feedback(request: Request, authorization: str = Header(None)
     }
     store_interview_feedback(user_id, initial_data)
 
-    async with semaphore:
+    async def run():
         try:
-            # Process feedback asynchronously
-            feedback = await asyncio.get_event_loop().run_in_executor(
-                None, interview_preparation_instance.feedback_on_answer, user_id, question, user_answer
-            )
+            async with scheduler.slot("interview_feedback", user_id):
+                # Process feedback asynchronously
+                feedback = await interview_preparation_instance.feedback_on_answer(
+                    user_id, question, user_answer
+                )
             
-            # Update feedback entry with the result
-            users_collection.update_one(
-                {"_id": user_id, "features.interviewFeedback.feedback_id": feedback_id},
-                {"$set": {
-                    "features.interviewFeedback.$.status": "completed",
-                    "features.interviewFeedback.$.feedback": feedback,
-                    "features.interviewFeedback.$.updatedAt": datetime.now(UTC)
-                }}
-            )
+                # Update feedback entry with the result
+                users_collection.update_one(
+                    {"_id": user_id, "features.interviewFeedback.feedback_id": feedback_id},
+                    {"$set": {
+                        "features.interviewFeedback.$.status": "completed",
+                        "features.interviewFeedback.$.feedback": feedback,
+                        "features.interviewFeedback.$.updatedAt": datetime.now(UTC)
+                    }}
+                )
             
-            return {"feedback": feedback, "feedback_id": feedback_id}
+                return {"feedback": feedback, "feedback_id": feedback_id}
             
-        except Exception as e:
+        except (Exception, asyncio.CancelledError) as e:
             users_collection.update_one(
                 {"_id": user_id, "features.interviewFeedback.feedback_id": feedback_id},
                 {"$set": {
@@ -587,8 +942,12 @@ async def interview_feedback(request: Request, authorization: str = Header(None)
                     "features.interviewFeedback.$.updatedAt": datetime.now(UTC)
                 }}
             )
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
             raise HTTPException(status_code=500, detail=str(e))
 
+    return await deadline.guard("interview_feedback", run, request.is_disconnected)
+
 # ----------------
 # Role Transition Guidance Endpoint
 # ----------------
@@ -641,30 +1000,29 @@ async def role_transition(
         "updatedAt": ts
     })
 
-    async with semaphore:
+    async def run():
         try:
-            # Generate plan asynchronously
-            plan = await asyncio.get_event_loop().run_in_executor(
-                None,
-                role_transition_instance.generate_plan,
-                user_id,
-                current,
-                target,
-                resume_text                      # ← new
-            )
+            async with scheduler.slot("role_transition", user_id):
+                # Generate plan asynchronously
+                plan = await role_transition_instance.generate_plan(
+                    user_id,
+                    current,
+                    target,
+                    resume_text                      # ← new
+                )
 
-            # Update plan status to completed
-            users_collection.update_one(
-                {"_id": user_id, "features.roleTransition.plan_id": plan_id},
-                {"$set": {
-                    "features.roleTransition.$.status":     "completed",
-                    "features.roleTransition.$.plan":       plan,
-                    "features.roleTransition.$.updatedAt":  datetime.now(UTC)
-                }}
-            )
-            return {"plan": plan, "plan_id": plan_id}
+                # Update plan status to completed
+                users_collection.update_one(
+                    {"_id": user_id, "features.roleTransition.plan_id": plan_id},
+                    {"$set": {
+                        "features.roleTransition.$.status":     "completed",
+                        "features.roleTransition.$.plan":       plan,
+                        "features.roleTransition.$.updatedAt":  datetime.now(UTC)
+                    }}
+                )
+                return {"plan": plan, "plan_id": plan_id}
 
-        except Exception as e:
+        except (Exception, asyncio.CancelledError) as e:
             # Update plan status to failed on error
             users_collection.update_one(
                 {"_id": user_id, "features.roleTransition.plan_id": plan_id},
@@ -674,11 +1032,18 @@ async def role_transition(
                     "features.roleTransition.$.updatedAt": datetime.now(UTC)
                 }}
             )
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=str(e)
             )
 
+    # Job mode: queue the work and answer 202 straight away
+    if wants_job(request):
+        return await submit_job(user_id, "role_transition", run)
+    return await deadline.guard("role_transition", run, request.is_disconnected)
+
 # ----------------
 # Skill Benchmark & Gap Analysis Endpoint
 # ----------------
@@ -725,24 +1090,21 @@ async def skill_benchmark(request: Request, authorization: str = Header(None)):
     })
 
     # Execute the skill benchmarking asynchronously
-    async with semaphore:
+    async def run():
         try:
-            loop = asyncio.get_event_loop()
-
-            # run the benchmark and capture its output
-            skill_data = await loop.run_in_executor(
-                None,
-                skill_benchmark_instance.run,
-                user_id, entry_id, resume_text, domain, target_role_level
-            )
+            async with scheduler.slot("skill_benchmark", user_id):
+                # run the benchmark and capture its output
+                skill_data = await skill_benchmark_instance.run(
+                    user_id, entry_id, resume_text, domain, target_role_level
+                )
 
-            # return the ID plus all of the Gemini-generated fields
-            return {
-                "skill_benchmark_id": entry_id,
-                **skill_data
-            }
+                # return the ID plus all of the Gemini-generated fields
+                return {
+                    "skill_benchmark_id": entry_id,
+                    **skill_data
+                }
 
-        except Exception as e:
+        except (Exception, asyncio.CancelledError) as e:
             # Handle the case where the skill benchmarking fails
             logger.error("skill_benchmark failed", exc_info=e)
             users_collection.update_one(
@@ -753,8 +1115,15 @@ async def skill_benchmark(request: Request, authorization: str = Header(None)):
                     "features.skillBenchmark.$.updatedAt": datetime.now(UTC)
                 }}
             )
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
             raise HTTPException(status_code=500, detail=str(e))
 
+    # Job mode: queue the work and answer 202 straight away
+    if wants_job(request):
+        return await submit_job(user_id, "skill_benchmark", run)
+    return await deadline.guard("skill_benchmark", run, request.is_disconnected)
+
 # ----------------
 # Resume File Extraction Endpoint
 # ----------------
@@ -837,39 +1206,248 @@ async def generate_cover_letter_endpoint(request: Request, authorization: str =
             detail="Both `resume_text` and `job_description` are required."
         )
 
-    try:
-        logger.info(f"[{user_id}] Starting cover letter generation")
-        
-        # Generate the cover letter using the CoverLetterGenerator
-        result = cover_letter_generator.generate_cover_letter(
-            resume_text=resume_text,
-            job_description=job_description
+    # Variants mode: several alternatives from one context build, streamed as each completes
+    variants = body.get("variants", 1)
+    if not isinstance(variants, int) or isinstance(variants, bool) or not 1 <= variants <= MAX_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"`variants` must be an integer between 1 and {MAX_VARIANTS}."
         )
+    if variants > 1:
+        async def variant_events(emit):
+            # The batch is admitted once, weighted by the letters it writes at the same time,
+            # so every variant runs concurrently without counting against the user's cap N times
+            async with scheduler.slot("cover_letter", user_id, weight=variants):
+                logger.info(f"[{user_id}] Starting generation of {variants} cover letter variants")
+                async for event, data in cover_letter_generator.generate_cover_letter_variants(
+                    resume_text=resume_text,
+                    job_description=job_description,
+                    count=variants,
+                    user_id=user_id
+                ):
+                    if event == "variant":
+                        data = {**data, "generated_at": datetime.now(UTC).isoformat()}
+                    elif event == "done":
+                        event, data = "result", {"success": data["completed"] > 0, **data}
+                    await emit(event, data)
+            logger.info(f"[{user_id}] Cover letter variants completed")
+
+        # Job mode: collect every variant into one result
+        if wants_job(request):
+            async def run_variants():
+                letters, errors, result = [], [], {}
+
+                async def collect(event, data):
+                    if event == "variant":
+                        letters.append(data)
+                    elif event == "variant_error":
+                        errors.append(data)
+                    else:
+                        result.update(data)
+
+                try:
+                    await variant_events(collect)
+                except (Exception, asyncio.CancelledError) as e:
+                    logger.exception(f"[{user_id}] Cover letter variants failed: {str(e)}")
+                    if isinstance(e, UNWRAPPED_ERRORS):
+                        raise
+                    raise HTTPException(
+                        status_code=500,
+                        detail=f"Failed to generate cover letters: {str(e)}"
+                    )
+                return {**result, "variants": sorted(letters, key=lambda v: v["index"]), "errors": errors}
+
+            return await submit_job(user_id, "cover_letter", run_variants)
+
+        async def variant_stream():
+            # The work runs under the request deadline; its events reach the client through a queue
+            events: asyncio.Queue = asyncio.Queue()
+
+            async def run():
+                await variant_events(lambda event, data: events.put((event, data)))
+
+            work = asyncio.ensure_future(deadline.guard("cover_letter", run, request.is_disconnected))
+            work.add_done_callback(lambda _: events.put_nowait(None))
+            try:
+                while (item := await events.get()) is not None:
+                    yield _sse(*item)
+                work.result()
+            except Exception as e:
+                logger.exception(f"[{user_id}] Cover letter variants failed: {str(e)}")
+                yield _sse("error", {"detail": f"Failed to generate cover letters: {str(e)}"})
+            finally:
+                work.cancel()
+
+        return StreamingResponse(variant_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    async def run():
+        try:
+            async with scheduler.slot("cover_letter", user_id):
+                logger.info(f"[{user_id}] Starting cover letter generation")
         
-        logger.info(f"[{user_id}] Cover letter generation completed successfully")
+                # Generate the cover letter using the CoverLetterGenerator
+                result = await cover_letter_generator.generate_cover_letter(
+                    resume_text=resume_text,
+                    job_description=job_description,
+                    user_id=user_id
+                )
         
-        # Return the generated cover letter data (enhanced narrative format)
-        return JSONResponse(
-            status_code=200,
-            content={
-                "success": True,
-                "cover_letter": result["cover_letter"],
-                "narrative_strengths": result["narrative_strengths"],
-                "research_depth": result["research_depth"],
-                "improvement_suggestions": result["improvement_suggestions"],
-                "story_flow_score": result["story_flow_score"],
-                "alignment_explanation": result["alignment_explanation"],
-                "generated_at": datetime.now(UTC).isoformat()
-            }
-        )
+                logger.info(f"[{user_id}] Cover letter generation completed successfully")
         
-    except Exception as e:
-        logger.exception(f"[{user_id}] Cover letter generation failed: {str(e)}")
+                # Return the generated cover letter data (enhanced narrative format)
+                return {
+                    "success": True,
+                    "cover_letter": result["cover_letter"],
+                    "narrative_strengths": result["narrative_strengths"],
+                    "research_depth": result["research_depth"],
+                    "improvement_suggestions": result["improvement_suggestions"],
+                    "story_flow_score": result["story_flow_score"],
+                    "alignment_explanation": result["alignment_explanation"],
+                    "letter_id": result["letter_id"],
+                    "stage_seconds": result["stage_seconds"],
+                    "generated_at": datetime.now(UTC).isoformat()
+                }
+        
+        except (Exception, asyncio.CancelledError) as e:
+            logger.exception(f"[{user_id}] Cover letter generation failed: {str(e)}")
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to generate cover letter: {str(e)}"
+            )
+
+    # Job mode: queue the work and answer 202 straight away
+    if wants_job(request):
+        return await submit_job(user_id, "cover_letter", run)
+    return await deadline.guard("cover_letter", run, request.is_disconnected)
+
+@app.post("/generate_cover_letter/stream")
+async def generate_cover_letter_stream(request: Request, authorization: str = Header(None)):
+    """Streaming variant of /generate_cover_letter: emits `token` events, then a final `result` event."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authentication token.")
+    token = authorization.split("Bearer ")[-1]
+    try:
+        user_info = verify_google_token(token)
+        user_id = user_info["sub"]
+    except Exception:
+        logger.warning("Invalid auth token on generate_cover_letter/stream")
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+
+    body = await request.json()
+    resume_text = body.get("resume_text")
+    job_description = body.get("job_description")
+    if not resume_text or not job_description:
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to generate cover letter: {str(e)}"
+            status_code=400,
+            detail="Both `resume_text` and `job_description` are required."
         )
 
+    async def event_stream():
+        try:
+            async with scheduler.slot("cover_letter", user_id):
+                logger.info(f"[{user_id}] Starting streamed cover letter generation")
+                async for event, data in cover_letter_generator.stream_cover_letter(
+                    resume_text=resume_text,
+                    job_description=job_description,
+                    user_id=user_id
+                ):
+                    if event == "result":
+                        data = {"success": True, **data, "generated_at": datetime.now(UTC).isoformat()}
+                    yield _sse(event, data)
+            logger.info(f"[{user_id}] Streamed cover letter generation completed successfully")
+        except Exception as e:
+            logger.exception(f"[{user_id}] Streamed cover letter generation failed: {str(e)}")
+            yield _sse("error", {"detail": f"Failed to generate cover letter: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# ----------------
+# Regenerate Cover Letter Paragraph Endpoint
+# ----------------
+@app.post("/regenerate_cover_letter_paragraph/{cover_letter_id}")
+async def regenerate_cover_letter_paragraph_endpoint(cover_letter_id: str, request: Request, authorization: str = Header(None)):
+    """
+    Rewrite one paragraph of a generated or saved letter, reusing the research
+    and project context it was written from instead of running the full pipeline.
+    """
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authentication token.")
+    token = authorization.split("Bearer ")[-1]
+    try:
+        user_info = verify_google_token(token)
+        user_id = user_info["sub"]
+    except Exception:
+        logger.warning("Invalid auth token on regenerate_cover_letter_paragraph")
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+
+    body = await request.json()
+    paragraph = body.get("paragraph")
+    instruction = body.get("instruction")
+    if not isinstance(paragraph, int) or isinstance(paragraph, bool):
+        raise HTTPException(status_code=400, detail="`paragraph` (the paragraph index) is required.")
+
+    async def run():
+        # Another user's letter id is treated like an unknown one
+        context = cover_letter_generator.get_context(cover_letter_id, user_id)
+        if context is None:
+            # Saved letters outlive the in-memory context; it is rebuilt from the caches below
+            saved = next(
+                (letter for letter in fetch_saved_cover_letters(user_id)
+                 if letter.get("cover_letter_id") == cover_letter_id),
+                None
+            )
+            if saved is None:
+                raise HTTPException(status_code=404, detail="Cover letter not found.")
+            company_name, cover_letter = saved["company_name"], saved["cover_letter_content"]
+        else:
+            company_name, cover_letter = context.company_name, context.cover_letter
+        # The client may send the letter as currently shown, including manual edits
+        if body.get("cover_letter"):
+            cover_letter = body["cover_letter"]
+        # A bad index is refused before the request waits for a slot
+        try:
+            check_paragraph_index(cover_letter, paragraph)
+        except IndexError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        try:
+            async with scheduler.slot("cover_letter", user_id):
+                if context is None:
+                    context = await cover_letter_generator.context_for_saved_letter(
+                        cover_letter_id,
+                        company_name,
+                        cover_letter,
+                        user_id,
+                        resume_text=body.get("resume_text")
+                    )
+                context = replace(context, cover_letter=cover_letter)
+
+                logger.info(f"[{user_id}] Regenerating paragraph {paragraph} of cover letter {cover_letter_id}")
+                result = await cover_letter_generator.regenerate_paragraph(
+                    cover_letter_id, context, paragraph, instruction
+                )
+            # Write the edit through to the saved copy, if the user saved this letter
+            saved_copy_updated = update_cover_letter_content(user_id, cover_letter_id, result["cover_letter"])
+        except (Exception, asyncio.CancelledError) as e:
+            logger.exception(f"[{user_id}] Paragraph regeneration failed: {str(e)}")
+            if isinstance(e, UNWRAPPED_ERRORS):
+                raise
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to regenerate paragraph: {str(e)}"
+            )
+        return {
+            "success": True,
+            "cover_letter_id": cover_letter_id,
+            **result,
+            "saved": saved_copy_updated,
+            "generated_at": datetime.now(UTC).isoformat()
+        }
+
+    return await deadline.guard("cover_letter.paragraph", run, request.is_disconnected)
+
 # ----------------
 # Save Cover Letter Endpoint
 # ----------------
@@ -903,8 +1481,11 @@ async def save_cover_letter_endpoint(request: Request, authorization: str = Head
     try:
         logger.info(f"[{user_id}] Saving cover letter for {company_name} - {job_title}")
         
-        # Generate unique ID and timestamp
-        cover_letter_id = str(uuid.uuid4())
+        # Keep the generated letter's id, so paragraph edits can reuse its context,
+        # but only an id this server issued to this user
+        cover_letter_id = body.get("letter_id")
+        if not cover_letter_id or cover_letter_generator.get_context(cover_letter_id, user_id) is None:
+            cover_letter_id = str(uuid.uuid4())
         now = datetime.now(UTC).isoformat()  # Store as ISO format string instead of datetime object
         
         # Prepare cover letter data
@@ -0,0 +1,90 @@
+"""
+Tests for the AIMD upstream concurrency limiter, against a throttling fake server
+"""
+
+import asyncio
+
+import openai
+from openai import AsyncOpenAI
+
+from llm import client as llm_client
+from llm import metrics
+from llm.adaptive import AdaptiveLimiter
+from llm.fake_server import FakeLLMServer
+from llm.retry import RetryBudget
+
+
+def _calls(url: str, n: int, concurrency: int):
+    # A fresh client per event loop, since its connection pool is bound to the loop
+    llm_client.set_client(AsyncOpenAI(base_url=url + "/v1", api_key="test", max_retries=0))
+
+    async def one(i):
+        try:
+            # Distinct prompts, so single-flight doesn't coalesce the load away
+            await llm_client.complete("project_evaluation", [{"role": "user", "content": f"hi {i}"}],
+                                      model="gpt-4o", temperature=0.5)
+            return "ok"
+        except openai.RateLimitError:
+            return "throttled"
+
+    async def run():
+        sem = asyncio.Semaphore(concurrency)
+
+        async def guarded(i):
+            async with sem:
+                return await one(i)
+        return await asyncio.gather(*(guarded(i) for i in range(n)))
+
+    return asyncio.run(run())
+
+
+def test_limit_backs_off_on_429_and_recovers(monkeypatch):
+    limiter = AdaptiveLimiter(name="test", initial=16, minimum=1, maximum=32, cooldown=0.02)
+    monkeypatch.setattr(llm_client, "limiter", limiter)
+    # Track the lowest limit reached, since later successes climb it back up
+    lowest = []
+    on_overload = limiter.on_overload
+
+    def tracking(reason):
+        on_overload(reason)
+        lowest.append(limiter.limit)
+    monkeypatch.setattr(limiter, "on_overload", tracking)
+    # No retries, so every 429 reaches the caller and the limiter alone reacts
+    monkeypatch.setattr(llm_client, "retry_budget", RetryBudget(ratio=0.0, min_retries=0))
+
+    with FakeLLMServer(content="fine", delay=0.02, max_concurrent=4) as server:
+        try:
+            results = _calls(server.url, 120, concurrency=16)
+            assert "throttled" in results
+            # Multiplicative decrease pulled the limit down towards what the server allows
+            assert min(lowest) < 8
+            assert metrics.get_counter("llm_limit_decreases", limiter="test", reason="rate_limit") >= 1
+            assert metrics.get_gauge("llm_concurrency_limit", limiter="test") == limiter.limit
+
+            # With throttling lifted the limit climbs back additively
+            server.app.state.max_concurrent = None
+            lowered = limiter.limit
+            assert set(_calls(server.url, 60, concurrency=16)) == {"ok"}
+            assert limiter.limit > lowered
+            assert limiter.inflight == 0
+        finally:
+            llm_client.set_client(None)
+
+
+def test_latency_spike_counts_as_overload():
+    limiter = AdaptiveLimiter(name="spike", initial=10, minimum=2, maximum=20, cooldown=0)
+    for _ in range(30):
+        limiter.on_success("learning_pathways", 1.0)
+    before = limiter.limit
+    limiter.on_success("learning_pathways", 10.0)
+    assert limiter.limit == before * 0.5
+
+
+def test_stream_and_full_call_latencies_keep_separate_baselines():
+    limiter = AdaptiveLimiter(name="kinds", initial=10, minimum=2, maximum=20, cooldown=0)
+    for _ in range(30):
+        limiter.on_success("learning_pathways", 0.5, kind="first_token")
+    before = limiter.limit
+    # A full completion takes far longer than a stream's first token without being a spike
+    limiter.on_success("learning_pathways", 20.0)
+    assert limiter.limit > before
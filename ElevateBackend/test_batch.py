@@ -0,0 +1,56 @@
+"""
+Tests for the offline batch pipeline, using the local batch backend and the fake server
+"""
+
+import asyncio
+import json
+
+from openai import AsyncOpenAI
+
+import batch
+import features.learning_paths as learning_paths
+from llm import client as llm_client
+from llm.batch import LocalBatchBackend, _parse_output_line
+from llm.fake_server import FakeLLMServer
+
+PATHWAY = {"topic": "Rust", "overview": "Systems programming", "steps": []}
+
+
+def test_batch_builds_submits_and_persists_each_result(monkeypatch):
+    stored = []
+    monkeypatch.setattr(learning_paths, "store_learning_pathway_result",
+                        lambda user_id, data: stored.append((user_id, data["status"])))
+    records = [
+        {"topic": "Rust", "user_id": "curriculum"},
+        {"topic": "Kubernetes"},
+        {"topic": "distributed systems " * 100},  # over the topic budget, never sent
+    ]
+
+    with FakeLLMServer(content=json.dumps(PATHWAY)) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            summary = asyncio.run(batch.run_batch("learning_pathways", records, LocalBatchBackend(), poll_interval=0.01))
+        finally:
+            llm_client.set_client(None)
+        assert len(server.requests) == 2
+
+    assert summary["succeeded"] == 2 and summary["failed"] == 1
+    assert [r["status"] for r in summary["results"]] == ["completed", "completed", "failed"]
+    assert summary["results"][0]["result"]["learning_pathway"] == PATHWAY
+    assert "too large" in summary["results"][2]["error"]
+    assert ("curriculum", "completed") in stored and ("batch", "completed") in stored
+
+
+def test_provider_output_lines_are_parsed():
+    ok = _parse_output_line({
+        "custom_id": "learning_pathways-0",
+        "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": " {} "}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2},
+        }},
+    })
+    assert ok.text == "{}" and ok.usage["prompt_tokens"] == 10
+    failed = _parse_output_line({"custom_id": "x", "response": {"status_code": 400, "body": {"error": {"message": "bad"}}}})
+    assert failed.error == "bad"
+    expired = _parse_output_line({"custom_id": "y", "error": {"message": "expired"}})
+    assert expired.error == "expired"
@@ -0,0 +1,84 @@
+"""
+Tests for the company-name extraction engine and its benchmark corpus
+"""
+
+import time
+
+import pytest
+
+import bench_company_names
+from features import company_names
+from features.company_names import GAZETTEER_CAP, CompanyNameExtractor, _Automaton, extractor, load_gazetteer
+from features.cover_letter_generator import CoverLetterGenerator
+
+
+def test_automaton_finds_overlapping_phrases():
+    automaton = _Automaton({"he": "he", "she": "she", "his": "his", "hers": "hers"})
+    assert sorted(automaton.finditer("ushers")) == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_gazetteer_file_loads_canonical_names_and_aliases():
+    entries = dict(load_gazetteer())
+    assert "Google" in entries and "Alphabet" in entries["Google"]
+    assert all(names[0] == canonical for canonical, names in entries.items())
+
+
+@pytest.mark.parametrize("text, company", [
+    ("Company: Acme Robotics\nRole: Firmware Engineer", "Acme Robotics"),
+    ("About the role:\nOwn our APIs.\n\nAbout Stripe:\nStripe builds payments infrastructure.", "Stripe"),
+    ("Initech, Inc. is looking for a data engineer.", "Initech"),
+    ("Alphabet Inc. is hiring an SRE for Google Cloud.", "Google"),
+])
+def test_extracts_the_employer(text, company):
+    assert extractor.extract(text).name == company
+
+
+def test_incidental_mentions_are_not_confident_enough():
+    text = "We are seeking a developer with experience deploying to AWS. Join our team!"
+    assert extractor.extract(text) is None
+    assert CoverLetterGenerator().extract_company_name(text) == ""
+    # Lower-case words that happen to be employer names are ignored
+    assert CompanyNameExtractor(load_gazetteer()).candidates("zoom in on slack time") == []
+
+
+def test_evidence_adds_up_for_the_same_company():
+    once = extractor.extract("Machine Learning Engineer - Meta", min_confidence=0)
+    twice = extractor.extract("Machine Learning Engineer - Meta. Meta Platforms builds social apps.", min_confidence=0)
+    assert twice.key == once.key == "meta"
+    assert twice.confidence > once.confidence
+
+
+def test_tech_stack_mentions_do_not_outrank_the_employer():
+    text = ("Backend Engineer at Lumen Labs, a seed-stage fintech startup. "
+            "Must have experience with Stripe, Stripe Connect APIs and webhooks.")
+    assert extractor.extract(text).name == "Lumen Labs"
+    assert "stripe" not in {candidate.key for candidate in extractor.candidates(text)}
+
+
+def test_repeated_gazetteer_hits_are_capped():
+    text = "Snowflake. " * 10
+    assert extractor.extract(text, min_confidence=0).confidence == GAZETTEER_CAP
+    assert extractor.extract("Data Engineer at Northwind\n" + text).name == "Northwind"
+
+
+def test_engine_beats_the_legacy_patterns_on_the_corpus():
+    rows = {row["extractor"]: row for row in bench_company_names.run(bench_company_names.load_corpus(), repeat=1)}
+    corpus_size = len(bench_company_names.load_corpus())
+    assert rows["features.company_names"]["correct"] == corpus_size
+    assert rows["legacy regex list"]["correct"] < corpus_size
+
+
+def test_long_capitalised_runs_stay_linear(monkeypatch):
+    # Unbounded name runs made this quadratic: 24KB took over ten seconds
+    monkeypatch.setattr(company_names, "MAX_TEXT_CHARS", 10 ** 6)
+    text = "Alpha Beta Gamma Delta " * 1000
+    started = time.perf_counter()
+    extractor.candidates(text)
+    assert time.perf_counter() - started < 1.0
+    # Names are capped at MAX_NAME_WORDS words
+    assert all(len(c.name.split()) <= company_names.MAX_NAME_WORDS for c in extractor.candidates(text))
+
+
+def test_only_the_head_of_the_posting_is_scanned():
+    text = "x" * company_names.MAX_TEXT_CHARS + " Company: Initech\n"
+    assert extractor.extract(text, min_confidence=0) is None
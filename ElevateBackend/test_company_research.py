@@ -0,0 +1,128 @@
+"""
+Tests for the company research cache: identity normalization, TTL and stale-while-revalidate
+"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from features import company_research as research
+from features.company_research import CompanyResearchCache, canonical_name, normalize_company
+from llm import metrics
+
+
+class _CountingBackend:
+    def __init__(self, latency: float = 0.0, fail: bool = False):
+        self.calls: List[str] = []
+        self.latency = latency
+        self.fail = fail
+
+    async def research(self, company_name: str) -> str:
+        self.calls.append(company_name)
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("search backend down")
+        return f"profile #{len(self.calls)} of {company_name}"
+
+
+@pytest.mark.parametrize("name", ["Google", "Google LLC", "google inc.", "  GOOGLE, Inc ", "Alphabet Inc."])
+def test_variants_share_one_identity(name):
+    assert normalize_company(name) == "google"
+
+
+def test_normalization_keeps_distinct_companies_apart():
+    assert normalize_company("Procter & Gamble Co.") == "procter and gamble"
+    assert normalize_company("Meta Platforms, Inc.") == normalize_company("Facebook") == "meta"
+    # A name that is only a legal form keeps it
+    assert normalize_company("Company") == "company"
+    assert normalize_company("Stripe") != normalize_company("Square")
+
+
+def test_aliases_load_from_the_environment(monkeypatch):
+    monkeypatch.setenv("COMPANY_ALIASES", '{"X Corp.": "Twitter Inc."}')
+    assert research._load_aliases()["x"] == "twitter"
+    monkeypatch.setenv("COMPANY_ALIASES", '["not", "a", "mapping"]')
+    assert research._load_aliases() == research.DEFAULT_ALIASES
+
+
+@pytest.mark.parametrize("name, canonical", [
+    ("Facebook", "Meta"), ("Meta Platforms, Inc.", "Meta"), ("AWS", "Amazon"), ("Alphabet Inc.", "Google"),
+    ("Stripe, Inc.", "Stripe"), ("  Procter & Gamble Co. ", "Procter & Gamble"),
+])
+def test_canonical_name_is_the_same_for_every_spelling(name, canonical):
+    assert canonical_name(name) == canonical
+
+
+def test_alias_is_researched_under_its_canonical_name():
+    backend = _CountingBackend()
+    cache = CompanyResearchCache(backend)
+
+    async def run():
+        return await cache.get("Facebook"), await cache.get("Meta")
+
+    first, second = asyncio.run(run())
+    assert backend.calls == ["Meta"]
+    assert first == second == "profile #1 of Meta"
+
+
+def test_variants_and_concurrent_misses_share_one_lookup():
+    backend = _CountingBackend(latency=0.05)
+    cache = CompanyResearchCache(backend)
+
+    async def run():
+        first = await asyncio.gather(*(cache.get(name) for name in ("Google", "Google LLC", "google inc.")))
+        later = await cache.get("GOOGLE")
+        return first, later
+
+    first, later = asyncio.run(run())
+    assert len(backend.calls) == 1
+    assert len(set(first)) == 1 and later == first[0]
+
+
+def test_stale_profile_is_served_while_it_refreshes():
+    backend = _CountingBackend(latency=0.05)
+    cache = CompanyResearchCache(backend, ttl=0.05, stale_ttl=60)
+
+    async def run():
+        original = await cache.get("Initech")
+        await asyncio.sleep(0.1)
+        stale = await cache.get("Initech LLC")
+        # Served at once, before the refresh lands
+        assert stale == original
+        await asyncio.sleep(0.1)
+        assert len(backend.calls) == 2
+        return original, await cache.get("Initech")
+
+    original, refreshed = asyncio.run(run())
+    assert refreshed != original and refreshed.startswith("profile #2")
+    assert metrics.get_counter("company_research_lookups", outcome="stale") >= 1
+
+
+def test_failed_refresh_keeps_the_stale_profile():
+    backend = _CountingBackend()
+    cache = CompanyResearchCache(backend, ttl=0.01, stale_ttl=60)
+
+    async def run():
+        original = await cache.get("Globex")
+        await asyncio.sleep(0.05)
+        backend.fail = True
+        assert await cache.get("Globex") == original
+        await asyncio.sleep(0.05)
+        return original, await cache.get("Globex")
+
+    original, after = asyncio.run(run())
+    assert after == original
+    assert metrics.get_counter("company_research_refresh_errors") >= 1
+
+
+def test_expired_profile_is_fetched_again():
+    backend = _CountingBackend()
+    cache = CompanyResearchCache(backend, ttl=0.01, stale_ttl=0.01)
+
+    async def run():
+        await cache.get("Hooli")
+        await asyncio.sleep(0.05)
+        return await cache.get("Hooli")
+
+    assert asyncio.run(run()) == "profile #2 of Hooli"
@@ -0,0 +1,130 @@
+"""
+Tests for paragraph-level cover letter regeneration from the stored letter context
+"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+import main
+from features.cover_letter_generator import CoverLetterGenerator, cover_letter_generator, split_paragraphs
+from llm import client as llm_client
+from llm.fake_server import FakeLLMServer, load_fake_responses
+
+AUTH = {"Authorization": "Bearer t"}
+RESUME = "Ran the on-call rotation for a 40-service Kubernetes platform and halved pages " * 5
+JOB = "Company: Northwind Traders\nNorthwind Traders is hiring an SRE " * 5
+
+
+def test_split_paragraphs_ignores_blank_runs():
+    assert split_paragraphs("Dear team,\r\n\r\nFirst.\n\n\n\nSecond.\n") == ["Dear team,", "First.", "Second."]
+
+
+def test_endpoint_rewrites_one_paragraph_with_a_small_prompt(monkeypatch):
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    fake = load_fake_responses()
+    with FakeLLMServer(responses=fake) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                letter = http.post("/generate_cover_letter", json={"resume_text": RESUME, "job_description": JOB},
+                                   headers=AUTH).json()
+                generated = len(server.requests)
+                resp = http.post(f"/regenerate_cover_letter_paragraph/{letter['letter_id']}",
+                                 json={"paragraph": 1, "instruction": "Lead with their settlement launch"}, headers=AUTH)
+                out_of_range = http.post(f"/regenerate_cover_letter_paragraph/{letter['letter_id']}",
+                                         json={"paragraph": 99}, headers=AUTH)
+        finally:
+            llm_client.set_client(None)
+        edit_requests = list(server.requests)[generated:]
+
+    assert resp.status_code == 200
+    result = resp.json()
+    before, after = split_paragraphs(letter["cover_letter"]), split_paragraphs(result["cover_letter"])
+    assert after[1] == result["paragraph"] == fake["cover_letter.paragraph"]
+    assert after[:1] + after[2:] == before[:1] + before[2:]
+    # One small call: no résumé, no job description, no re-extraction
+    assert len(edit_requests) == 1
+    prompt = edit_requests[0]["messages"][-1]["content"]
+    assert RESUME.strip() not in prompt and "Northwind Traders is hiring" not in prompt
+    assert "Lead with their settlement launch" in prompt and "[REWRITE]" in prompt
+    assert edit_requests[0]["max_tokens"] <= 400
+    # Later edits start from the updated letter
+    assert cover_letter_generator.get_context(letter["letter_id"], "user-1").cover_letter == result["cover_letter"]
+    assert out_of_range.status_code == 400
+
+
+def test_saved_letter_context_is_rebuilt_from_the_caches(monkeypatch):
+    saved = {"cover_letter_id": "saved-1", "company_name": "Northwind Traders",
+             "cover_letter_content": "Dear team,\n\nOld opening.\n\nYours faithfully,\n[Your Name]"}
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    monkeypatch.setattr(main, "fetch_saved_cover_letters", lambda user_id: [saved])
+    updates = []
+    monkeypatch.setattr(main, "update_cover_letter_content", lambda *args: updates.append(args) or True)
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                # A bad index is refused before the context is rebuilt
+                out_of_range = http.post("/regenerate_cover_letter_paragraph/saved-1", json={"paragraph": 3}, headers=AUTH)
+                assert out_of_range.status_code == 400 and len(server.requests) == 0
+                resp = http.post("/regenerate_cover_letter_paragraph/saved-1", json={"paragraph": 1}, headers=AUTH)
+                missing = http.post("/regenerate_cover_letter_paragraph/unknown", json={"paragraph": 1}, headers=AUTH)
+        finally:
+            llm_client.set_client(None)
+        prompt = server.requests[-1]["messages"][-1]["content"]
+
+    assert resp.status_code == 200
+    assert split_paragraphs(resp.json()["cover_letter"])[1] != "Old opening."
+    assert "COMPANY RESEARCH FINDINGS FOR NORTHWIND TRADERS" in prompt
+    assert missing.status_code == 404
+    # The edit is written back to the saved letter
+    assert resp.json()["saved"] is True
+    assert updates == [("user-1", "saved-1", resp.json()["cover_letter"])]
+
+
+def test_variant_letters_each_get_an_id():
+    generator = CoverLetterGenerator()
+
+    async def collect():
+        return [data async for kind, data in generator.generate_cover_letter_variants(RESUME, JOB, 2) if kind == "variant"]
+
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            variants = asyncio.run(collect())
+        finally:
+            llm_client.set_client(None)
+    ids = {variant["letter_id"] for variant in variants}
+    assert len(ids) == 2 and all(generator.get_context(letter_id, "anonymous") for letter_id in ids)
+
+
+def test_letter_ids_are_bound_to_the_user_they_were_issued_to(monkeypatch):
+    saved = []
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    monkeypatch.setattr(main, "store_cover_letter", lambda user_id, data: saved.append((user_id, data)))
+    monkeypatch.setattr(main, "fetch_saved_cover_letters", lambda user_id: [])
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                letter = http.post("/generate_cover_letter", json={"resume_text": RESUME, "job_description": JOB},
+                                   headers=AUTH).json()
+                to_save = {"cover_letter": letter["cover_letter"], "company_name": "Northwind Traders",
+                           "job_title": "SRE", "letter_id": letter["letter_id"]}
+
+                monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-2"})
+                foreign_edit = http.post(f"/regenerate_cover_letter_paragraph/{letter['letter_id']}",
+                                         json={"paragraph": 1}, headers=AUTH)
+                foreign_save = http.post("/save_cover_letter", json=to_save, headers=AUTH).json()
+
+                monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+                own_save = http.post("/save_cover_letter", json=to_save, headers=AUTH).json()
+        finally:
+            llm_client.set_client(None)
+
+    assert foreign_edit.status_code == 404
+    assert foreign_save["cover_letter_id"] != letter["letter_id"]
+    assert own_save["cover_letter_id"] == letter["letter_id"]
+    assert [user_id for user_id, _ in saved] == ["user-2", "user-1"]
@@ -0,0 +1,57 @@
+"""
+Tests for the concurrent cover letter pipeline and its per-stage timings
+"""
+
+import asyncio
+
+from openai import AsyncOpenAI
+
+import features.cover_letter_generator as cover_letter_generator
+from features.company_research import LocalResearch, company_research
+from llm import client as llm_client
+from llm import metrics
+from llm.fake_server import FakeLLMServer, load_fake_responses
+
+RESUME = "Built a payments API in Python and led a Kubernetes migration " * 5
+JOB = "Acme Corp is hiring a backend engineer to scale our payments platform " * 5
+
+
+def test_research_and_extraction_run_concurrently(monkeypatch):
+    generator = cover_letter_generator.CoverLetterGenerator()
+    monkeypatch.setattr(company_research, "backend", LocalResearch(latency=0.5))
+    company_research.clear()
+
+    with FakeLLMServer(responses=load_fake_responses(), latency="fixed:0.5") as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            result = asyncio.run(generator.generate_cover_letter(RESUME, JOB))
+        finally:
+            llm_client.set_client(None)
+        prompt = server.requests[-1]["messages"][-1]["content"]
+
+    timings = result["stage_seconds"]
+    assert set(timings) == {"company_research", "extract_projects", "generation", "total"}
+    assert timings["company_research"] >= 0.5 and timings["extract_projects"] >= 0.5
+    # Sequential stages would take 1.5s or more
+    assert timings["total"] < 1.35
+    assert "COMPANY RESEARCH FINDINGS FOR ACME" in prompt
+    assert result["cover_letter"]
+    assert metrics.get_histogram("cover_letter_stage_seconds", stage="company_research").count >= 1
+
+
+def test_streamed_letter_reports_stage_timings():
+    generator = cover_letter_generator.CoverLetterGenerator()
+
+    async def collect():
+        return [event async for event in generator.stream_cover_letter(RESUME, JOB)]
+
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            events = asyncio.run(collect())
+        finally:
+            llm_client.set_client(None)
+
+    kind, result = events[-1]
+    assert kind == "result"
+    assert {"company_research", "extract_projects", "generation", "total"} <= set(result["stage_seconds"])
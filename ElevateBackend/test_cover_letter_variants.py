@@ -0,0 +1,152 @@
+"""
+Tests for multi-variant cover letter generation from one shared context build
+"""
+
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+import main
+from features import cover_letter_generator as generator_module
+from features.cover_letter_generator import MAX_VARIANTS, VARIANT_TONES, CoverLetterGenerator
+from llm import client as llm_client, deadline, scheduler
+from llm.fake_server import FakeLLMServer, load_fake_responses
+
+AUTH = {"Authorization": "Bearer t"}
+RESUME = "Maintained a Postgres-backed billing service and cut invoice errors by 40% " * 5
+JOB = "Company: Contoso\nContoso is hiring a senior billing engineer " * 5
+
+
+def _events(body: str) -> list:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_variants_share_one_context_build():
+    generator = CoverLetterGenerator()
+
+    async def collect():
+        return [event async for event in generator.generate_cover_letter_variants(RESUME, JOB, 3)]
+
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            events = asyncio.run(collect())
+        finally:
+            llm_client.set_client(None)
+        prompts = [r["messages"][-1]["content"] for r in server.requests]
+
+    variants = [data for kind, data in events if kind == "variant"]
+    assert sorted(v["index"] for v in variants) == [0, 1, 2]
+    assert {v["tone"] for v in variants} == set(VARIANT_TONES[:3])
+    assert all(v["cover_letter"] for v in variants)
+    kind, done = events[-1]
+    assert kind == "done" and done["requested"] == done["completed"] == 3
+    # One extraction call and three letters, each asked for its own tone
+    assert len(prompts) == 4
+    assert sum(any(tone in p for tone in VARIANT_TONES) for p in prompts) == 3
+
+
+def test_endpoint_streams_each_variant(monkeypatch):
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                payload = {"resume_text": RESUME, "job_description": JOB}
+                resp = http.post("/generate_cover_letter", json={**payload, "variants": 2}, headers=AUTH)
+                too_many = http.post("/generate_cover_letter", json={**payload, "variants": MAX_VARIANTS + 1}, headers=AUTH)
+        finally:
+            llm_client.set_client(None)
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _events(resp.text)
+    assert [kind for kind, _ in events] == ["variant", "variant", "result"]
+    assert all("generated_at" in data for kind, data in events[:2])
+    assert events[-1][1]["success"] is True and events[-1][1]["completed"] == 2
+    assert too_many.status_code == 400
+
+
+def test_failed_variant_reports_its_index_and_tone(monkeypatch):
+    generator = CoverLetterGenerator()
+    real_complete = generator_module.complete
+
+    async def complete(feature, messages, **kwargs):
+        if VARIANT_TONES[1] in messages[-1]["content"]:
+            raise RuntimeError("upstream failed")
+        return await real_complete(feature, messages, **kwargs)
+
+    async def collect():
+        return [event async for event in generator.generate_cover_letter_variants(RESUME, JOB, 3)]
+
+    monkeypatch.setattr(generator_module, "complete", complete)
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            events = asyncio.run(collect())
+        finally:
+            llm_client.set_client(None)
+
+    errors = [data for kind, data in events if kind == "variant_error"]
+    assert errors == [{"index": 1, "tone": VARIANT_TONES[1], "detail": "upstream failed"}]
+    assert events[-1][1]["completed"] == 2
+
+
+def test_endpoint_runs_variants_as_a_job(monkeypatch):
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                payload = {"resume_text": RESUME, "job_description": JOB, "variants": 2}
+                resp = http.post("/generate_cover_letter?mode=async", json=payload, headers=AUTH)
+                assert resp.status_code == 202
+                http.get(resp.json()["events_url"], headers=AUTH)
+                job = http.get(resp.json()["status_url"], headers=AUTH).json()
+        finally:
+            llm_client.set_client(None)
+
+    assert job["status"] == "completed"
+    assert [v["index"] for v in job["result"]["variants"]] == [0, 1]
+    assert job["result"]["success"] is True and job["result"]["errors"] == []
+
+
+def test_streamed_variants_stop_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    monkeypatch.setitem(deadline.BUDGETS, "cover_letter", 0.3)
+    with FakeLLMServer(responses=load_fake_responses(), delay=2) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                payload = {"resume_text": RESUME, "job_description": JOB, "variants": 2}
+                resp = http.post("/generate_cover_letter", json=payload, headers=AUTH)
+        finally:
+            llm_client.set_client(None)
+
+    kind, data = _events(resp.text)[-1]
+    assert kind == "error" and "deadline" in data["detail"]
+
+
+def test_all_variants_run_at_once_despite_the_per_user_cap(monkeypatch):
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    assert scheduler.USER_MAX_INFLIGHT < MAX_VARIANTS
+    with FakeLLMServer(responses=load_fake_responses(), delay=0.4) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                payload = {"resume_text": RESUME + " (timed)", "job_description": JOB, "variants": MAX_VARIANTS}
+                start = time.perf_counter()
+                resp = http.post("/generate_cover_letter", json=payload, headers=AUTH)
+                elapsed = time.perf_counter() - start
+        finally:
+            llm_client.set_client(None)
+
+    assert _events(resp.text)[-1][1]["completed"] == MAX_VARIANTS
+    # Project extraction, then one round of letters; waves of USER_MAX_INFLIGHT would take three
+    assert elapsed < 0.4 * 2 + 0.5
@@ -0,0 +1,168 @@
+"""
+Tests for end-to-end request deadlines, client-disconnect cancellation and hedged LLM calls
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from openai import AsyncOpenAI
+
+from llm import client as llm_client
+from llm import deadline, metrics, routing
+from llm.fake_server import FakeLLMServer
+
+
+def test_guard_returns_the_result_and_exposes_the_deadline():
+    async def run():
+        return deadline.remaining()
+
+    left = asyncio.run(deadline.guard("test_guard", run, budget=5))
+    assert 4 < left <= 5
+    # Outside a guarded request there is no deadline
+    assert deadline.remaining() is None and deadline.cap(30) == 30
+
+
+def test_deadline_cancels_the_work():
+    cancelled = []
+
+    async def run():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    start = time.monotonic()
+    with pytest.raises(deadline.DeadlineExceeded):
+        asyncio.run(deadline.guard("test_deadline", run, budget=0.2))
+    assert time.monotonic() - start < 2
+    assert cancelled == [True]
+    assert metrics.get_counter("llm_deadline_exceeded", feature="test_deadline") == 1
+
+
+def test_client_disconnect_cancels_the_work(monkeypatch):
+    monkeypatch.setattr(deadline, "DISCONNECT_POLL_SECONDS", 0.05)
+    cancelled = []
+    polls = []
+
+    async def is_disconnected():
+        polls.append(1)
+        return len(polls) >= 2
+
+    async def run():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(deadline.ClientDisconnected):
+        asyncio.run(deadline.guard("test_disconnect", run, is_disconnected, budget=10))
+    assert cancelled == [True]
+    assert metrics.get_counter("llm_client_disconnects", feature="test_disconnect") == 1
+
+
+def test_llm_call_timeout_is_capped_by_the_deadline():
+    with FakeLLMServer(content="late", latency="fixed:3") as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            async def run():
+                return await llm_client.complete(
+                    "test_capped", [{"role": "user", "content": "hi"}], model="gpt-4o", temperature=0, timeout=60,
+                )
+            start = time.monotonic()
+            with pytest.raises(deadline.DeadlineExceeded):
+                asyncio.run(deadline.guard("test_capped", run, budget=0.5))
+            assert time.monotonic() - start < 2
+        finally:
+            llm_client.set_client(None)
+
+
+class _SlowThenFast:
+    """Client double whose first completion hangs and whose second answers at once."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+        return SimpleNamespace(
+            model=kwargs["model"],
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"reply {self.calls}"), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=200, prompt_tokens_details=None),
+        )
+
+
+def test_slow_call_is_hedged_after_the_route_p95(monkeypatch):
+    monkeypatch.setitem(routing.ROUTES, "test_hedge", routing.Route(hedge=True))
+    monkeypatch.setattr(routing, "HEDGE_MIN_DELAY", 0.05)
+    for _ in range(routing.HEDGE_MIN_SAMPLES):
+        routing.record_call("test_hedge", "gpt-4o", 0.05)
+    fake = _SlowThenFast()
+    llm_client.set_client(fake)
+    try:
+        start = time.monotonic()
+        completion = asyncio.run(llm_client.complete(
+            "test_hedge", [{"role": "user", "content": "hi"}], model="gpt-4o", temperature=0,
+        ))
+    finally:
+        llm_client.set_client(None)
+
+    assert completion.text == "reply 2"
+    assert time.monotonic() - start < 2
+    assert fake.calls == 2 and fake.cancelled
+    assert metrics.get_counter("llm_hedges", feature="test_hedge") == 1
+    assert metrics.get_gauge("llm_hedge_win_rate", feature="test_hedge") == 1
+    assert metrics.get_counter("llm_hedge_extra_cost_usd", feature="test_hedge") == pytest.approx(
+        routing.cost("gpt-4o", 1000, 200)
+    )
+
+
+def test_routes_without_hedging_or_history_send_one_request():
+    for _ in range(routing.HEDGE_MIN_SAMPLES):
+        routing.record_call("test_no_hedge", "gpt-4o", 0.05)
+    assert routing.hedge_delay("test_no_hedge", "gpt-4o") is None
+    assert routing.hedge_delay("resume_optimization", "model-with-no-history") is None
+
+
+class _Collection:
+    """Records update_one calls instead of talking to MongoDB."""
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, filter, update, upsert=False):
+        self.updates.append((filter, update))
+
+
+def test_timed_out_request_marks_its_entry_failed(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    collection = _Collection()
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    monkeypatch.setattr(main, "users_collection", collection)
+    monkeypatch.setitem(deadline.BUDGETS, "interview_analysis", 0.3)
+
+    with FakeLLMServer(content="late", latency="fixed:3") as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                resp = http.post("/analyze_question", json={"question": "deadline test: serialize a binary tree"},
+                                 headers={"Authorization": "Bearer t"})
+        finally:
+            llm_client.set_client(None)
+
+    assert resp.status_code == 504
+    # The cancelled work still replaced its "processing" entry with "failed"
+    fields = collection.updates[-1][1]["$set"]
+    assert fields["features.interviewAnalysis.$.status"] == "failed"
@@ -0,0 +1,111 @@
+"""
+Tests for job mode: submit returns 202 at once, results are polled or streamed
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+import main
+from jobs import JobManager, UserJobsFull
+from llm import client as llm_client
+from llm import deadline
+from llm.fake_server import FakeLLMServer
+from llm.scheduler import QueueTimeout
+
+AUTH = {"Authorization": "Bearer t"}
+
+
+class _Collection:
+    """Swallows update_one calls instead of talking to MongoDB."""
+    def update_one(self, filter, update, upsert=False):
+        pass
+
+
+def test_submit_then_poll_and_subscribe(monkeypatch):
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    monkeypatch.setattr(main, "users_collection", _Collection())
+    pathway = {"topic": "Go", "phases": []}
+    with FakeLLMServer(content=json.dumps(pathway), delay=0.01) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                resp = http.post("/learning_pathways", json={"topic": "Go"},
+                                 headers={**AUTH, "Prefer": "respond-async"})
+                assert resp.status_code == 202
+                job_id = resp.json()["job_id"]
+                assert resp.headers["location"] == f"/jobs/{job_id}"
+
+                # Other users can't see the job
+                monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-2"})
+                assert http.get(f"/jobs/{job_id}", headers=AUTH).status_code == 404
+                monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+
+                events = http.get(f"/jobs/{job_id}/events", headers=AUTH).text
+                assert "event: result" in events
+
+                deadline = time.monotonic() + 5
+                job = http.get(f"/jobs/{job_id}", headers=AUTH).json()
+                while job["status"] != "completed" and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    job = http.get(f"/jobs/{job_id}", headers=AUTH).json()
+                assert job["status"] == "completed"
+                assert job["result"]["learning_pathway"] == pathway
+        finally:
+            llm_client.set_client(None)
+
+
+def test_one_users_backlog_cannot_hold_every_worker():
+    async def scenario():
+        manager = JobManager(workers=4, user_max_running=2, user_max_queued=10)
+        release = asyncio.Event()
+        started = []
+
+        async def blocked(user_id):
+            started.append(user_id)
+            await release.wait()
+            return {}
+
+        heavy = [await manager.submit("heavy", "test_jobs", lambda: blocked("heavy")) for _ in range(6)]
+        light = await manager.submit("light", "test_jobs", lambda: blocked("light"))
+        await asyncio.sleep(0.05)
+        running = dict(manager.running)
+        with pytest.raises(UserJobsFull):
+            for _ in range(10):
+                await manager.submit("heavy", "test_jobs", lambda: blocked("heavy"))
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*(job.done.wait() for job in heavy + [light])), timeout=5)
+        await manager.stop()
+        return running, started
+
+    running, started = asyncio.run(scenario())
+    assert running == {"heavy": 2, "light": 1}
+    assert "light" in started[:3]
+
+
+def test_job_failures_keep_the_synchronous_status(monkeypatch):
+    monkeypatch.setitem(deadline.BUDGETS, "test_jobs_slow", 0.05)
+
+    async def scenario():
+        manager = JobManager(workers=2)
+
+        async def queue_timeout():
+            raise QueueTimeout("heavy", 60)
+
+        async def slow():
+            await asyncio.sleep(5)
+            return {}
+
+        timed_out = await manager.submit("user-1", "test_jobs", queue_timeout)
+        too_slow = await manager.submit("user-1", "test_jobs_slow", slow)
+        await asyncio.wait_for(asyncio.gather(timed_out.done.wait(), too_slow.done.wait()), timeout=5)
+        await manager.stop()
+        return timed_out.public(), too_slow.public()
+
+    timed_out, too_slow = asyncio.run(scenario())
+    assert timed_out["status"] == "failed" and timed_out["error_status"] == 503 and timed_out["retry_after"] == 15
+    assert too_slow["status"] == "failed" and too_slow["error_status"] == 504
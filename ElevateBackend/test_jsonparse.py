@@ -0,0 +1,64 @@
+"""
+Tests for the shared tolerant JSON parser used on model replies
+"""
+
+import json
+
+import pytest
+
+import bench_json_parse
+from features.learning_paths import LearningPathways
+from llm import jsonparse, metrics
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"score": 7}', {"score": 7}),
+    ('Here you go:\n```json\n{"score": 7}\n```\nHope that helps!', {"score": 7}),
+    ('{"tags": ["a", "b",], "score": 7,}', {"tags": ["a", "b"], "score": 7}),
+    ('{"summary": "null and true are just words here", "ok": true}',
+     {"summary": "null and true are just words here", "ok": True}),
+    ('{"summary": "The team\'s API"}', {"summary": "The team's API"}),
+    ('{"summary": "Résumé — 日本語"}', {"summary": "Résumé — 日本語"}),
+])
+def test_loads_object_recovers_the_intended_value(text, expected):
+    assert jsonparse.loads_object(text, "test_jsonparse") == expected
+
+
+def test_truncated_reply_keeps_what_was_written():
+    result = jsonparse.loads_object('{"strengths": ["fast", "clear"], "summary": "Strong proj', "test_jsonparse")
+    assert result["strengths"] == ["fast", "clear"]
+
+
+def test_refusal_and_non_objects_raise_value_error():
+    with pytest.raises(ValueError):
+        jsonparse.loads_object("I'm sorry, I can't help with that.", "test_jsonparse")
+    with pytest.raises(ValueError):
+        jsonparse.loads_object("[1, 2, 3]", "test_jsonparse")
+
+
+def test_only_repairs_are_counted():
+    before = metrics.get_counter("llm_json_repairs", feature="test_repairs")
+    jsonparse.loads('{"a": 1}', "test_repairs")
+    jsonparse.loads('{"a": 1,}', "test_repairs")
+    assert metrics.get_counter("llm_json_repairs", feature="test_repairs") == before + 1
+
+
+def test_learning_pathway_parse_repairs_a_non_schema_reply():
+    raw = '```json\n{"topic": "Rust", "steps": [{"title": "Ownership",},],}\n```'
+    assert LearningPathways()._parse_pathway("user-1", raw) == {"topic": "Rust", "steps": [{"title": "Ownership"}]}
+    with pytest.raises(ValueError):
+        LearningPathways()._parse_pathway("user-1", "no json here")
+
+
+def test_benchmark_corpus_is_fully_recovered():
+    corpus = bench_json_parse.load_corpus()
+    rows = {row["parser"]: row for row in bench_json_parse.run(corpus, repeat=1)}
+    tolerant = rows["llm.jsonparse"]
+    assert tolerant["correct"] == tolerant["scored"]
+    # Every legacy parser got at least one of these wrong
+    for name, row in rows.items():
+        if name != "llm.jsonparse":
+            assert row["correct"] < row["scored"]
+    # The corpus itself is well-formed JSONL with a value for every scored reply
+    assert all(case["expected"] is None or isinstance(case["expected"], dict) for case in corpus)
+    assert json.loads(corpus[0]["text"]) == corpus[0]["expected"]
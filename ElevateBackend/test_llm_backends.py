@@ -0,0 +1,94 @@
+"""
+Tests for the fake, record and replay LLM backends and the offline load test
+"""
+
+import asyncio
+import json
+import random
+
+import httpx
+import pytest
+from openai import AsyncOpenAI, BadRequestError, InternalServerError
+
+import loadtest
+from llm import client as llm_client
+from llm.backends import RecordingTransport, ReplayTransport
+from llm.fake_server import FakeLLMServer, load_fake_responses, parse_latency
+
+MESSAGES: list = [{"role": "user", "content": "Evaluate my project"}]
+
+
+async def _exchange(client: AsyncOpenAI):
+    resp = await client.chat.completions.create(model="gpt-4o", messages=MESSAGES, temperature=0)
+    chunks = []
+    async for chunk in await client.chat.completions.create(model="gpt-4o", messages=MESSAGES, temperature=0, stream=True):
+        if chunk.choices and chunk.choices[0].delta.content:
+            chunks.append(chunk.choices[0].delta.content)
+    assert resp.usage is not None
+    return resp.choices[0].message.content, resp.usage.prompt_tokens, chunks
+
+
+def test_recorded_responses_replay_byte_for_byte(tmp_path):
+    cassette = str(tmp_path / "llm.jsonl")
+    with FakeLLMServer(content='{"score": 8}', chunk_size=3) as server:
+        recorder = AsyncOpenAI(base_url=server.url + "/v1", api_key="test", max_retries=0,
+                               http_client=httpx.AsyncClient(transport=RecordingTransport(httpx.AsyncHTTPTransport(), cassette)))
+        recorded = asyncio.run(_exchange(recorder))
+
+    lines = [json.loads(line) for line in open(cassette)]
+    assert [line["status"] for line in lines] == [200, 200]
+    assert lines[0]["key"] != lines[1]["key"]  # streamed and plain requests are separate interactions
+
+    # The server is gone; replay answers from the cassette alone
+    replayer = AsyncOpenAI(base_url="http://replay.invalid/v1", api_key="replay", max_retries=0,
+                           http_client=httpx.AsyncClient(transport=ReplayTransport(cassette)))
+    assert asyncio.run(_exchange(replayer)) == recorded
+    assert recorded[2] == ['{"s', 'cor', 'e":', ' 8}']
+
+    async def miss():
+        await replayer.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": "new"}], temperature=0)
+    with pytest.raises(BadRequestError, match="cassette"):
+        asyncio.run(miss())
+
+
+def test_fake_server_picks_response_by_feature_and_injects_errors():
+    async def call(server, feature):
+        client = AsyncOpenAI(base_url=server.url + "/v1", api_key="test", max_retries=0)
+        resp = await client.chat.completions.create(model="gpt-4o", messages=MESSAGES, temperature=0,
+                                                    extra_headers={"X-LLM-Feature": feature})
+        return resp.choices[0].message.content
+
+    with FakeLLMServer(content="default", responses={"cover_letter": "Dear team"}) as server:
+        assert asyncio.run(call(server, "cover_letter")) == "Dear team"
+        assert asyncio.run(call(server, "unknown")) == "default"
+
+    with FakeLLMServer(content="x", error_rate=1.0) as server:
+        with pytest.raises(InternalServerError):
+            asyncio.run(call(server, "cover_letter"))
+
+
+def test_latency_specs_are_seeded_and_non_negative():
+    assert parse_latency(None, random.Random(1))() == 0.0
+    assert parse_latency("0.25", random.Random(1))() == 0.25
+    uniform = parse_latency("uniform:0.1,0.2", random.Random(1))
+    assert all(0.1 <= uniform() <= 0.2 for _ in range(50))
+    normal = parse_latency("normal:0.01,1", random.Random(1))
+    assert all(normal() >= 0 for _ in range(50))
+    samples = [parse_latency("lognormal:0.5,0.3", random.Random(7))() for _ in range(2)]
+    assert samples[0] == samples[1]
+    with pytest.raises(ValueError):
+        parse_latency("pareto:1", random.Random(1))
+
+
+def test_every_feature_runs_end_to_end_against_the_fake_responses():
+    with FakeLLMServer(responses=load_fake_responses(), chunk_size=64) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test", max_retries=0))
+        try:
+            reports = asyncio.run(loadtest.run(requests=3, concurrency=3))
+        finally:
+            llm_client.set_client(None)
+
+    assert {r["feature"] for r in reports} == set(loadtest._scenarios())
+    for report in reports:
+        assert report["errors"] == 0, (report["feature"], report["first_error"])
+        assert report["ok"] == 3 and report["throughput_rps"] > 0
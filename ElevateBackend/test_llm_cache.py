@@ -0,0 +1,82 @@
+"""
+Tests for the content-hash LLM response cache
+"""
+
+import asyncio
+
+import httpx
+from openai import AsyncOpenAI
+
+from llm import client as llm_client
+from llm.cache import LRUCache, make_key, response_cache
+
+
+def _fake_openai(calls: list) -> AsyncOpenAI:
+    """AsyncOpenAI client whose transport answers every request locally."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": '{"ok": true}'},
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+        })
+    return AsyncOpenAI(api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def test_key_ignores_cosmetic_differences():
+    a = make_key("gpt-4o", "1", {"question": "Merge two sorted lists  \r\n"}, 0.0)
+    b = make_key("gpt-4o", "1", {"question": "Merge two sorted lists"}, 0.0)
+    assert a == b
+    # Model, prompt version and temperature are all part of the identity
+    assert a != make_key("gpt-4o-mini", "1", {"question": "Merge two sorted lists"}, 0.0)
+    assert a != make_key("gpt-4o", "2", {"question": "Merge two sorted lists"}, 0.0)
+    assert a != make_key("gpt-4o", "1", {"question": "Merge two sorted lists"}, 0.5)
+
+
+def test_lru_evicts_oldest_and_expires():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+
+
+def test_opted_in_feature_is_served_from_cache():
+    calls = []
+    llm_client.set_client(_fake_openai(calls))
+    response_cache.clear()
+    try:
+        async def run():
+            messages = [{"role": "user", "content": "analyze"}]
+            first = await llm_client.complete(
+                "interview_analysis", messages, model="gpt-4o", temperature=0.0,
+                cache_inputs={"question": "reverse a linked list"},
+            )
+            second = await llm_client.complete(
+                "interview_analysis", messages, model="gpt-4o", temperature=0.0,
+                cache_inputs={"question": "reverse a linked list"},
+            )
+            # Cover letters have no cache policy, so they always hit the API
+            await llm_client.complete("cover_letter", messages, model="gpt-4", temperature=0.8,
+                                      cache_inputs={"question": "reverse a linked list"})
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert not first.cached and second.cached
+        assert second.text == first.text
+        assert len(calls) == 2
+        assert response_cache.hit_rate("interview_analysis") == 0.5
+    finally:
+        llm_client.set_client(None)
+        response_cache.clear()
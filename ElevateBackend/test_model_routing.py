@@ -0,0 +1,82 @@
+"""
+Tests for per-call-site model routing, A/B splits and per-route metrics
+"""
+
+import asyncio
+
+import pytest
+from openai import AsyncOpenAI
+
+import features.cover_letter_generator as cover_letter_generator
+from llm import client as llm_client
+from llm import routing, structured
+from llm.fake_server import FakeLLMServer, load_fake_responses
+
+
+def test_sub_tasks_default_to_the_small_tier():
+    assert routing.choose("cover_letter.extract_projects") == routing.TIERS["small"]
+    assert routing.choose("cover_letter") == routing.TIERS["large"]
+    # Unknown call sites get the large tier
+    assert routing.choose("not_a_route") == routing.TIERS["large"]
+
+
+def test_route_overrides_and_ab_split(monkeypatch):
+    monkeypatch.setitem(routing.ROUTES, "pinned", routing.Route(tier="small", model="gpt-4"))
+    monkeypatch.setitem(routing.ROUTES, "trial", routing.Route(tier="large", split={"small": 0.25}))
+    assert routing.choose("pinned") == "gpt-4"
+
+    picks = [routing.choose("trial", f"user-{i}") for i in range(2000)]
+    share = picks.count(routing.TIERS["small"]) / len(picks)
+    assert 0.2 < share < 0.3
+    assert set(picks) == {routing.TIERS["small"], routing.TIERS["large"]}
+    # The same user always lands on the same arm
+    assert all(routing.choose("trial", f"user-{i}") == picks[i] for i in range(100))
+    assert routing.base_model("trial") == routing.TIERS["large"]
+
+
+def test_routes_load_from_the_environment(monkeypatch):
+    monkeypatch.setenv("LLM_ROUTES", '{"skill_benchmark": {"tier": "small", "split": {"large": 0.1}}}')
+    assert routing._load_routes()["skill_benchmark"] == routing.Route(tier="small", split={"large": 0.1})
+    monkeypatch.setenv("LLM_ROUTES", '{"skill_benchmark": {"size": "small"}}')
+    assert routing._load_routes()["skill_benchmark"] == routing.Route()
+    monkeypatch.setenv("LLM_MODEL_TIERS", '{"small": "gpt-4.1-mini"}')
+    assert routing._load_tiers()["small"] == "gpt-4.1-mini"
+
+
+def test_cost_uses_cached_and_output_prices():
+    assert routing.cost("gpt-4o", 1_000_000, 0) == pytest.approx(2.50)
+    assert routing.cost("gpt-4o", 1_000_000, 1_000_000, cached_tokens=1_000_000) == pytest.approx(11.25)
+    assert routing.cost("gpt-4o-mini", 2000, 500) < routing.cost("gpt-4o", 2000, 500) / 10
+    assert routing.cost("unpriced-model", 1000, 1000) == 0.0
+
+
+def test_cover_letter_routes_extraction_to_the_small_model():
+    generator = cover_letter_generator.CoverLetterGenerator()
+
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            asyncio.run(generator.generate_cover_letter("Built a payments API in Python " * 5, "Backend role at Acme " * 5))
+        finally:
+            llm_client.set_client(None)
+        models = [r["model"] for r in server.requests]
+
+    assert models == [routing.TIERS["small"], routing.TIERS["large"]]
+    rows = {(row["route"], row["model"]): row for row in routing.report()}
+    extraction = rows[("cover_letter.extract_projects", routing.TIERS["small"])]
+    letter = rows[("cover_letter", routing.TIERS["large"])]
+    assert extraction["calls"] >= 1 and letter["calls"] >= 1
+    assert 0 < extraction["cost_per_call_usd"] < letter["cost_per_call_usd"]
+    assert letter["p50_seconds"] > 0
+
+
+def test_fallbacks_are_counted_per_route_and_model():
+    routing.record_call("test_route", "gpt-4o-mini", 0.1, 100, 50)
+    routing.record_call("test_route", "gpt-4o-mini", 0.2, 100, 50)
+    routing.record_call("test_route", "gpt-4o", 0.3, 100, 50)
+    structured.record_fallback("test_route", "gpt-4o-mini")
+
+    rows = {row["model"]: row for row in routing.report() if row["route"] == "test_route"}
+    assert rows["gpt-4o-mini"]["fallback_rate"] == pytest.approx(0.5)
+    assert rows["gpt-4o"]["fallback_rate"] == 0
+    assert rows["gpt-4o-mini"]["calls"] == 2
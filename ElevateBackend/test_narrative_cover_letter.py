@@ -6,6 +6,7 @@ Demonstrates the new story weaving capabilities
 
 import sys
 import os
+import asyncio
 
 # Add the ElevateBackend directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -107,10 +108,10 @@ def test_narrative_cover_letter():
     try:
         # Generate the cover letter
         print("📝 Generating cover letter with narrative connections...")
-        result = cover_letter_generator.generate_cover_letter(
+        result = asyncio.run(cover_letter_generator.generate_cover_letter(
             resume_text=sample_resume,
             job_description=sample_job_description
-        )
+        ))
         
         print("\n✅ Cover Letter Generated Successfully!")
         print("=" * 70)
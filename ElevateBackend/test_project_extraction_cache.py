@@ -0,0 +1,108 @@
+"""
+Tests for caching résumé project extraction across cover letters
+"""
+
+import asyncio
+from dataclasses import replace
+
+from openai import AsyncOpenAI
+
+import database
+import features.cover_letter_generator as cover_letter_generator
+from llm import cache as llm_cache
+from llm import client as llm_client
+from llm.fake_server import FakeLLMServer, load_fake_responses
+
+RESUME = "Designed a streaming ETL pipeline in Go and cut batch latency by 70% " * 5
+JOBS = [f"Role {i}: platform engineer at Initech, scaling data infrastructure " * 5 for i in range(3)]
+
+
+def _extractions(server) -> int:
+    return sum("technical recruiter" in r["messages"][0]["content"] for r in server.requests)
+
+
+async def _generate_all(generator, resume=RESUME):
+    for job in JOBS:
+        await generator.generate_cover_letter(resume, job)
+
+
+def test_extraction_runs_once_per_resume(monkeypatch):
+    generator = cover_letter_generator.CoverLetterGenerator()
+    llm_cache.response_cache.clear()
+
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            async def run():
+                await _generate_all(generator)
+                assert _extractions(server) == 1
+                assert len(server.requests) == 1 + len(JOBS)
+                # A different résumé is extracted afresh
+                await _generate_all(generator, RESUME + " Also shipped a Rust CLI.")
+                assert _extractions(server) == 2
+                # A new extraction prompt version invalidates earlier entries
+                monkeypatch.setattr(
+                    cover_letter_generator, "PROJECT_EXTRACTION_PROMPT",
+                    replace(cover_letter_generator.PROJECT_EXTRACTION_PROMPT, version="test-2"),
+                )
+                await _generate_all(generator)
+                assert _extractions(server) == 3
+            asyncio.run(run())
+        finally:
+            llm_client.set_client(None)
+    assert llm_cache.response_cache.hit_rate("cover_letter.extract_projects") > 0.5
+
+
+def test_extraction_is_persisted_across_restarts(monkeypatch):
+    store = {}
+    monkeypatch.setattr(llm_cache, "fetch_llm_cache", lambda key: store.get(key))
+    monkeypatch.setattr(llm_cache, "store_llm_cache", lambda key, feature, value, expires_at: store.update({key: value}))
+    monkeypatch.setattr(llm_cache.response_cache, "shared", False)
+    monkeypatch.setattr(database, "llm_cache_collection", object())
+    generator = cover_letter_generator.CoverLetterGenerator()
+    llm_cache.response_cache.clear()
+
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            async def run():
+                await generator.generate_cover_letter(RESUME + " (persisted)", JOBS[0])
+                assert len(store) == 1
+                # A restart empties the in-process tier; the stored analysis is still used
+                llm_cache.response_cache.clear()
+                await generator.generate_cover_letter(RESUME + " (persisted)", JOBS[1])
+            asyncio.run(run())
+        finally:
+            llm_client.set_client(None)
+        assert _extractions(server) == 1
+
+
+def test_shared_tier_is_skipped_without_a_collection(monkeypatch):
+    calls = []
+    monkeypatch.setattr(llm_cache, "fetch_llm_cache", lambda key: calls.append(key))
+    monkeypatch.setattr(llm_cache, "store_llm_cache", lambda *args: calls.append(args))
+    monkeypatch.setattr(database, "llm_cache_collection", None)
+    cache = llm_cache.ResponseCache()
+
+    async def run():
+        await cache.set("cover_letter.extract_projects", "key", "value", 60)
+        cache.local.clear()
+        return await cache.get("cover_letter.extract_projects", "key")
+
+    assert asyncio.run(run()) is None
+    assert calls == []
+
+
+def test_truncated_extraction_is_cached():
+    generator = cover_letter_generator.CoverLetterGenerator()
+    llm_cache.response_cache.clear()
+    # An analysis longer than the extraction's max_tokens comes back with finish_reason "length"
+    responses = {**load_fake_responses(), "cover_letter.extract_projects": "Payments API (Python). " * 400}
+
+    with FakeLLMServer(responses=responses) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            asyncio.run(_generate_all(generator, RESUME + " (long)"))
+        finally:
+            llm_client.set_client(None)
+        assert _extractions(server) == 1
@@ -0,0 +1,65 @@
+"""
+Tests for the prompt registry and provider prompt-cache reporting
+"""
+
+import asyncio
+
+from openai import AsyncOpenAI
+
+from features.cover_letter_generator import ENHANCED_COVER_LETTER_PROMPT
+from features.learning_paths import LEARNING_PATHWAY_PROMPT
+from features.project_evaluation import EVALUATION_PROMPTS, ProjectEvaluator
+from features.resume_optimization import COMPREHENSIVE_OPTIMIZER_PROMPT
+from llm import client as llm_client
+from llm import metrics
+from llm.fake_server import FakeLLMServer
+from llm.prompts import versions
+
+
+def test_static_prefix_comes_first_and_is_identical_across_inputs():
+    first = LEARNING_PATHWAY_PROMPT.render(topic="Rust")
+    second = LEARNING_PATHWAY_PROMPT.render(topic="Kubernetes")
+    assert first.startswith(LEARNING_PATHWAY_PROMPT.static)
+    assert second.startswith(LEARNING_PATHWAY_PROMPT.static)
+    assert first.rstrip().endswith('"Rust"')
+
+    evaluator = ProjectEvaluator()
+    _, prompt = evaluator._build_prompt("u1", "A CLI that syncs dotfiles", "senior_engineer")
+    assert prompt.startswith(EVALUATION_PROMPTS["senior_engineer"].static)
+    assert prompt.rstrip().endswith("A CLI that syncs dotfiles")
+    assert "{{" not in ENHANCED_COVER_LETTER_PROMPT.static
+    assert "{resume_text}" in COMPREHENSIVE_OPTIMIZER_PROMPT.variable
+
+    registered = versions()
+    for name in ("resume_optimization", "cover_letter", "learning_pathways", "project_evaluation.venture_capitalist"):
+        assert name in registered
+
+
+def test_cached_token_ratio_is_reported_from_usage():
+    evaluator = ProjectEvaluator()
+    cached_before = metrics.get_counter("llm_cached_prompt_tokens_total", feature="project_evaluation")
+    total_before = metrics.get_counter("llm_prompt_tokens_total", feature="project_evaluation")
+
+    with FakeLLMServer(content='{"ok": true}') as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            async def run():
+                results = []
+                for description in ("A CLI that syncs dotfiles", "A marketplace for used lab equipment"):
+                    _, prompt = evaluator._build_prompt("u1", description, "product_manager")
+                    results.append(await llm_client.complete(
+                        "project_evaluation", [{"role": "user", "content": prompt}],
+                        model="gpt-4o", temperature=0.5,
+                    ))
+                return results
+            first, second = asyncio.run(run())
+        finally:
+            llm_client.set_client(None)
+
+    # The second call reuses the whole static instruction block
+    assert first.cached_tokens == 0
+    assert second.cached_tokens / second.prompt_tokens > 0.9
+    cached = metrics.get_counter("llm_cached_prompt_tokens_total", feature="project_evaluation") - cached_before
+    total = metrics.get_counter("llm_prompt_tokens_total", feature="project_evaluation") - total_before
+    assert cached == second.cached_tokens and total == first.prompt_tokens + second.prompt_tokens
+    assert metrics.get_gauge("llm_cached_token_ratio", feature="project_evaluation") > 0
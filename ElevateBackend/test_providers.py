@@ -0,0 +1,141 @@
+"""
+Tests for latency-aware provider selection and failover between LLM providers
+"""
+
+import asyncio
+import random
+
+import pytest
+from openai import AsyncOpenAI
+
+from llm import client as llm_client
+from llm import metrics, routing
+from llm.fake_server import FakeLLMServer
+from llm.providers import Provider, ProviderPool
+from llm.retry import breaker
+
+SCHEMA_FORMAT = {"type": "json_schema", "json_schema": {"name": "reply", "strict": True, "schema": {"type": "object"}}}
+
+
+def _pool(*providers):
+    return ProviderPool(list(providers), explore_rate=0.0)
+
+
+def test_pick_prefers_the_fastest_healthy_provider():
+    openai, gemini = Provider("openai", None, "OPENAI_API_KEY"), Provider("gemini", None, "GEMINI_API_KEY")
+    pool = _pool(openai, gemini)
+    # With no latency yet the configured order wins
+    assert pool.pick() is openai
+    openai.observe_latency(2.0)
+    gemini.observe_latency(0.5)
+    assert pool.pick() is gemini
+    # An open breaker takes a provider out of rotation
+    assert pool.pick(available=lambda p: p is not gemini) is openai
+    assert pool.fallback(avoid={"gemini"}) is openai
+    assert pool.fallback(avoid={"openai", "gemini"}) is None
+
+
+def test_pick_skips_providers_without_strict_json_schema():
+    openai = Provider("openai", None, "OPENAI_API_KEY")
+    anthropic = Provider("anthropic", None, "ANTHROPIC_API_KEY", json_schema=False)
+    anthropic.observe_latency(0.1)
+    openai.observe_latency(5.0)
+    pool = _pool(openai, anthropic)
+    assert pool.pick({"type": "json_object"}) is anthropic
+    assert pool.pick(SCHEMA_FORMAT) is openai
+    assert pool.fallback(SCHEMA_FORMAT, avoid={"openai"}) is None
+
+
+def test_latency_ewma_and_exploration():
+    provider = Provider("gemini", None, "GEMINI_API_KEY")
+    provider.observe_latency(1.0)
+    provider.observe_latency(2.0)
+    assert provider.latency_ewma == pytest.approx(1.2)
+
+    fast, slow = Provider("fast", None, "X"), Provider("slow", None, "Y")
+    fast.observe_latency(0.1)
+    slow.observe_latency(1.0)
+    pool = ProviderPool([fast, slow], explore_rate=0.5, rng=random.Random(7))
+    picks = [pool.pick().name for _ in range(400)]
+    assert 0.15 < picks.count("slow") / len(picks) < 0.35
+
+
+def test_tiers_map_to_each_providers_models():
+    provider = Provider("gemini", None, "GEMINI_API_KEY", models={"small": "gemini-2.0-flash", "large": "gemini-1.5-pro"})
+    assert provider.model_for(routing.TIERS["small"]) == "gemini-2.0-flash"
+    assert provider.model_for(routing.TIERS["large"]) == "gemini-1.5-pro"
+    assert Provider("openai", None, "OPENAI_API_KEY").model_for("gpt-4o") == "gpt-4o"
+
+
+def test_failing_primary_fails_over_to_the_next_provider(monkeypatch):
+    with FakeLLMServer(content="primary", error_rate=1.0, error_status=503) as down, \
+            FakeLLMServer(content="from gemini") as up:
+        primary = Provider("openai", None, "OPENAI_API_KEY", breaker=breaker)
+        gemini = Provider("gemini", up.url + "/v1", "GEMINI_API_KEY",
+                          models={"small": "gemini-2.0-flash", "large": "gemini-1.5-pro"})
+        monkeypatch.setattr(llm_client, "providers", _pool(primary, gemini))
+        llm_client.set_client(AsyncOpenAI(base_url=down.url + "/v1", api_key="test", max_retries=0))
+        try:
+            async def run():
+                first = await llm_client.complete(
+                    "test_failover", [{"role": "user", "content": "hi"}], model="gpt-4o", temperature=0,
+                )
+                # The next call goes to the provider that answered
+                await llm_client.complete(
+                    "test_failover", [{"role": "user", "content": "again"}], model="gpt-4o", temperature=0,
+                )
+                await gemini.client.close()
+                return first
+            completion = asyncio.run(run())
+        finally:
+            llm_client.set_client(None)
+
+    assert completion.text == "from gemini"
+    assert len(down.requests) == 1
+    assert [r["model"] for r in up.requests] == ["gemini-1.5-pro", "gemini-1.5-pro"]
+    assert metrics.get_counter("llm_failovers", feature="test_failover", source="openai", target="gemini") == 1
+    assert metrics.get_counter("llm_provider_calls", provider="gemini", outcome="ok") >= 2
+    assert gemini.latency_ewma is not None
+    assert any(row["model"] == "gemini-1.5-pro" for row in routing.report() if row["route"] == "test_failover")
+
+
+def test_non_openai_provider_listed_first_keeps_its_own_endpoint(monkeypatch):
+    with FakeLLMServer(content="from openai") as openai_server, FakeLLMServer(content="from gemini") as gemini_server:
+        gemini = Provider("gemini", gemini_server.url + "/v1", "GEMINI_API_KEY")
+        openai = Provider("openai", None, "OPENAI_API_KEY", breaker=breaker)
+        # LLM_PROVIDERS=gemini,openai
+        monkeypatch.setattr(llm_client, "providers", _pool(gemini, openai))
+        shared = AsyncOpenAI(base_url=openai_server.url + "/v1", api_key="test", max_retries=0)
+        llm_client.set_client(shared)
+        try:
+            async def run():
+                completion = await llm_client.complete(
+                    "test_gemini_first", [{"role": "user", "content": "hi"}], model="gpt-4o", temperature=0,
+                )
+                await gemini.client.close()
+                return completion
+            completion = asyncio.run(run())
+            assert llm_client._client_for(openai) is shared
+            assert str(gemini.client.base_url).startswith(gemini_server.url)
+        finally:
+            llm_client.set_client(None)
+
+    assert completion.text == "from gemini"
+    assert len(openai_server.requests) == 0
+    assert gemini.breaker is not breaker
+
+
+def test_single_provider_still_retries_in_place(monkeypatch):
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt, error=None: 0)
+    with FakeLLMServer(content="ok") as server:
+        monkeypatch.setattr(llm_client, "providers", _pool(
+            Provider("openai", None, "OPENAI_API_KEY", breaker=breaker)))
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            completion = asyncio.run(llm_client.complete(
+                "test_single_provider", [{"role": "user", "content": "hi"}], model="gpt-4o", temperature=0,
+            ))
+        finally:
+            llm_client.set_client(None)
+    assert completion.text == "ok"
+    assert metrics.get_counter("llm_failovers", feature="test_single_provider", source="openai", target="openai") == 0
@@ -0,0 +1,155 @@
+"""
+Tests for the shared LLM retry layer: classification, backoff, retry budget and circuit breaker
+"""
+
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from llm import client as llm_client
+from llm import metrics
+from llm.adaptive import AdaptiveLimiter
+from llm.providers import Provider, ProviderPool
+from llm.retry import CircuitBreaker, CircuitOpenError, RetryBudget, backoff_delay, is_retryable
+
+OK_BODY = {
+    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+def _call(statuses: list, calls: int = 1):
+    """Run `calls` completions against a transport answering with `statuses` in turn (then 200)."""
+    seen: list = []
+
+    def handler(request):
+        status = statuses[len(seen)] if len(seen) < len(statuses) else 200
+        seen.append(status)
+        if status == 200:
+            return httpx.Response(200, json=OK_BODY)
+        return httpx.Response(status, json={"error": {"message": "boom"}})
+
+    async def run():
+        llm_client.set_client(AsyncOpenAI(
+            api_key="test", max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        ))
+        results = []
+        for _ in range(calls):
+            try:
+                resp = await llm_client.complete("project_evaluation", [{"role": "user", "content": "hi"}],
+                                                 model="gpt-4o", temperature=0.5)
+                results.append(resp.text)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    try:
+        return asyncio.run(run()), seen
+    finally:
+        llm_client.set_client(None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_retry_state(monkeypatch):
+    breaker = CircuitBreaker(name="test", min_calls=4, reset_timeout=0.2)
+    monkeypatch.setattr(llm_client, "providers", ProviderPool([Provider("openai", None, "OPENAI_API_KEY", breaker=breaker)]))
+    monkeypatch.setattr(llm_client, "retry_budget", RetryBudget())
+    monkeypatch.setattr(llm_client, "limiter", AdaptiveLimiter(name="retry-test", initial=10, minimum=1, maximum=10))
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt, error=None: 0)
+
+
+def test_transient_errors_are_retried_and_client_errors_are_not():
+    results, seen = _call([500, 429])
+    assert results == ["ok"]
+    assert seen == [500, 429, 200]
+
+    results, seen = _call([400])
+    assert isinstance(results[0], openai.BadRequestError)
+    assert seen == [400]
+    assert not is_retryable(results[0])
+
+
+def test_retry_budget_caps_amplification(monkeypatch):
+    monkeypatch.setattr(llm_client, "retry_budget", RetryBudget(ratio=0.0, min_retries=1))
+    before = metrics.get_counter("llm_retry_budget_exhausted", feature="project_evaluation")
+    # Every first attempt fails; only one retry fits in the budget
+    results, seen = _call([503, 200, 503], calls=2)
+    assert results[0] == "ok"
+    assert isinstance(results[1], openai.InternalServerError)
+    assert seen == [503, 200, 503]
+    assert metrics.get_counter("llm_retry_budget_exhausted", feature="project_evaluation") == before + 1
+
+
+def test_breaker_fails_fast_then_recovers_through_a_probe():
+    breaker = llm_client.providers.primary.breaker
+    results, seen = _call([500] * 6, calls=2)
+    assert all(isinstance(r, openai.InternalServerError) for r in results)
+    assert breaker.state == "open"
+    failed_calls = len(seen)
+
+    # While open, calls never reach the provider
+    results, seen = _call([], calls=1)
+    assert isinstance(results[0], CircuitOpenError)
+    assert seen == []
+    assert failed_calls <= 6
+
+    time.sleep(0.25)
+    results, seen = _call([], calls=1)
+    assert results == ["ok"]
+    assert breaker.state == "closed"
+
+
+def test_backoff_uses_full_jitter_and_honours_retry_after():
+    delays = [backoff_delay(3, base=1.0, cap=8.0) for _ in range(200)]
+    assert all(0 <= d <= 8.0 for d in delays)
+    assert len({round(d, 3) for d in delays}) > 100
+
+    response = httpx.Response(429, headers={"retry-after": "3"},
+                              request=httpx.Request("POST", "http://test/v1/chat/completions"))
+    error = openai.RateLimitError("slow down", response=response, body=None)
+    assert is_retryable(error)
+    assert backoff_delay(0, error, base=0.1, cap=8.0) >= 3
+
+
+class _Collection:
+    """Records update_one calls instead of talking to MongoDB."""
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, filter, update, upsert=False):
+        self.updates.append((filter, update))
+
+
+@pytest.mark.parametrize("path, payload", [
+    ("/analyze_question", {"question": "circuit test: rotate a matrix by 90 degrees"}),
+    ("/evaluate_project", {"project_description": "circuit test: a habit tracker with streak reminders"}),
+    ("/optimize_resume", {"resume_text": "circuit test résumé " * 20, "job_description": "Backend engineer building Python APIs. " * 5}),
+])
+def test_open_circuit_answers_503_with_retry_after(monkeypatch, path, payload):
+    from fastapi.testclient import TestClient
+    import main
+    from features import resume_optimization
+
+    collection = _Collection()
+    # Skip the optimizer's canned development-mode reply
+    monkeypatch.setattr(resume_optimization, "DEVELOPMENT_MODE", False)
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    monkeypatch.setattr(main, "users_collection", collection)
+    breaker = llm_client.providers.primary.breaker
+    breaker._set_state("open")
+    breaker._opened_at = time.monotonic()
+    breaker.reset_timeout = 30
+
+    with TestClient(main.app) as http:
+        resp = http.post(path, json=payload, headers={"Authorization": "Bearer t"})
+    assert resp.status_code == 503
+    assert 1 <= int(resp.headers["Retry-After"]) <= 30
+    # The entry recorded as "processing" is still marked failed
+    fields = collection.updates[-1][1]["$set"]
+    assert [value for key, value in fields.items() if key.endswith(".status")] == ["failed"]
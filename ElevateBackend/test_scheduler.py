@@ -0,0 +1,144 @@
+"""
+Tests for the lane-based LLM scheduler
+"""
+
+import asyncio
+
+import pytest
+
+from llm import metrics
+from llm.scheduler import FeatureConfig, LaneConfig, QueueTimeout, Scheduler, UserQueueFull, user_label
+
+
+def _scheduler(heavy_timeout: float = 5.0) -> Scheduler:
+    return Scheduler(
+        lanes={
+            "interactive": LaneConfig(concurrency=2, queue_timeout=5.0),
+            "heavy": LaneConfig(concurrency=1, queue_timeout=heavy_timeout),
+        },
+        features={
+            "interview_analysis": FeatureConfig(lane="interactive", priority=0),
+            "resume_optimization": FeatureConfig(lane="heavy", priority=1),
+            "learning_pathways": FeatureConfig(lane="heavy", priority=5),
+        },
+    )
+
+
+def test_heavy_backlog_does_not_block_interactive_lane():
+    scheduler = _scheduler()
+    order = []
+
+    async def job(feature, seconds):
+        async with scheduler.slot(feature):
+            order.append(feature)
+            await asyncio.sleep(seconds)
+
+    async def run():
+        heavy = [asyncio.create_task(job("learning_pathways", 0.05)) for _ in range(3)]
+        await asyncio.sleep(0)
+        await job("interview_analysis", 0)
+        # The interactive call ran while two heavy calls were still queued
+        assert order == ["learning_pathways", "interview_analysis"]
+        await asyncio.gather(*heavy)
+
+    asyncio.run(run())
+
+
+def test_waiters_are_admitted_by_priority():
+    scheduler = _scheduler()
+    order = []
+
+    async def job(feature):
+        async with scheduler.slot(feature):
+            order.append(feature)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        first = asyncio.create_task(job("learning_pathways"))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(job("learning_pathways")),
+                  asyncio.create_task(job("resume_optimization"))]
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(run())
+    assert order == ["learning_pathways", "resume_optimization", "learning_pathways"]
+
+
+def test_queue_timeout_raises_and_frees_the_queue():
+    scheduler = _scheduler(heavy_timeout=0.05)
+    metrics.reset()
+
+    async def run():
+        async with scheduler.slot("learning_pathways"):
+            with pytest.raises(QueueTimeout):
+                async with scheduler.slot("learning_pathways"):
+                    pass
+        # The timed-out waiter is gone, so the lane is free again
+        async with scheduler.slot("learning_pathways"):
+            pass
+
+    asyncio.run(run())
+    assert scheduler.lanes["heavy"].active == 0
+    assert metrics.get_counter("scheduler_timeouts", lane="heavy") == 1
+    assert metrics.get_gauge("scheduler_queue_depth", lane="heavy") == 0
+
+
+def test_users_take_turns_and_queues_are_bounded():
+    scheduler = Scheduler(
+        lanes={"heavy": LaneConfig(concurrency=1, queue_timeout=5.0)},
+        features={"project_evaluation": FeatureConfig(lane="heavy", priority=3)},
+        user_max_inflight=1,
+        user_max_queued=3,
+    )
+    order = []
+
+    async def job(user_id):
+        async with scheduler.slot("project_evaluation", user_id):
+            order.append(user_id)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        # A power user queues four evaluations before anyone else arrives
+        burst = [asyncio.create_task(job("power")) for _ in range(4)]
+        await asyncio.sleep(0)
+        others = [asyncio.create_task(job("alice")), asyncio.create_task(job("bob"))]
+        await asyncio.sleep(0)
+        # Queue bound: a fifth request from the same user is refused
+        with pytest.raises(UserQueueFull):
+            await job("power")
+        await asyncio.gather(*burst, *others)
+
+    asyncio.run(run())
+    assert order == ["power", "power", "alice", "bob", "power", "power"]
+    waits = {row["labels"]["user"]: row for row in scheduler.user_wait_snapshot()}
+    # Users are labelled pseudonymously, never by their raw id
+    assert set(waits) == {user_label("power"), user_label("alice"), user_label("bob")}
+    assert "power" not in waits
+    assert waits[user_label("power")]["count"] == 4
+
+
+def test_weighted_slot_takes_lane_capacity_but_one_user_slot():
+    scheduler = Scheduler(
+        lanes={"heavy": LaneConfig(concurrency=5, queue_timeout=5.0)},
+        features={"cover_letter": FeatureConfig(lane="heavy", priority=2)},
+        user_max_inflight=1,
+    )
+    lane = scheduler.lanes["heavy"]
+    order = []
+
+    async def job(user_id, weight):
+        async with scheduler.slot("cover_letter", user_id, weight=weight):
+            order.append((user_id, lane.active))
+            await asyncio.sleep(0.02)
+
+    async def run():
+        batch = asyncio.create_task(job("alice", 4))
+        await asyncio.sleep(0)
+        # One unit is left, so a single call from another user still gets in
+        await job("bob", 1)
+        # A second batch waits until the first has released its units
+        await asyncio.gather(batch, job("carol", 3))
+
+    asyncio.run(run())
+    assert order == [("alice", 4), ("bob", 5), ("carol", 3)]
+    assert lane.active == 0 and lane.inflight == {}
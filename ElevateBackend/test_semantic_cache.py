@@ -0,0 +1,81 @@
+"""
+Tests for the embedding-backed semantic cache
+"""
+
+import os
+
+from features import interview_preparation
+from llm import semantic_cache
+from llm.semantic_cache import (
+    DEFAULT_THRESHOLD,
+    EVAL_THRESHOLDS,
+    SemanticCache,
+    _load_pairs,
+    evaluate_thresholds,
+    recommend_threshold,
+)
+
+PAIRS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm", "data", "semantic_pairs.jsonl")
+
+
+def test_paraphrase_hits_and_unrelated_question_misses():
+    for use_hnsw in {False, SemanticCache("probe").use_hnsw}:
+        cache = SemanticCache("test", use_hnsw=use_hnsw)
+        cache.add("Reverse a linked list", {"approach": ["iterate with three pointers"]})
+
+        hit = cache.lookup("How do you reverse a linked list?")
+        assert hit == {"approach": ["iterate with three pointers"]}
+        # Callers get independent copies
+        hit["approach"].append("mutated")
+        assert cache.lookup("reverse a linked list") == {"approach": ["iterate with three pointers"]}
+
+        assert cache.lookup("reverse a string") is None
+        # Near-duplicates that ask a different question
+        assert cache.lookup("Reverse a linked list in groups of k") is None
+        assert cache.lookup("reverse a doubly linked list") is None
+
+
+def test_capacity_evicts_oldest_entry():
+    cache = SemanticCache("test", capacity=2, use_hnsw=False)
+    cache.add("two sum", 1)
+    cache.add("valid parentheses", 2)
+    cache.add("number of islands", 3)
+    assert len(cache) == 2
+    assert cache.lookup("two sum") is None
+    assert cache.lookup("number of islands") == 3
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = SemanticCache("test", ttl=60, use_hnsw=False)
+    cache.add("two sum", 1)
+    now[0] += 30
+    cache.add("valid parentheses", 2)
+    assert cache.lookup("two sum") == 1
+    now[0] += 31
+    # The first entry has expired and is evicted; the second is still fresh
+    assert cache.lookup("two sum") is None
+    assert len(cache) == 1 and cache.lookup("valid parentheses") == 2
+
+
+def test_each_routed_model_has_its_own_analysis_index(monkeypatch):
+    monkeypatch.setattr(interview_preparation, "analysis_semantic_caches", {})
+    control = interview_preparation.analysis_semantic_cache("gpt-4o-mini")
+    control.add("Reverse a linked list", {"approach": ["three pointers"]})
+    assert interview_preparation.analysis_semantic_cache("gpt-4o-mini") is control
+    # The other arm of an A/B split does not see the control arm's analyses
+    assert interview_preparation.analysis_semantic_cache("gpt-4o").lookup("reverse a linked list") is None
+    assert "gpt-4o:" in interview_preparation.analysis_semantic_cache("gpt-4o").name
+
+
+def test_threshold_report_trades_recall_for_precision():
+    report = evaluate_thresholds(_load_pairs(PAIRS_PATH), [0.5, 0.7, 0.9])
+    assert report[0]["recall"] >= report[-1]["recall"]
+    assert report[-1]["precision"] >= report[0]["precision"]
+    assert recommend_threshold(report, min_precision=0.95) == 0.9
+
+
+def test_default_threshold_matches_eval_recommendation():
+    report = evaluate_thresholds(_load_pairs(PAIRS_PATH), EVAL_THRESHOLDS)
+    assert recommend_threshold(report, min_precision=0.95) == DEFAULT_THRESHOLD
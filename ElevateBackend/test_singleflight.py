@@ -0,0 +1,66 @@
+"""
+Tests for single-flight coalescing of identical in-flight LLM calls
+"""
+
+import asyncio
+import json
+
+from openai import AsyncOpenAI
+
+import features.interview_preparation as interview_preparation
+from llm import client as llm_client
+from llm import metrics
+from llm.cache import response_cache
+from llm.fake_server import FakeLLMServer, load_fake_responses
+from llm.singleflight import SingleFlight
+
+
+def test_identical_questions_share_one_call_and_persist_per_user(monkeypatch):
+    stored = []
+    monkeypatch.setattr(interview_preparation, "store_interview_analysis",
+                        lambda user_id, data: stored.append(user_id))
+    monkeypatch.setattr(llm_client, "singleflight", SingleFlight())
+    response_cache.clear()
+
+    analysis = load_fake_responses()["interview_analysis"]
+    with FakeLLMServer(content=analysis, delay=0.3) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            async def run():
+                return await asyncio.gather(*(
+                    interview_preparation.InterviewPreparation.analyze_question(
+                        f"student-{i}", "Find the middle of a linked list in one pass"
+                    )
+                    for i in range(8)
+                ))
+            results = asyncio.run(run())
+        finally:
+            llm_client.set_client(None)
+
+        assert len(server.requests) == 1
+    assert sorted(stored) == sorted(f"student-{i}" for i in range(8))
+    # Every caller gets its own copy of the result
+    results[0]["approach"].append("mutated")
+    assert results[1] == json.loads(analysis)
+    assert metrics.get_gauge("llm_coalescing_ratio", feature="interview_analysis") > 0
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flight.do("k", work, "test"))
+        second = asyncio.create_task(flight.do("k", work, "test"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result, shared = await second
+        return result, shared, flight.inflight()
+
+    assert asyncio.run(run()) == ("done", True, 0)
+    assert runs == [1]
@@ -0,0 +1,69 @@
+"""
+Tests for the SSE streaming endpoints, run against the local fake LLM server
+"""
+
+import json
+
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+import main
+from features import learning_paths
+from llm import client as llm_client
+from llm.fake_server import FakeLLMServer
+
+
+class _Collection:
+    """Records update_one calls instead of talking to MongoDB."""
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, filter, update, upsert=False):
+        self.updates.append((filter, update))
+
+
+def _events(body: str) -> list:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _stream(monkeypatch, content: str, path: str, payload: dict) -> list:
+    monkeypatch.setattr(main, "verify_google_token", lambda token: {"sub": "user-1"})
+    monkeypatch.setattr(main, "users_collection", _Collection())
+    with FakeLLMServer(content=content, chunk_size=5) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with TestClient(main.app) as http:
+                resp = http.post(path, json=payload, headers={"Authorization": "Bearer t"})
+        finally:
+            llm_client.set_client(None)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    return _events(resp.text)
+
+
+def test_learning_pathway_streams_tokens_then_result(monkeypatch):
+    pathway = {"topic": "Rust", "phases": [{"name": "Basics"}]}
+    events = _stream(monkeypatch, json.dumps(pathway), "/learning_pathways/stream", {"topic": "Rust"})
+
+    tokens = [data["delta"] for name, data in events if name == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == json.dumps(pathway)
+    name, data = events[-1]
+    assert name == "result"
+    assert data["learning_pathway"] == pathway
+    assert data["status"] == "completed"
+
+
+def test_unparseable_stream_ends_with_error_event(monkeypatch):
+    stored = []
+    monkeypatch.setattr(learning_paths, "store_learning_pathway_result", lambda user_id, data: stored.append(data))
+    events = _stream(monkeypatch, "not json at all", "/learning_pathways/stream", {"topic": "Rust"})
+    assert events[0][0] == "token"
+    assert events[-1] == ("error", {"detail": "Internal error generating learning pathway"})
+    # The "processing" entry is followed by a "failed" one for the same pathway
+    assert [entry["status"] for entry in stored] == ["processing", "failed"]
+    assert stored[0]["pathway_id"] == stored[1]["pathway_id"]
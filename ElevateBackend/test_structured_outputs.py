@@ -0,0 +1,106 @@
+"""
+Tests for schema-constrained structured outputs and their per-feature parse metrics
+"""
+
+import asyncio
+import json
+
+import pytest
+from openai import AsyncOpenAI
+
+import features.cover_letter_generator as cover_letter_generator
+import features.project_evaluation as project_evaluation
+import features.resume_optimization as resume_optimization
+from features.schemas import FEATURE_SCHEMAS, CoverLetter, ProjectEvaluation
+from llm import client as llm_client
+from llm import metrics, routing, structured
+from llm.fake_server import FakeLLMServer, load_fake_responses
+
+
+def _objects(node):
+    """Every object schema in a JSON schema, nested ones included."""
+    if isinstance(node, dict):
+        if "properties" in node:
+            yield node
+        for value in node.values():
+            yield from _objects(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _objects(value)
+
+
+@pytest.mark.parametrize("feature", sorted(FEATURE_SCHEMAS))
+def test_every_schema_is_strict_and_matches_the_fake_responses(feature):
+    model = FEATURE_SCHEMAS[feature]
+    response_format = structured.response_format(model)
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["strict"] is True
+    for obj in _objects(response_format["json_schema"]["schema"]):
+        assert obj["additionalProperties"] is False
+        assert obj["required"] == list(obj["properties"])
+    # The canned replies the fake backend serves are valid outputs
+    model.model_validate_json(load_fake_responses()[feature])
+
+
+def test_parse_counts_failures_and_fallbacks_per_feature():
+    feature = "test_structured"
+    valid = load_fake_responses()["cover_letter"]
+    assert structured.parse(feature, CoverLetter, valid)["story_flow_score"] == 8
+    assert structured.parse(feature, CoverLetter, '{"cover_letter": "Dear team"}') is None
+    out_of_range = json.dumps({**json.loads(valid), "story_flow_score": 11})
+    assert structured.parse(feature, CoverLetter, out_of_range) is None
+    structured.record_fallback(feature)
+
+    assert metrics.get_counter("llm_structured_outputs", feature=feature, outcome="valid") == 1
+    assert metrics.get_counter("llm_structured_outputs", feature=feature, outcome="invalid") == 2
+    assert metrics.get_gauge("llm_parse_failure_rate", feature=feature) == pytest.approx(2 / 3)
+    assert metrics.get_gauge("llm_fallback_rate", feature=feature) == pytest.approx(1 / 3)
+
+
+def test_evaluation_requests_the_strict_schema_and_skips_repair(monkeypatch):
+    monkeypatch.setattr(project_evaluation, "store_evaluation_result", lambda user_id, entry: None)
+    failures = metrics.get_counter("llm_structured_outputs", feature="project_evaluation", outcome="invalid")
+
+    with FakeLLMServer(responses=load_fake_responses()) as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            result = asyncio.run(project_evaluation.ProjectEvaluator().evaluate(
+                "user-1", "A schema-checked project description", "senior_engineer"
+            ))
+        finally:
+            llm_client.set_client(None)
+        sent = server.requests[-1]["response_format"]
+
+    assert sent["json_schema"]["name"] == "ProjectEvaluation" and sent["json_schema"]["strict"] is True
+    assert result == ProjectEvaluation.model_validate_json(load_fake_responses()["project_evaluation"]).model_dump()
+    assert metrics.get_counter("llm_structured_outputs", feature="project_evaluation", outcome="invalid") == failures
+
+
+def test_invalid_cover_letter_is_not_regenerated():
+    generator = cover_letter_generator.CoverLetterGenerator()
+
+    with FakeLLMServer(content='{"cover_letter": "Dear team"}') as server:
+        llm_client.set_client(AsyncOpenAI(base_url=server.url + "/v1", api_key="test"))
+        try:
+            with pytest.raises(ValueError, match="schema"):
+                asyncio.run(generator.generate_cover_letter("Built a payments API in Python " * 5, "Backend role at Acme " * 5))
+        finally:
+            llm_client.set_client(None)
+        letter_calls = [r for r in server.requests if r.get("response_format")]
+
+    assert len(letter_calls) == 1
+    assert letter_calls[0]["model"] == routing.base_model("cover_letter")
+
+
+def test_lenient_resume_reply_needs_only_the_core_keys():
+    optimizer = resume_optimization.ResumeOptimizer()
+    analysis = {"strengths": ["Python"], "weaknesses": ["Metrics"], "recommendations": ["Quantify impact"]}
+    # A pre-schema reply without format_analysis, ats_score_breakdown or human_readability
+    raw = json.dumps({"optimized_resume": "Jane Doe", "analysis": analysis, "ats_score": 82})
+    result, fallback_used = optimizer._process_response(raw, "resume", "job", "gpt-4o")
+    assert not fallback_used
+    assert result["optimized_resume"] == "Jane Doe" and result["ats_score"] == 82
+
+    _, fallback_used = optimizer._process_response(json.dumps({"optimized_resume": "Jane Doe", "ats_score": 82}),
+                                                   "resume", "job", "gpt-4o")
+    assert fallback_used
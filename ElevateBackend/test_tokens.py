@@ -0,0 +1,65 @@
+"""
+Tests for prompt token accounting, budgets and token-weighted admission
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from llm import client as llm_client
+from llm.tokens import PromptTooLarge, TokenBucket, count_tokens, fit_input, TRUNCATION_MARKER
+
+
+def test_oversized_resume_is_truncated_deterministically():
+    resume = "Built distributed systems in Go and Python. " * 2000
+    assert count_tokens(resume) > 6000
+
+    fitted = fit_input("resume_optimization", resume, "resume_text")
+    assert TRUNCATION_MARKER in fitted
+    assert fitted.startswith("Built distributed systems")
+    assert count_tokens(fitted) <= 6000 + count_tokens(TRUNCATION_MARKER) + 2
+    assert fit_input("resume_optimization", resume, "resume_text") == fitted
+    # Text inside the budget is untouched
+    assert fit_input("resume_optimization", "Short résumé", "resume_text") == "Short résumé"
+
+
+def test_rejecting_budgets_and_prompt_cap_fail_before_dispatch():
+    with pytest.raises(PromptTooLarge):
+        fit_input("learning_pathways", "machine learning " * 200, "topic")
+
+    calls = []
+
+    class _NoClient:
+        def __getattr__(self, name):
+            calls.append(name)
+            raise AssertionError("the provider must not be called")
+
+    llm_client.set_client(_NoClient())
+    try:
+        with pytest.raises(PromptTooLarge):
+            asyncio.run(llm_client.complete(
+                "interview_analysis", [{"role": "user", "content": "word " * 20000}],
+                model="gpt-4o", temperature=0.0,
+            ))
+    finally:
+        llm_client.set_client(None)
+    assert calls == []
+
+
+def test_bucket_weights_admission_by_tokens():
+    bucket = TokenBucket(tokens_per_minute=6000)  # 100 tokens per second
+
+    async def run():
+        await bucket.acquire(5900, "resume_optimization")
+        start = time.monotonic()
+        # A 200-token call has to wait for the bucket to refill
+        await bucket.acquire(200, "interview_analysis")
+        return time.monotonic() - start
+
+    waited = asyncio.run(run())
+    assert waited >= 0.9
+    # Unused reservation is returned once real usage is known
+    before = bucket.available
+    bucket.settle(reserved=200, used=50)
+    assert bucket.available >= before + 150 - 1